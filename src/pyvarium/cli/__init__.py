@@ -11,7 +11,22 @@ from rich.logging import RichHandler
 from rich.markdown import Markdown
 from rich.prompt import Confirm
 
-from . import add, config, install, modulegen, new, sync, verify
+from . import (
+    add,
+    clone,
+    config,
+    install,
+    modulegen,
+    new,
+    pack,
+    precompile,
+    prefetch,
+    stage,
+    sync,
+    unpack,
+    verify,
+    wheelhouse,
+)
 
 app = typer.Typer()
 
@@ -84,12 +99,19 @@ def main(
 
 
 app.add_typer(add.app, name="add")
+app.add_typer(clone.app, name="clone")
 app.add_typer(config.app, name="config")
 app.add_typer(install.app, name="install")
 app.add_typer(modulegen.app, name="modulegen")
 app.add_typer(new.app, name="new")
+app.add_typer(pack.app, name="pack")
+app.add_typer(precompile.app, name="precompile")
+app.add_typer(prefetch.app, name="prefetch")
+app.add_typer(stage.app, name="stage")
 app.add_typer(sync.app, name="sync")
+app.add_typer(unpack.app, name="unpack")
 app.add_typer(verify.app, name="verify")
+app.add_typer(wheelhouse.app, name="wheelhouse")
 
 
 if __name__ == "__main__":
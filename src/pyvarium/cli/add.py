@@ -6,6 +6,7 @@ from loguru import logger
 from rich.status import Status
 
 from pyvarium.installers import pipenv, spack
+from pyvarium.util import report
 
 app = typer.Typer(no_args_is_help=True, help="Add packages via spack or pipenv.")
 
@@ -24,16 +25,21 @@ def main(
         if spack_add:
             se.add(*spack_add)
             se.concretize()
-            se.install()
+            se.install(stream=True)
 
     with Status("Pipenv add") as status:
         pe = pipenv.PipenvEnvironment(path, status=status)
-        if se_python := se.find_python_packages(only_names=True):
-            logger.info(f"Python packages in spack environment: {se_python}")
-            pe.add(*se_python)
+        with pe.transaction(stream=True) as transaction:
+            if se_python := se.find_python_packages():
+                pins = {p["name"]: p["version"] for p in se_python}
+                logger.info(f"Python packages in spack environment: {pins}")
+                transaction.sync(pins)
 
-        if pipenv_add:
-            pe.add(*pipenv_add)
+            if pipenv_add:
+                transaction.add(*pipenv_add)
+
+        # The spack and pipenv packages share the view, so it is compiled once
+        report.precompile(se.precompile())
 
 
 @app.command(name="spack")
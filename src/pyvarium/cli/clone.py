@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import typer
+from loguru import logger
+from rich.status import Status
+
+from pyvarium.installers import pipenv, spack
+
+app = typer.Typer()
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    source: Path = typer.Argument(..., exists=True, file_okay=False),
+    path: Path = typer.Argument(..., file_okay=False),
+    hardlink: bool = typer.Option(
+        True,
+        help="Hard link venv files if the filesystem does not support reflinks, "
+        "otherwise they are copied",
+    ),
+):
+    """Create a new environment from the specs and packages of an existing one."""
+
+    if path.exists():
+        logger.error(
+            f"Directory already exists at path {path.absolute()}\n"
+            "Remove it or use another path to continue."
+        )
+        raise typer.Exit(code=1)
+
+    source = source.resolve()
+    missing = [
+        name
+        for name in ("spack.yaml", "spack.lock", "Pipfile", ".venv")
+        if not (source / name).exists()
+    ]
+    if missing:
+        logger.error(
+            f"Environment at {source} is not installed, missing: {', '.join(missing)}"
+        )
+        raise typer.Exit(code=1)
+
+    with Status("Cloning environment") as status:
+        se = spack.SpackEnvironment(path, status=status)
+        se.clone(source)
+
+        pe = pipenv.PipenvEnvironment(path, status=status)
+        counts = pe.clone(source, hardlink=hardlink)
+
+    if counts:
+        summary = ", ".join(f"{n} {method}" for method, n in sorted(counts.items()))
+        logger.info(f"Cloned venv files: {summary}")
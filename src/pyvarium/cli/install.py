@@ -1,22 +1,84 @@
 from pathlib import Path
+from typing import Dict
 
 import typer
+from loguru import logger
 from rich.status import Status
 
 from pyvarium.installers import pipenv, spack
+from pyvarium.util import report
+from pyvarium.util.lock import EnvironmentLock, hash_file
 
 app = typer.Typer(help="Concretize and install an existing environment.")
 
 
+def spack_inputs(se: spack.SpackEnvironment) -> Dict[str, str]:
+    return {
+        "spack.yaml": hash_file(se.path / "spack.yaml"),
+        "spack.lock": hash_file(se.path / "spack.lock"),
+        "spack": se.program.version,
+    }
+
+
+def pipenv_inputs(pe: pipenv.PipenvEnvironment) -> Dict[str, str]:
+    return {
+        "Pipfile": hash_file(pe.path / "Pipfile"),
+        "Pipfile.lock": hash_file(pe.path / "Pipfile.lock"),
+        # The venv uses the spack python and packages, so is redone if they change
+        "spack.lock": hash_file(pe.path / "spack.lock"),
+        "pipenv": pe.program.version,
+    }
+
+
 @app.callback(invoke_without_command=True)
-def main(path: Path = typer.Option(".", file_okay=False)):
+def main(
+    path: Path = typer.Option(".", file_okay=False),
+    force: bool = typer.Option(
+        False, help="Run all phases, even if their inputs did not change"
+    ),
+):
     path = path.resolve()
+    lock = EnvironmentLock.load(path)
+    skipped = []
 
     with Status("Spack install") as status:
         se = spack.SpackEnvironment(path, status=status)
-        se.concretize()
-        se.install()
+        if (
+            not force
+            and se.view_path.exists()
+            and lock.unchanged("spack", spack_inputs(se))
+        ):
+            skipped.append("spack")
+        else:
+            lock.discard("spack")
+            lock.save()
+            se.concretize()
+            se.install(stream=True)
+            lock.record("spack", spack_inputs(se))
+            lock.save()
 
     with Status("Pipenv install") as status:
         pe = pipenv.PipenvEnvironment(path, status=status)
-        pe.install()
+        if (
+            not force
+            and se.view_path.exists()
+            and lock.unchanged("pipenv", pipenv_inputs(pe))
+        ):
+            skipped.append("pipenv")
+        else:
+            lock.discard("pipenv")
+            lock.save()
+            # Deploying an up to date lock does not need pipenv to resolve anything
+            if not pe.install_locked(stream=True):
+                pe.install(stream=True)
+            lock.record("pipenv", pipenv_inputs(pe))
+            lock.save()
+
+    # The spack and pipenv packages share the view, so it is compiled once after
+    # both phases, and not at all if neither changed it
+    if len(skipped) < 2:
+        with Status("Compiling python packages"):
+            report.precompile(se.precompile())
+
+    if skipped:
+        logger.info(f"Skipped phases with unchanged inputs: {', '.join(skipped)}")
@@ -1,16 +1,129 @@
+import fcntl
+import hashlib
+import json
+import re
+import shutil
+import tempfile
 from pathlib import Path
 
 import typer
 from loguru import logger
 from rich.status import Status
 
+from pyvarium.config import settings
 from pyvarium.installers import pipenv, spack
+from pyvarium.util import report
+from pyvarium.util.orchestrator import Orchestrator
+from pyvarium.util.stage import generations_path
+from pyvarium.verify.repair import replace_link
 
 app = typer.Typer()
 
+#: Spack packages every environment starts with, besides python
+BASE_PACKAGES = ("py-pip", "py-setuptools")
+
+
+def base_path(python: str) -> Path:
+    """Symlink to the cached base layer for a python spec, e.g. `python@3.11%gcc`."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "-", python).strip("-")
+    digest = hashlib.sha256(python.encode()).hexdigest()[:8]
+    return settings.cache_dir.expanduser() / "bases" / f"{slug}-{digest}"
+
+
+def create(path: Path, python: str, status: Status) -> None:
+    """Create an environment from scratch, concretizing and installing the base
+    packages with spack and creating the pipenv venv on top of them."""
+    se = spack.SpackEnvironment(path, status=status)
+    pe = pipenv.PipenvEnvironment(path, status=status)
+
+    async def spack_setup():
+        await se.anew()
+        await se.aadd(python, *BASE_PACKAGES)
+        await se.aconcretize()
+        await se.ainstall(stream=True)
+
+    async def pipenv_setup():
+        await pe.ainit_venv(python_path=se.path / ".venv" / "bin" / "python")
+        async with pe.atransaction() as transaction:
+            se_python = se.find_python_packages()
+            transaction.sync({p["name"]: p["version"] for p in se_python})
+
+    # The Pipfile skeleton does not depend on spack, so it is written while spack
+    # is still building, the venv needs the spack python so waits for the build
+    orchestrator = Orchestrator()
+    orchestrator.phase("spack", spack_setup)
+    orchestrator.phase("pipfile", pe.init_pipfile)
+    orchestrator.phase("pipenv", pipenv_setup, after=["spack", "pipfile"])
+    orchestrator.run()
+
+
+def ensure_base(python: str, status: Status, *, refresh: bool = False) -> Path:
+    """Path to the base layer for `python`, creating it first if it does not exist,
+    was created by another spack version, or `refresh` is set.
+
+    Each build goes into a new directory next to the `base_path` symlink, which is
+    only switched over to it once the build is complete, so environments being
+    cloned from the previous layer are not affected. The previous layer is kept for
+    them, older ones are removed.
+    """
+    link = base_path(python)
+    generations = generations_path(link)
+    generations.mkdir(parents=True, exist_ok=True)
+    expected = {"python": python, "spack": spack.Spack().version}
+
+    # Held while the base is checked and built, so concurrent `new` calls wait for
+    # the base layer instead of building it twice
+    with open(generations / "lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        current = link.resolve() if link.is_symlink() else None
+        stamp = None
+        if current is not None:
+            try:
+                stamp = json.loads((current / ".pyvarium" / "base.json").read_text())
+            except (OSError, ValueError):
+                pass
+
+        if stamp == expected and not refresh:
+            logger.info(f"Using base layer {current}")
+            return current
+
+        # The layer is built at its final path as the view and venv contain
+        # absolute paths, the stamp is written last so an interrupted build is
+        # never linked to
+        path = Path(tempfile.mkdtemp(prefix="base-", dir=generations))
+        logger.info(f"Creating base layer for `{python}` in {path}")
+        try:
+            create(path, python, status)
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+        (path / ".pyvarium").mkdir(parents=True, exist_ok=True)
+        (path / ".pyvarium" / "base.json").write_text(json.dumps(expected))
+
+        replace_link(link, path)
+
+        for old_path in generations.iterdir():
+            if old_path.is_dir() and old_path not in (path, current):
+                logger.debug(f"Removing old base layer {old_path}")
+                shutil.rmtree(old_path, ignore_errors=True)
+
+    return path
+
 
 @app.callback(invoke_without_command=True)
-def main(path: Path = typer.Argument(..., file_okay=False)):
+def main(
+    path: Path = typer.Argument(..., file_okay=False),
+    base: str = typer.Option(
+        "",
+        help="Python spec of a cached base layer to start from, e.g. python@3.11, "
+        "instead of creating the environment from scratch",
+    ),
+    refresh_base: bool = typer.Option(
+        False, help="Rebuild the base layer even if it is already cached"
+    ),
+):
     """Create a new combined Spack and Pipenv environment."""
 
     if path.exists():
@@ -20,16 +133,14 @@ def main(path: Path = typer.Argument(..., file_okay=False)):
         )
         raise typer.Exit(code=1)
 
-    with Status("Spack setup") as status:
+    with Status("Creating environment") as status:
         se = spack.SpackEnvironment(path, status=status)
-        se.new()
-        se.add("python", "py-pip", "py-setuptools")
-        se.concretize()
-        se.install()
-
-    with Status("Pipenv setup") as status:
-        pe = pipenv.PipenvEnvironment(path, status=status)
-        pe.new(python_path=se.path / ".venv" / "bin" / "python")
-        if se_python := se.find_python_packages(only_names=True):
-            pe.add(*se_python)
-        pe.lock()
+        if not base:
+            create(path, "python", status)
+        else:
+            source = ensure_base(base, status, refresh=refresh_base)
+            se.clone(source)
+            pipenv.PipenvEnvironment(path, status=status).clone(source)
+
+        # The spack and pipenv packages share the view, so it is compiled once
+        report.precompile(se.precompile())
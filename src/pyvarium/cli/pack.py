@@ -0,0 +1,70 @@
+import bz2
+import gzip
+import lzma
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+import typer
+from loguru import logger
+from rich.status import Status
+
+from pyvarium.installers import spack
+from pyvarium.util import relocate
+
+app = typer.Typer(help="Pack the environment into a relocatable archive.")
+
+
+@contextmanager
+def open_output(output: Path, level: int) -> Iterator[IO[bytes]]:
+    """Open the archive for writing, compressed according to its suffix, `-` writes
+    a gzip compressed archive to stdout."""
+    if str(output) == "-":
+        with gzip.GzipFile(
+            fileobj=sys.stdout.buffer, mode="wb", compresslevel=level
+        ) as f:
+            yield f
+    elif output.name.endswith((".tar.gz", ".tgz")):
+        with gzip.open(output, "wb", compresslevel=level) as f:
+            yield f
+    elif output.name.endswith(".tar.xz"):
+        with lzma.open(output, "wb", preset=level) as f:
+            yield f
+    elif output.name.endswith(".tar.bz2"):
+        with bz2.open(output, "wb", compresslevel=level) as f:
+            yield f
+    elif output.name.endswith(".tar"):
+        with output.open("wb") as f:
+            yield f
+    else:
+        raise typer.BadParameter(
+            "Archive has to end in .tar.gz, .tgz, .tar.xz, .tar.bz2, or .tar",
+            param_hint="OUTPUT",
+        )
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    output: Path = typer.Argument(..., dir_okay=False, help="Archive to write, or -"),
+    path: Path = typer.Option(".", file_okay=False),
+    level: int = typer.Option(6, min=1, max=9, help="Compression level"),
+    workers: int = typer.Option(8, min=1, help="Number of threads reading files"),
+):
+    path = path.resolve()
+    se = spack.SpackEnvironment(path)
+
+    if not se.view_path.is_dir():
+        logger.error(f"No view at {se.view_path}, install the environment first")
+        raise typer.Exit(code=1)
+
+    with Status("Packing environment") as status, open_output(output, level) as f:
+        rewritten = relocate.pack(
+            se.view_path,
+            f,
+            prefixes=relocate.view_prefixes(se.view_path),
+            max_workers=workers,
+            progress=lambda name: status.update(f"Packing environment: {name}"),
+        )
+
+    logger.info(f"Packed {se.view_path}, relocated paths in {len(rewritten)} files")
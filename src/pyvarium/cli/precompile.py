@@ -0,0 +1,41 @@
+from enum import Enum
+from pathlib import Path
+from typing import Optional
+
+import typer
+from rich.status import Status
+
+from pyvarium.installers import spack
+from pyvarium.util import report
+
+app = typer.Typer(help="Compile the python packages of the environment to bytecode.")
+
+
+class InvalidationMode(str, Enum):
+    timestamp = "timestamp"
+    checked_hash = "checked-hash"
+    unchecked_hash = "unchecked-hash"
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    path: Path = typer.Option(".", file_okay=False),
+    invalidation_mode: InvalidationMode = typer.Option(
+        InvalidationMode.timestamp,
+        help="How python checks that the bytecode is up to date, use unchecked-hash "
+        "for read-only deployments",
+    ),
+    workers: Optional[int] = typer.Option(
+        None, min=1, help="Number of processes [default: number of cores]"
+    ),
+):
+    path = path.resolve()
+
+    # The spack and pipenv packages share the view, so it is compiled once
+    with Status("Compiling python packages") as status:
+        se = spack.SpackEnvironment(path, status=status)
+        report.precompile(
+            se.precompile(
+                invalidation_mode=invalidation_mode.value, max_workers=workers
+            )
+        )
@@ -0,0 +1,44 @@
+from pathlib import Path
+from typing import Optional
+
+import typer
+from loguru import logger
+from rich.status import Status
+
+from pyvarium.installers import pipenv
+
+app = typer.Typer(help="Download the packages in Pipfile.lock into the shared cache.")
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    path: Path = typer.Option(".", file_okay=False),
+    dest: Optional[Path] = typer.Option(
+        None,
+        file_okay=False,
+        help="Directory to download to [default: wheelhouse in cache_dir]",
+    ),
+    dev: bool = typer.Option(False, help="Also download the dev-packages"),
+    python: Optional[Path] = typer.Option(
+        None,
+        dir_okay=False,
+        help="Python to download compatible wheels for [default: python of the venv]",
+    ),
+    workers: int = typer.Option(8, min=1, help="Number of concurrent downloads"),
+):
+    path = path.resolve()
+    dest = (dest or pipenv.wheelhouse_path()).resolve()
+
+    with Status("Prefetching packages") as status:
+        pe = pipenv.PipenvEnvironment(path, status=status)
+        res = pe.prefetch(dest, develop=dev, python=python, max_workers=workers)
+
+    logger.info(
+        f"Downloaded {len(res.downloaded)} files to {dest}, "
+        f"{len(res.skipped)} were already there"
+    )
+
+    if res.failed:
+        for name, error in res.failed.items():
+            logger.error(f"Failed to fetch {name}: {error}")
+        raise typer.Exit(1)
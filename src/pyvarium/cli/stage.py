@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import typer
+from loguru import logger
+from rich.status import Status
+
+from pyvarium.installers import spack
+from pyvarium.util import relocate
+from pyvarium.util.stage import stage
+
+app = typer.Typer(help="Mirror the environment to node-local storage.")
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    to: Path = typer.Option(
+        ..., help="Path to stage to, the environment is available at TO/.venv"
+    ),
+    path: Path = typer.Option(".", file_okay=False),
+    workers: int = typer.Option(16, min=1, help="Number of threads copying files"),
+):
+    path = path.resolve()
+    se = spack.SpackEnvironment(path)
+
+    if not se.view_path.is_dir():
+        logger.error(f"No view at {se.view_path}, install the environment first")
+        raise typer.Exit(code=1)
+
+    with Status("Staging environment") as status:
+        try:
+            res = stage(
+                se.view_path,
+                to,
+                prefixes=relocate.view_prefixes(se.view_path),
+                max_workers=workers,
+                progress=lambda name: status.update(f"Staging environment: {name}"),
+            )
+        except FileExistsError as e:
+            logger.error(str(e))
+            raise typer.Exit(code=1)
+
+    if res.changed:
+        logger.info(
+            f"Staged to {res.path}: {res.copied} files copied, "
+            f"{res.linked} unchanged files linked"
+        )
+    else:
+        logger.info(f"Stage at {to} is up to date")
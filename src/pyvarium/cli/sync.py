@@ -1,6 +1,7 @@
 from pathlib import Path
 
 import typer
+from loguru import logger
 from rich.status import Status
 
 from pyvarium.installers import pipenv, spack
@@ -15,5 +16,13 @@ def main(path: Path = typer.Option(".", file_okay=False)):
     with Status("Syncing Spack and Pipenv packages") as status:
         se = spack.SpackEnvironment(path, status=status)
         pe = pipenv.PipenvEnvironment(path, status=status)
-        if se_python := se.find_python_packages(only_names=True):
-            pe.add(*se_python)
+        pins = {p["name"]: p["version"] for p in se.find_python_packages()}
+        diff = pe.sync_pins(pins)
+
+        if not diff:
+            logger.info("Pipenv is already in sync with Spack")
+        else:
+            logger.info(
+                f"Synced Spack python packages: {len(diff.added)} added, "
+                f"{len(diff.changed)} changed, {len(diff.removed)} removed"
+            )
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import typer
+from loguru import logger
+from rich.status import Status
+
+from pyvarium.util import relocate
+
+app = typer.Typer(help="Unpack an environment archive created by pack.")
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    archive: Path = typer.Argument(..., dir_okay=False, help="Archive to read, or -"),
+    dest: Path = typer.Argument(..., file_okay=False),
+):
+    if (dest / ".venv").exists():
+        logger.error(
+            f"Environment already exists at path {dest.absolute()}\n"
+            "Remove it or use another path to continue."
+        )
+        raise typer.Exit(code=1)
+
+    with Status("Unpacking environment"):
+        if str(archive) == "-":
+            venv = relocate.unpack(sys.stdin.buffer, dest)
+        else:
+            with archive.open("rb") as f:
+                venv = relocate.unpack(f, dest)
+
+    logger.info(f"Unpacked to {venv}, activate with `source {venv}/bin/activate`")
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Callable, Dict
 
 import typer
 from rich.status import Status
@@ -12,41 +13,91 @@ app = typer.Typer(
 
 
 @app.callback(invoke_without_command=True)
-def main(path: Path = typer.Option(".", file_okay=False), fix: bool = False):
+def main(
+    path: Path = typer.Option(".", file_okay=False),
+    fix: bool = False,
+    full: bool = typer.Option(
+        False, help="Check all packages, not only those changed since the last run"
+    ),
+    checksums: bool = typer.Option(
+        False, help="Also check the contents of installed files against their hashes"
+    ),
+):
     path = path.resolve()
 
     with Status("Checking status of Spack packages in view") as status:
         se = spack.SpackEnvironment(path, status=status)
-        warnings = se.verify()
+        warnings = se.verify(full=full)
 
         if all(len(w) == 0 for w in warnings.values()):
             logger.info("All packages in view are correctly symlinked to spack")
-            raise typer.Exit(0)
-
-        for path, warning in warnings.items():
-            package_name = path.name
-            if len(warning) > 0:
-                logger.warning(
-                    f"[bold]{package_name}[/bold] has "
-                    f"[bold red]{len(warning)}[/bold red] files which are not linked correctly"
-                )
-                if fix:
-                    logger.info(f"Fixing {package_name}")
-                    for file, target in warning:
-                        if file.exists():
-                            file.unlink()
-                        file.symlink_to(target)
-
-        if fix:
-            logger.info("Re-checking status of Spack packages in view")
-            warnings = se.verify()
-            if all(len(w) == 0 for w in warnings.values()):
-                logger.info("All packages in view are correctly symlinked to spack")
-                raise typer.Exit(0)
-            else:
-                broken_packages = [p.name for p in warnings if len(warnings[p]) > 0]
-                logger.error(
-                    f"Some packages are still not linked correctly: {broken_packages}"
-                )
-
-        raise typer.Exit(1)
+            ok = True
+        else:
+            ok = check_links(se, path, warnings, fix)
+
+        if checksums:
+            status.update("Checking checksums of Spack package files")
+            ok = check_checksums(se, full) and ok
+
+        raise typer.Exit(0 if ok else 1)
+
+
+def package_names(se: spack.SpackEnvironment, path: Path) -> Callable[[Path], str]:
+    lock = se.read_lock() if (path / "spack.lock").is_file() else None
+
+    def package_name(package_path: Path) -> str:
+        package_name = package_path.name
+        if lock is not None and len(specs := lock.find(package_name)) == 1:
+            package_name = f"{package_name}@{specs[0].version}"
+        return package_name
+
+    return package_name
+
+
+def check_links(
+    se: spack.SpackEnvironment, path: Path, warnings: Dict[Path, list], fix: bool
+) -> bool:
+    package_name = package_names(se, path)
+
+    for package_path, warning in warnings.items():
+        if len(warning) > 0:
+            logger.warning(
+                f"[bold]{package_name(package_path)}[/bold] has "
+                f"[bold red]{len(warning)}[/bold red] files which are not linked correctly"
+            )
+
+    if fix:
+        logger.info("Fixing links of broken packages")
+        warnings = se.repair(warnings)
+        logger.info("Re-checked status of repaired files")
+        if all(len(w) == 0 for w in warnings.values()):
+            logger.info("All packages in view are correctly symlinked to spack")
+            return True
+        else:
+            broken_packages = [p.name for p in warnings if len(warnings[p]) > 0]
+            logger.error(
+                f"Some packages are still not linked correctly: {broken_packages}"
+            )
+
+    return False
+
+
+def check_checksums(se: spack.SpackEnvironment, full: bool) -> bool:
+    corrupted = se.verify_checksums(full=full)
+
+    if all(len(c) == 0 for c in corrupted.values()):
+        logger.info("All files in spack packages match their checksums")
+        return True
+
+    package_name = package_names(se, se.path)
+    for package_path, files in corrupted.items():
+        if len(files) > 0:
+            logger.error(
+                f"[bold]{package_name(package_path)}[/bold] has "
+                f"[bold red]{len(files)}[/bold red] files which do not match their "
+                "checksum, reinstall it with spack"
+            )
+            for file, _ in files:
+                logger.debug(f"Checksum mismatch: {file}")
+
+    return False
@@ -0,0 +1,31 @@
+from pathlib import Path
+from typing import Optional
+
+import typer
+from loguru import logger
+from rich.status import Status
+
+from pyvarium.installers import pipenv
+
+app = typer.Typer(help="Build wheels for the packages in Pipfile.lock.")
+
+
+@app.callback(invoke_without_command=True)
+def main(
+    path: Path = typer.Option(".", file_okay=False),
+    dest: Optional[Path] = typer.Option(
+        None,
+        file_okay=False,
+        help="Directory to write the wheels to [default: wheelhouse in cache_dir]",
+    ),
+    dev: bool = typer.Option(False, help="Also build wheels for the dev-packages"),
+):
+    path = path.resolve()
+    dest = (dest or pipenv.wheelhouse_path()).resolve()
+
+    with Status("Building wheels") as status:
+        pe = pipenv.PipenvEnvironment(path, status=status)
+        built = pe.build_wheels(dest, develop=dev, stream=True)
+
+    if built:
+        logger.info(f"Built {len(built)} wheels in {dest}")
@@ -47,6 +47,23 @@ class Settings(BaseSettings):
     pipx: Optional[FilePath]
     poetry: Optional[FilePath]
     spack: Optional[FilePath]
+    spack_server: bool = False
+    cache_dir: Path = Path("~/.cache/pyvarium")
+    #: Install python packages only from the wheelhouse, without contacting an index
+    pip_offline: bool = False
+    #: Maximum size of the shared concretization cache in MiB, 0 disables it
+    concretize_cache_size: int = 0
+    #: Directory of a local spack buildcache to install from and push to, if set
+    buildcache: str = ""
+    #: Push to the buildcache unsigned and do not verify signatures when installing
+    #: from it, instead of signing with the default spack gpg key
+    buildcache_unsigned: bool = False
+    #: Concurrent `spack install` processes, each installing part of the root specs
+    install_workers: int = 1
+    #: Build jobs per install worker, 0 to pick from the available cores and memory
+    install_jobs: int = 0
+    #: Memory in MiB to allow for each build job when picking the number of jobs
+    memory_per_job: int = 2048
     __dynaconf_settings__: Optional[Dynaconf]
 
     @root_validator
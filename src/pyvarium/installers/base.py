@@ -1,13 +1,58 @@
+import asyncio
+import collections
+import hashlib
 import os
+import re
 import subprocess
 import sys
+import tempfile
+import time
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import IO, Callable, Dict, List, Optional, Union
 
 from loguru import logger
+from rich.markup import escape
 from rich.status import Status
 
 from pyvarium.config import settings
+from pyvarium.util.cache import ResultCache, fingerprint
+
+#: Number of lines of streamed output kept in memory for error reporting
+OUTPUT_TAIL_LINES = 200
+
+
+class OutputSink:
+    """Receives streamed command output line by line, forwarding it to the status and
+    a log file while only keeping the last `max_lines` lines in memory."""
+
+    def __init__(
+        self,
+        update_status: Callable[[str], None],
+        log_file: Optional[IO[bytes]] = None,
+        max_lines: int = OUTPUT_TAIL_LINES,
+    ):
+        self.update_status = update_status
+        self.log_file = log_file
+        self.tail: collections.deque = collections.deque(maxlen=max_lines)
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, *_) -> None:
+        if self.log_file is not None:
+            self.log_file.close()
+
+    def write(self, line: bytes) -> None:
+        if self.log_file is not None:
+            self.log_file.write(line)
+
+        self.tail.append(line)
+
+        if text := line.decode(errors="replace").strip():
+            self.update_status(escape(text))
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.tail)
 
 
 class Program:
@@ -37,6 +82,8 @@ class Program:
         self.executable = Path(executable)
 
         self.cwd = Path.cwd()
+        #: Directory for logs of streamed commands, no logs are written if `None`
+        self.log_dir: Optional[Path] = None
         self.env = os.environ.copy()
         self.env.clear()
         # FIX: something somewhere in pipenv/python test PATH to `None`, which then
@@ -51,9 +98,13 @@ class Program:
     def __post_init__(self):
         ...
 
-    def cmd(self, *args) -> subprocess.CompletedProcess:
+    def cmd(self, *args, stream: bool = False) -> subprocess.CompletedProcess:
         logger.debug(f"`{self.executable.name} {' '.join(args)}`")
         self.update_status(f"`{self.executable.name} {' '.join(args)}`")
+
+        if stream:
+            return self._stream(*args)
+
         res = subprocess.run(
             [self.executable, *args],
             cwd=self.cwd,
@@ -61,10 +112,102 @@ class Program:
             capture_output=True,
         )
 
+        return self._check(res)
+
+    async def acmd(self, *args, stream: bool = False) -> subprocess.CompletedProcess:
+        """Asynchronous version of `cmd`, allows multiple commands to run at once."""
+        logger.debug(f"`{self.executable.name} {' '.join(args)}`")
+        self.update_status(f"`{self.executable.name} {' '.join(args)}`")
+
+        if stream:
+            return await self._astream(*args)
+
+        proc = await asyncio.create_subprocess_exec(
+            self.executable,
+            *args,
+            cwd=self.cwd,
+            env=self.env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+
+        res = subprocess.CompletedProcess(
+            [self.executable, *args], proc.returncode, stdout, stderr  # type: ignore
+        )
+
+        return self._check(res)
+
+    def _stream(self, *args) -> subprocess.CompletedProcess:
+        """Run a command with stderr merged into stdout, handling the output line by
+        line instead of buffering all of it. The returned `stdout` only contains the
+        last `OUTPUT_TAIL_LINES` lines, the full output is in the log file."""
+        with self._output_sink(*args) as sink:
+            with subprocess.Popen(
+                [self.executable, *args],
+                cwd=self.cwd,
+                env=self.env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            ) as proc:
+                for line in proc.stdout:  # type: ignore
+                    sink.write(line)
+
+            res = subprocess.CompletedProcess(
+                proc.args, proc.returncode, sink.getvalue(), b""
+            )
+
+        return self._check(res, sink)
+
+    async def _astream(self, *args) -> subprocess.CompletedProcess:
+        with self._output_sink(*args) as sink:
+            proc = await asyncio.create_subprocess_exec(
+                self.executable,
+                *args,
+                cwd=self.cwd,
+                env=self.env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=2**20,
+            )
+
+            while line := await proc.stdout.readline():  # type: ignore
+                sink.write(line)
+
+            await proc.wait()
+
+            res = subprocess.CompletedProcess(
+                [self.executable, *args], proc.returncode, sink.getvalue(), b""
+            )
+
+        return self._check(res, sink)
+
+    def _output_sink(self, *args) -> OutputSink:
+        if self.log_dir is None:
+            return OutputSink(self.update_status)
+
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        words = [a for a in args if re.fullmatch(r"[a-z][\w-]*", a)][:2]
+        prefix = [time.strftime("%Y%m%d-%H%M%S"), self.executable.name, *words, ""]
+        log_file = tempfile.NamedTemporaryFile(
+            dir=self.log_dir,
+            prefix="-".join(prefix),
+            suffix=".log",
+            delete=False,
+        )
+        logger.debug(f"Writing output to {log_file.name}")
+
+        return OutputSink(self.update_status, log_file)
+
+    def _check(
+        self, res: subprocess.CompletedProcess, sink: Optional[OutputSink] = None
+    ) -> subprocess.CompletedProcess:
         logger.debug(res)
 
         if res.returncode != 0:
-            logger.error(res.stderr.decode())
+            logger.error((res.stderr or res.stdout).decode(errors="replace"))
+            if sink is not None and sink.log_file is not None:
+                logger.error(f"Full output written to {sink.log_file.name}")
             raise RuntimeError(
                 f"Process return code is not 0: {res.args=}, {res.returncode=}"
             )
@@ -76,12 +219,27 @@ class Program:
 
     @property
     def version(self) -> str:
-        out = self.cmd("--version").stdout
+        def get_version() -> str:
+            out = self.cmd("--version").stdout
 
-        if type(out) is bytes:
-            return out.decode().strip()
-        else:
-            return out.strip()
+            if type(out) is bytes:
+                return out.decode().strip()
+            else:
+                return out.strip()
+
+        executable = self.executable.resolve()
+        key = hashlib.sha256(str(executable).encode()).hexdigest()[:16]
+        cache = ResultCache(settings.cache_dir.expanduser() / "versions")
+
+        return cache.cached(
+            f"{self.__class__.__name__.lower()}-{key}",
+            fingerprint(*self.version_inputs()),
+            get_version,
+        )
+
+    def version_inputs(self) -> List[Path]:
+        """Files which change when the version of the program changes."""
+        return [self.executable.resolve()]
 
 
 class Environment:
@@ -98,6 +256,8 @@ class Environment:
         self.program = program or self.__annotations__["program"](
             post_init=post_init, status=status
         )
+        self.program.log_dir = self.state_path / "logs"
+        self.cache = ResultCache(self.state_path / "cache")
 
         if post_init:
             self.__post_init__()
@@ -105,7 +265,15 @@ class Environment:
     def __post_init__(self):
         ...
 
-    def cmd(self, *args) -> subprocess.CompletedProcess:
+    @property
+    def state_path(self) -> Path:
+        """Directory for files pyvarium keeps about the environment (logs, caches)."""
+        return self.path / ".pyvarium"
+
+    def cmd(self, *args, stream: bool = False) -> subprocess.CompletedProcess:
+        ...
+
+    async def acmd(self, *args, stream: bool = False) -> subprocess.CompletedProcess:
         ...
 
     def new(self):
@@ -114,5 +282,11 @@ class Environment:
     def add(self, packages: list):
         ...
 
-    def install(self):
+    async def aadd(self, packages: list):
+        ...
+
+    def install(self, *, stream: bool = False):
+        ...
+
+    async def ainstall(self, *, stream: bool = False):
         ...
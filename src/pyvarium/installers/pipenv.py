@@ -1,7 +1,22 @@
+import asyncio
+import json
+import shutil
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 
+from loguru import logger
+from packaging.utils import parse_wheel_filename
+from packaging.version import InvalidVersion, Version
+
+from pyvarium.config import settings
+from pyvarium.installers import pipfile
 from pyvarium.installers.base import Environment, Program
+from pyvarium.util import fs, prefetch, python_venv
+from pyvarium.util.distributions import canonicalize_name, find_distributions
 
 PIPFILE = """[[source]]
 url = "https://pypi.org/simple"
@@ -15,10 +30,33 @@ name = "pypi"
 """
 
 
+#: Default number of concurrent pip downloads used by `install_locked`
+LOCKED_INSTALL_WORKERS = 8
+
+
+def wheelhouse_path() -> Path:
+    """Default directory of the local wheelhouse built by `pyvarium wheelhouse`."""
+    return settings.cache_dir.expanduser() / "wheelhouse"
+
+
 class Pipenv(Program):
     def __post_init__(self):
         self.env["PIPENV_VENV_IN_PROJECT"] = "1"
 
+        # Share the download and wheel caches between all environments
+        cache_dir = settings.cache_dir.expanduser()
+        self.env["PIP_CACHE_DIR"] = str(cache_dir / "pip")
+        self.env["PIPENV_CACHE_DIR"] = str(cache_dir / "pipenv")
+        wheelhouse = wheelhouse_path()
+        if wheelhouse.is_dir():
+            self.env["PIP_FIND_LINKS"] = str(wheelhouse)
+
+        # Find links alone are only an extra source, pip still asks the index
+        if settings.pip_offline:
+            if not wheelhouse.is_dir():
+                logger.warning(f"pip_offline is set but there is no {wheelhouse}")
+            self.env["PIP_NO_INDEX"] = "1"
+
 
 class PipenvEnvironment(Environment):
     program: Pipenv
@@ -36,24 +74,434 @@ class PipenvEnvironment(Environment):
         *,
         python_path: Optional[Path] = None,
     ):
-        commands = []
+        self.init_pipfile()
+        return self.init_venv(python_path=python_path)
 
-        if python_path is not None:
-            commands.extend([f"--python={str(python_path.absolute())}"])
-        else:
-            commands.extend(["--three"])
+    async def anew(
+        self,
+        *,
+        python_path: Optional[Path] = None,
+    ):
+        self.init_pipfile()
+        return await self.ainit_venv(python_path=python_path)
 
+    def init_pipfile(self):
+        """Write the skeleton Pipfile, this does not need the venv to exist yet."""
         self.path.mkdir(exist_ok=True, parents=True)
 
         (self.path / "Pipfile").write_text(PIPFILE)
 
-        return self.program.cmd(*commands)
+    def init_venv(self, *, python_path: Optional[Path] = None):
+        """Create the `.venv` pipenv uses, in-process instead of through pipenv, for
+        `python_path` or the python of pyvarium if it is not given. pip is seeded
+        with `ensurepip` if the interpreter does not provide it already."""
+        venv = self.path / ".venv"
+        python_venv.create_venv(venv, python_path or Path(sys.executable))
+        python_venv.ensure_pip(venv)
+
+    async def ainit_venv(self, *, python_path: Optional[Path] = None):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, lambda: self.init_venv(python_path=python_path)
+        )
+
+    def clone(
+        self,
+        source: Path,
+        *,
+        python_path: Optional[Path] = None,
+        hardlink: bool = True,
+        max_workers: Optional[int] = None,
+    ) -> Counter:
+        """Copy the Pipfile, lock, and the packages pipenv installed into the `.venv`
+        of the environment at `source`.
+
+        Should be called after the spack view of this environment was created, the
+        view links are skipped and only regular files are cloned with reflinks where
+        the filesystem supports them, or hard links (unless `hardlink` is False).
+        Scripts are rewritten to the new venv. Returns the count of files per method.
+        """
+        source = source.absolute()
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name in ("Pipfile", "Pipfile.lock", ".pyvarium/sync.json"):
+            if (source / name).is_file():
+                (self.path / name).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(source / name, self.path / name)
+
+        source_venv = source / ".venv"
+        venv = (self.path / ".venv").absolute()
+        old_prefixes = {source_venv, source_venv.resolve()}
+
+        def ignore(path: Path) -> bool:
+            return (
+                path.name in (".spack", "__pycache__", "pyvenv.cfg")
+                or path.parent == Path("bin")
+                and path.name.startswith("activate")
+            )
+
+        def rewrite(src: Path, dst: Path) -> bool:
+            if src.parent.name != "bin":
+                return False
+            return python_venv.relocate_script(src, dst, old_prefixes, venv)
+
+        counts = fs.clone_tree(
+            source_venv.resolve(),
+            venv.resolve(),
+            ignore=ignore,
+            hardlink=hardlink,
+            rewrite=rewrite,
+            max_workers=max_workers,
+        )
+
+        self.init_venv(python_path=python_path or venv / "bin" / "python")
+
+        return counts
+
+    def add(self, *packages, stream: bool = False):
+        return self.program.cmd("--site-packages", "install", *packages, stream=stream)
+
+    async def aadd(self, *packages, stream: bool = False):
+        return await self.program.acmd(
+            "--site-packages", "install", *packages, stream=stream
+        )
+
+    def install(self, *, stream: bool = False):
+        return self.program.cmd("--site-packages", "install", stream=stream)
+
+    async def ainstall(self, *, stream: bool = False):
+        return await self.program.acmd("--site-packages", "install", stream=stream)
+
+    def install_locked(
+        self, *, max_workers: Optional[int] = None, stream: bool = False
+    ) -> bool:
+        """Install exactly the packages in `Pipfile.lock` with pip, without going
+        through pipenv.
+
+        The artifacts of packages which are not installed yet are downloaded and
+        verified against the lock hashes concurrently, then installed by a single
+        pip process with `--no-deps`, as the lock already contains all dependencies.
+        Returns False without doing anything if the lock is missing or out of date,
+        has requirements which are not locked to a version (VCS, editable, or local
+        paths), or there is no venv yet, in which case `install` has to be used.
+        """
+        lockfile = pipfile.read_lockfile(self.path / "Pipfile.lock")
+        if not pipfile.lock_is_current(
+            pipfile.read_pipfile(self.path / "Pipfile"), lockfile
+        ):
+            logger.info("Pipfile.lock is missing or out of date, using pipenv")
+            return False
+
+        if unpinned := pipfile.unpinned_requirements(lockfile):
+            logger.info(
+                f"Pipfile.lock has requirements without a version, using pipenv: "
+                f"{', '.join(unpinned)}"
+            )
+            return False
+
+        python = self.path / ".venv" / "bin" / "python"
+        if not python.is_file():
+            return False
+
+        installed = {
+            (canonicalize_name(d["name"]), d["version"])
+            for d in find_distributions(
+                sorted((self.path / ".venv" / "lib").glob("python*/site-packages"))
+            )
+        }
+        missing = [
+            r
+            for r in pipfile.locked_requirements(lockfile)
+            if (canonicalize_name(r.name), r.version) not in installed
+        ]
+        if not missing:
+            logger.info("All packages in Pipfile.lock are already installed")
+            return True
+
+        workers = min(max_workers or LOCKED_INSTALL_WORKERS, len(missing))
+        groups = [missing[i::workers] for i in range(workers)]
+        logger.info(
+            f"Downloading {len(missing)} locked packages with {workers} workers"
+        )
+
+        pip = Program(python, post_init=False)
+        pip.env = self.program.env
+        pip.cwd = self.path
+        pip.log_dir = self.program.log_dir
+        pip.update_status = self.program.update_status
+
+        downloads = self.state_path / "downloads"
+        hash_args = ["--require-hashes"] if all(r.hashes for r in missing) else []
+        requirement_files = []
+        for i, group in enumerate(groups):
+            requirement_file = self.state_path / f"locked-{i}.txt"
+            requirement_file.parent.mkdir(parents=True, exist_ok=True)
+            requirement_file.write_text(pipfile.requirements_txt(group))
+            requirement_files.append(str(requirement_file))
+
+        def download(requirement_file: str):
+            return pip.cmd(
+                *("-m", "pip", "download", "--no-deps", *hash_args),
+                *self._index_args(lockfile),
+                *("--dest", str(downloads), "--requirement", requirement_file),
+                stream=stream,
+            )
+
+        # Everything is downloaded and verified before anything is installed, so a
+        # bad artifact leaves the venv unchanged
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(download, requirement_files))
+
+        # Only downloads run in parallel, concurrent pip installs into the same
+        # site-packages race on shared directories like `bin` and namespace packages
+        pip.cmd(
+            *("-m", "pip", "install", "--no-deps", *hash_args),
+            *("--no-index", "--find-links", str(downloads)),
+            *(arg for f in requirement_files for arg in ("--requirement", f)),
+            stream=stream,
+        )
 
-    def add(self, *packages):
-        return self.program.cmd("--site-packages", "install", *packages)
+        return True
 
-    def install(self):
-        return self.program.cmd("--site-packages", "install")
+    @staticmethod
+    def _index_args(lockfile: Dict) -> List[str]:
+        sources = lockfile.get("_meta", {}).get("sources", [])
+        args = []
+        for i, source in enumerate(sources):
+            args.extend(
+                ["--index-url" if i == 0 else "--extra-index-url", source["url"]]
+            )
+            if not source.get("verify_ssl", True):
+                host = source["url"].split("://", 1)[-1].split("/", 1)[0]
+                args.extend(["--trusted-host", host])
+
+        return args
 
     def lock(self):
         return self.program.cmd("lock")
+
+    async def alock(self):
+        return await self.program.acmd("lock")
+
+    def build_wheels(
+        self, wheelhouse: Path, *, develop: bool = False, stream: bool = False
+    ) -> List[pipfile.LockedRequirement]:
+        """Build wheels for the packages in `Pipfile.lock` into `wheelhouse`, so that
+        later installs do not need to download or build them. Packages which already
+        have a wheel there are skipped, returns the requirements which were built."""
+        sections = ("default", "develop") if develop else ("default",)
+        lockfile = pipfile.read_lockfile(self.path / "Pipfile.lock")
+        requirements = pipfile.locked_requirements(lockfile, sections)
+
+        wheelhouse.mkdir(parents=True, exist_ok=True)
+        existing = set()
+        for wheel in wheelhouse.glob("*.whl"):
+            try:
+                name, version, _, _ = parse_wheel_filename(wheel.name)
+            except ValueError:
+                logger.warning(f"Ignoring invalid wheel filename {wheel.name}")
+                continue
+            existing.add((name, version))
+
+        def built(requirement: pipfile.LockedRequirement) -> bool:
+            try:
+                version = Version(requirement.version)
+            except InvalidVersion:
+                return False
+            return (canonicalize_name(requirement.name), version) in existing
+
+        missing = [r for r in requirements if not built(r)]
+        if not missing:
+            logger.info(f"All {len(requirements)} wheels are already in {wheelhouse}")
+            return []
+
+        requirements_file = self.state_path / "wheelhouse-requirements.txt"
+        requirements_file.parent.mkdir(parents=True, exist_ok=True)
+        requirements_file.write_text(pipfile.requirements_txt(missing))
+
+        self.program.cmd(
+            "run",
+            "pip",
+            "wheel",
+            "--no-deps",
+            "--wheel-dir",
+            str(wheelhouse),
+            "--requirement",
+            str(requirements_file),
+            stream=stream,
+        )
+
+        return missing
+
+    def prefetch(
+        self,
+        dest: Path,
+        *,
+        develop: bool = False,
+        python: Optional[Path] = None,
+        max_workers: Optional[int] = None,
+    ) -> prefetch.PrefetchResult:
+        """Download the artifacts of the packages in `Pipfile.lock` into `dest`.
+
+        The files of each package are looked up on the simple index of the source it
+        is locked from, and only those matching the lock hashes (or the locked
+        version, if there are no hashes) are downloaded. Of those, only the wheels
+        compatible with `python` (by default the python of the venv) are fetched,
+        or the sdists if there is no such wheel. Without an interpreter the files
+        for all platforms are downloaded. Packages which cannot be looked up are
+        recorded in `failed` by their requirement, like failed files.
+        """
+        sections = ("default", "develop") if develop else ("default",)
+        lockfile = pipfile.read_lockfile(self.path / "Pipfile.lock")
+        requirements = pipfile.locked_requirements(lockfile, sections)
+
+        sources = lockfile.get("_meta", {}).get("sources", [])
+        indexes = {s["name"]: s["url"] for s in sources}
+        default_index = sources[0]["url"] if sources else "https://pypi.org/simple"
+
+        venv_python = self.path / ".venv" / "bin" / "python"
+        if python is None and venv_python.is_file():
+            python = venv_python
+        if python is not None:
+            tags = prefetch.interpreter_tags(python)
+        else:
+            tags = None
+            logger.warning("There is no venv yet, downloading files for all platforms")
+
+        def artifacts(requirement: pipfile.LockedRequirement):
+            index = prefetch.SimpleIndex(
+                indexes.get(requirement.index or "", default_index)
+            )
+            hashes = {
+                h.split(":", 1)[1]
+                for h in requirement.hashes
+                if h.startswith("sha256:")
+            }
+            version = (canonicalize_name(requirement.name), requirement.version)
+
+            res = {}
+            try:
+                links = index.links(requirement.name)
+            except (OSError, ValueError) as e:
+                lookup_failures[requirement.line] = f"{index.url}: {e}"
+                return res
+
+            for link in links:
+                if "sha256" in link.hashes and hashes:
+                    if link.hashes["sha256"] in hashes:
+                        res[link.url] = hashes
+                elif prefetch.filename_version(link.filename) == version:
+                    res[link.url] = hashes or None
+
+            if tags is not None:
+                selected = set(prefetch.select_files(map(prefetch.filename, res), tags))
+                res = {u: h for u, h in res.items() if prefetch.filename(u) in selected}
+
+            if not res:
+                logger.warning(f"No files found for {requirement.line} on {index.url}")
+
+            return res
+
+        to_download = {}
+        lookup_failures: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for found in pool.map(artifacts, requirements):
+                to_download.update(found)
+
+        result = prefetch.prefetch(
+            to_download,
+            dest,
+            max_workers=max_workers,
+            progress=self.program.update_status,
+        )
+        result.failed.update(lookup_failures)
+
+        return result
+
+    @contextmanager
+    def transaction(self, *, stream: bool = False) -> Iterator["PipenvTransaction"]:
+        """Collect spack pins and packages to add, then write them to the Pipfile and
+        run a single `pipenv install` to resolve, lock, and install them together:
+
+        ```python
+        with pe.transaction() as t:
+            t.sync({"numpy": "1.23.2"})
+            t.add("cowsay")
+        ```
+        """
+        transaction = PipenvTransaction()
+        yield transaction
+        if args := self._commit(transaction):
+            self.program.cmd(*args, stream=stream)
+
+    @asynccontextmanager
+    async def atransaction(
+        self, *, stream: bool = False
+    ) -> AsyncIterator["PipenvTransaction"]:
+        transaction = PipenvTransaction()
+        yield transaction
+        if args := self._commit(transaction):
+            await self.program.acmd(*args, stream=stream)
+
+    def _commit(self, transaction: "PipenvTransaction") -> Optional[List[str]]:
+        """Write the changes of a transaction to the Pipfile, returning the pipenv
+        arguments to apply them, or `None` if the environment is already up to date."""
+        pipfile_path = self.path / "Pipfile"
+        lockfile_path = self.path / "Pipfile.lock"
+
+        if transaction.pins is not None:
+            state = self.state_path / "sync.json"
+            try:
+                previous = json.loads(state.read_text())["pins"]
+            except (OSError, ValueError, KeyError):
+                previous = {}
+
+            current = pipfile.read_pipfile(pipfile_path)
+            transaction.diff = pipfile.diff_pins(
+                transaction.pins,
+                current,
+                pipfile.read_lockfile(lockfile_path),
+                previous,
+            )
+            if transaction.diff:
+                pipfile.apply_diff(current, transaction.diff)
+                pipfile.write_pipfile(pipfile_path, current)
+            else:
+                logger.debug("Pipfile already has the spack python packages pinned")
+
+            state.parent.mkdir(parents=True, exist_ok=True)
+            state.write_text(json.dumps({"pins": transaction.pins}))
+
+        if transaction.packages or transaction.diff or not lockfile_path.is_file():
+            return ["--site-packages", "install", *transaction.packages]
+
+        return None
+
+    def sync_pins(
+        self, pins: Dict[str, str], *, stream: bool = False
+    ) -> pipfile.PinDiff:
+        """Pin the python packages provided by spack (names to versions) in the
+        Pipfile, only calling pipenv if pins were added, changed, or removed since
+        the last sync."""
+        with self.transaction(stream=stream) as transaction:
+            transaction.sync(pins)
+
+        return transaction.diff
+
+
+class PipenvTransaction:
+    """Changes to a Pipfile which are applied together by
+    `PipenvEnvironment.transaction`."""
+
+    def __init__(self) -> None:
+        self.pins: Optional[Dict[str, str]] = None
+        self.packages: List[str] = []
+        #: Changes made to the spack pins, set once the transaction is committed
+        self.diff = pipfile.PinDiff()
+
+    def sync(self, pins: Dict[str, str]) -> None:
+        """Pin exactly these python packages provided by spack."""
+        self.pins = dict(pins)
+
+    def add(self, *packages: str) -> None:
+        """Add requirements, in the same format as for `pipenv install`."""
+        self.packages.extend(packages)
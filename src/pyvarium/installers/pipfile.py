@@ -0,0 +1,226 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import rtoml
+
+from pyvarium.util.distributions import canonicalize_name
+
+
+def read_pipfile(path: Path) -> Dict[str, Any]:
+    """Parsed contents of a `Pipfile`, empty if it does not exist."""
+    try:
+        return rtoml.load(Path(path))
+    except FileNotFoundError:
+        return {}
+
+
+def write_pipfile(path: Path, pipfile: Dict[str, Any]) -> None:
+    Path(path).write_text(rtoml.dumps(pipfile))
+
+
+def read_lockfile(path: Path) -> Dict[str, Any]:
+    """Parsed contents of a `Pipfile.lock`, empty if it does not exist."""
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+#: Pipfile sections which are not package categories
+PIPFILE_SECTIONS = {
+    "source",
+    "packages",
+    "dev-packages",
+    "requires",
+    "scripts",
+    "pipenv",
+}
+
+
+def pipfile_hash(pipfile: Dict[str, Any]) -> str:
+    """Hash of a Pipfile as stored in `_meta.hash.sha256` of its lock file, computed
+    the same way as pipenv does."""
+    data = {
+        "_meta": {
+            "sources": pipfile.get("source", []),
+            "requires": pipfile.get("requires", {}),
+        },
+        "default": pipfile.get("packages", {}),
+        "develop": pipfile.get("dev-packages", {}),
+    }
+    for category, values in pipfile.items():
+        if category not in PIPFILE_SECTIONS and category not in ("default", "develop"):
+            data[category] = values
+
+    content = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def lock_is_current(pipfile: Dict[str, Any], lockfile: Dict[str, Any]) -> bool:
+    """Check that a lock file was created from the current contents of a Pipfile."""
+    locked_hash = lockfile.get("_meta", {}).get("hash", {}).get("sha256")
+    return bool(pipfile) and locked_hash == pipfile_hash(pipfile)
+
+
+def pipfile_packages(pipfile: Dict[str, Any]) -> Dict[str, Any]:
+    """Requirements in the `[packages]` section, keyed by canonical name."""
+    return {canonicalize_name(k): v for k, v in pipfile.get("packages", {}).items()}
+
+
+def locked_versions(lockfile: Dict[str, Any]) -> Dict[str, str]:
+    """Versions of the default packages in a lock file, keyed by canonical name."""
+    return {
+        canonicalize_name(k): v["version"].lstrip("=")
+        for k, v in lockfile.get("default", {}).items()
+        if "version" in v
+    }
+
+
+@dataclass
+class LockedRequirement:
+    """A package pinned to an exact version in a `Pipfile.lock`."""
+
+    name: str
+    version: str
+    hashes: List[str] = field(default_factory=list)
+    markers: Optional[str] = None
+    #: Name of the Pipfile source the package is locked from, if not the first
+    index: Optional[str] = None
+
+    @property
+    def line(self) -> str:
+        """Requirement line in the `requirements.txt` format, without hashes."""
+        line = f"{self.name}=={self.version}"
+        if self.markers:
+            line += f"; {self.markers}"
+        return line
+
+
+def locked_requirements(
+    lockfile: Dict[str, Any], sections=("default",)
+) -> List[LockedRequirement]:
+    """Packages locked to a version in the given sections of a lock file. Editable,
+    VCS, and local path requirements have no version and are skipped."""
+    requirements: Dict[str, LockedRequirement] = {}
+    for section in sections:
+        for name, entry in lockfile.get(section, {}).items():
+            version = entry.get("version", "")
+            if not version.startswith("==") or canonicalize_name(name) in requirements:
+                continue
+            requirements[canonicalize_name(name)] = LockedRequirement(
+                name=name,
+                version=version[2:],
+                hashes=list(entry.get("hashes", [])),
+                markers=entry.get("markers"),
+                index=entry.get("index"),
+            )
+
+    return list(requirements.values())
+
+
+def unpinned_requirements(lockfile: Dict[str, Any], sections=("default",)) -> List[str]:
+    """Names of the packages in the given sections of a lock file which are not
+    locked to a version, e.g. editable, VCS, and local path requirements."""
+    return [
+        name
+        for section in sections
+        for name, entry in lockfile.get(section, {}).items()
+        if not entry.get("version", "").startswith("==")
+    ]
+
+
+def requirements_txt(requirements: List[LockedRequirement]) -> str:
+    """Contents of a `requirements.txt` for locked requirements. Hashes are only
+    included if every requirement has them, as pip then requires them for all."""
+    with_hashes = all(r.hashes for r in requirements)
+    lines = []
+    for requirement in requirements:
+        line = requirement.line
+        if with_hashes:
+            line += "".join(f" --hash={h}" for h in requirement.hashes)
+        lines.append(line)
+
+    return "".join(f"{line}\n" for line in lines)
+
+
+def _pinned_version(requirement: Any) -> Optional[str]:
+    if isinstance(requirement, dict):
+        requirement = requirement.get("version")
+    if isinstance(requirement, str) and requirement.startswith("=="):
+        return requirement[2:]
+    return None
+
+
+@dataclass
+class PinDiff:
+    """Difference between the python packages provided by spack and the pins for
+    them in a Pipfile and its lock file."""
+
+    #: Pins for packages which are not in the Pipfile yet
+    added: Dict[str, str] = field(default_factory=dict)
+    #: Pins whose version differs from the Pipfile, or which are not locked
+    changed: Dict[str, str] = field(default_factory=dict)
+    #: Pipfile keys of previously synced pins which spack no longer provides
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def requirements(self) -> List[str]:
+        """Requirements to install for the added and changed pins."""
+        pins = {**self.added, **self.changed}
+        return [f"{name}=={version}" for name, version in pins.items()]
+
+
+def apply_diff(pipfile: Dict[str, Any], diff: PinDiff) -> None:
+    """Update the `[packages]` of a parsed Pipfile in place with the pins of `diff`,
+    replacing existing requirements under the same name."""
+    packages = pipfile.setdefault("packages", {})
+    keys = {canonicalize_name(k): k for k in packages}
+
+    for name in diff.removed:
+        packages.pop(name, None)
+
+    for name, version in {**diff.added, **diff.changed}.items():
+        packages[keys.get(canonicalize_name(name), name)] = f"=={version}"
+
+
+def diff_pins(
+    pins: Dict[str, str],
+    pipfile: Dict[str, Any],
+    lockfile: Dict[str, Any],
+    previous: Optional[Dict[str, str]] = None,
+) -> PinDiff:
+    """Compare `pins` (package names to versions) against a Pipfile and its lock.
+
+    `previous` are the pins of the last sync, these are used to find pins which are no
+    longer provided by spack. A pin is only removed if the Pipfile still has the
+    version it was synced with, so requirements edited by hand are left alone.
+    """
+    packages = pipfile_packages(pipfile)
+    locked = locked_versions(lockfile)
+    diff = PinDiff()
+
+    for name, version in pins.items():
+        key = canonicalize_name(name)
+        if key not in packages:
+            diff.added[name] = version
+        elif _pinned_version(packages[key]) != version or locked.get(key) != version:
+            diff.changed[name] = version
+
+    wanted = {canonicalize_name(name) for name in pins}
+    pipfile_keys = {canonicalize_name(k): k for k in pipfile.get("packages", {})}
+    for name, version in (previous or {}).items():
+        key = canonicalize_name(name)
+        if (
+            key not in wanted
+            and key in packages
+            and _pinned_version(packages[key]) == version
+        ):
+            diff.removed.append(pipfile_keys[key])
+
+    return diff
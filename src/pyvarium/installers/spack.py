@@ -1,20 +1,54 @@
+import asyncio
+import hashlib
 import json
+import os
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Literal, Union, overload, Dict
+from typing import Dict, List, Literal, Optional, Set, Tuple, Union, overload
 
 import yaml
 from loguru import logger
+from packaging.version import InvalidVersion, Version
 
+from pyvarium.config import settings
+from pyvarium.installers import spack_server
 from pyvarium.installers.base import Environment, Program
-from pyvarium.util import python_venv
+from pyvarium.installers.spack_lock import ConcreteSpec, SpackLock
+from pyvarium.util import precompile, python_venv, resources
+from pyvarium.util.cache import FileCache, fingerprint
+from pyvarium.util.distributions import find_distributions
+from pyvarium.util.lock import hash_file
+from pyvarium.verify import checksums, links, repair
+from pyvarium.verify.snapshot import VerifySnapshot
+
+#: Name of the mirror for the local buildcache in the environment configuration
+BUILDCACHE_MIRROR = "pyvarium"
+
+#: Configuration sections which affect the result of `spack concretize --reuse`
+CONCRETIZE_CONFIG_SECTIONS = (
+    "compilers",
+    "concretizer",
+    "config",
+    "mirrors",
+    "packages",
+    "repos",
+)
+
+#: Run with `spack python` to dump the merged configuration sections in one process
+_CONFIG_DUMP = (
+    "import json, spack.config; "
+    f"sections = {CONCRETIZE_CONFIG_SECTIONS!r}; "
+    "print(json.dumps({s: spack.config.get(s) for s in sections}, default=str))"
+)
 
 
 def recursive_dict_update(d, u):
     for k, v in u.items():
         if isinstance(v, dict):
-            r = recursive_dict_update(d.get(k, {}) if d is dict else {}, v)
+            current = d.get(k) if isinstance(d, dict) else None
+            r = recursive_dict_update(current if isinstance(current, dict) else {}, v)
             d[k] = r
         else:
             d[k] = v
@@ -25,7 +59,47 @@ def cmd_json_to_dict(cmd: subprocess.CompletedProcess) -> Dict:
     return json.loads(cmd.stdout.decode())
 
 
+def expand_config_path(path: str, spack_dir: Path) -> Path:
+    """Expand `$spack`, environment variables, and `~` in a path from spack config."""
+    path = path.replace("${spack}", str(spack_dir)).replace("$spack", str(spack_dir))
+    return Path(os.path.expandvars(path)).expanduser()
+
+
+def repo_digest(repo: Path) -> str:
+    """Digest of a package repository which does not need its files to be read.
+
+    For git checkouts (like the builtin repository of spack) this is the commit and
+    the stats of the files which differ from it, otherwise the stats of all files.
+    """
+
+    def git(*args: str) -> List[str]:
+        return subprocess.run(
+            ["git", "-C", str(repo), *args], capture_output=True, check=True, text=True
+        ).stdout.splitlines()
+
+    try:
+        head = git("rev-parse", "HEAD")
+        # Paths are relative to `repo`, uncommitted edits change their stats
+        changed = git(
+            "ls-files", "--modified", "--deleted", "--others", "--exclude-standard"
+        )
+    except (OSError, subprocess.CalledProcessError):
+        files = sorted(
+            Path(root) / name
+            for root, dirs, names in os.walk(repo)
+            for name in names
+            if "__pycache__" not in root
+        )
+        return fingerprint(*files)
+
+    h = hashlib.sha256("".join(head).encode())
+    h.update(fingerprint(*(repo / path for path in changed)).encode())
+    return h.hexdigest()
+
+
 class Spack(Program):
+    server: Optional[spack_server.SpackServer] = None
+
     def __post_init__(self):
         spack_dir = self.executable.parent.parent
         hooks_dir = spack_dir / "lib" / "spack" / "spack" / "hooks"
@@ -40,24 +114,120 @@ class Spack(Program):
             hooks_dir / "pyvarium_venv_activate.py",
         )
 
+    @property
+    def release(self) -> Version:
+        """Release of spack, without the commit which is part of the version of git
+        checkouts (e.g. `0.21.0.dev0 (a1b2c3d4e5)`)."""
+        try:
+            return Version(self.version.split()[0])
+        except (IndexError, InvalidVersion):
+            # Releases always have a valid version, so assume a recent development one
+            logger.warning(f"Could not parse spack version {self.version!r}")
+            return Version("9999")
+
+    def version_inputs(self) -> List[Path]:
+        spack_dir = self.executable.resolve().parent.parent
+        inputs = [self.executable.resolve(), spack_dir / "lib/spack/spack/__init__.py"]
+
+        # For git checkouts the version includes the commit, which changes when the
+        # file of the current branch in `.git/refs` is updated
+        git_head = spack_dir / ".git" / "HEAD"
+        if git_head.is_file():
+            inputs.append(git_head)
+            head = git_head.read_text().strip()
+            if head.startswith("ref: "):
+                inputs.append(spack_dir / ".git" / head[len("ref: ") :])
+
+        return inputs
+
+    def cmd(self, *args, stream: bool = False) -> subprocess.CompletedProcess:
+        if not stream and self._use_server(args):
+            if (res := self._server_cmd(*args)) is not None:
+                return res
+
+        return super().cmd(*args, stream=stream)
+
+    async def acmd(self, *args, stream: bool = False) -> subprocess.CompletedProcess:
+        if not stream and self._use_server(args):
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(None, lambda: self._server_cmd(*args))
+            if res is not None:
+                return res
+
+        return await super().acmd(*args, stream=stream)
+
+    def _use_server(self, args) -> bool:
+        if not settings.spack_server:
+            return False
+
+        return spack_server.subcommand(args) in spack_server.SERVER_COMMANDS
+
+    def _server_cmd(self, *args) -> Optional[subprocess.CompletedProcess]:
+        """Run a command via the spack command server, returns `None` if the server
+        is not usable, in which case the command should run in a subprocess."""
+        logger.debug(f"`{self.executable.name} {' '.join(args)}` (server)")
+        self.update_status(f"`{self.executable.name} {' '.join(args)}`")
+
+        try:
+            if (
+                self.server is None
+                or not self.server.alive
+                or self.server.env != self.env
+            ):
+                self.close_server()
+                self.server = spack_server.SpackServer(
+                    self.executable, self.cwd, self.env
+                )
+            res = self.server.run(list(args), self.cwd)
+        except (OSError, spack_server.SpackServerError) as e:
+            logger.warning(f"Spack command server failed, using subprocesses: {e}")
+            self.close_server()
+            return None
+
+        return self._check(res)
+
+    def close_server(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
 
 class SpackEnvironment(Environment):
     program: Spack
 
-    def cmd(self, *args):
-        return self.program.cmd("--env-dir", str(self.path), *args)
+    def cmd(self, *args, stream: bool = False):
+        return self.program.cmd("--env-dir", str(self.path), *args, stream=stream)
+
+    async def acmd(self, *args, stream: bool = False):
+        return await self.program.acmd(
+            "--env-dir", str(self.path), *args, stream=stream
+        )
 
     def new(self, *, view_path: Path = Path(".venv")):
+        res = self.program.cmd(*self._new_args(view_path))
+        self._configure_new(view_path)
+
+        return res
+
+    async def anew(self, *, view_path: Path = Path(".venv")):
+        res = await self.program.acmd(*self._new_args(view_path))
+        self._configure_new(view_path)
+
+        return res
+
+    def _new_args(self, view_path: Path) -> List[str]:
         commands = ["env", "create", "-d", str(self.path)]
 
         if view_path:
-            if not view_path.is_absolute():
-                view_path = self.path / view_path
             # Views are disabled here, as we set them manually via `set_config` to set
             # the link type to `run`
             commands.extend(["--without-view"])
 
-        res = self.program.cmd(*commands)
+        return commands
+
+    def _configure_new(self, view_path: Path) -> None:
+        if view_path and not view_path.is_absolute():
+            view_path = self.path / view_path
 
         self.set_config({"spack": {"concretizer": {"unify": True}}})
         self.set_config(
@@ -71,32 +241,388 @@ class SpackEnvironment(Environment):
             }
         )
 
-        return res
-
     def init_view(self):
         res = self.cmd("env", "view", "regenerate")
         python_venv.setup_scripts(self.path / ".venv")
         return res
 
+    def clone(self, source: Path):
+        """Copy `spack.yaml` and `spack.lock` of the environment at `source`, and
+        link the view to the specs which are already installed for it instead of
+        concretizing and installing again."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name in ("spack.yaml", "spack.lock"):
+            shutil.copy2(source / name, self.path / name)
+
+        self.set_config(
+            {"spack": {"view": {"default": {"root": str(self.view_path.resolve())}}}}
+        )
+
+        return self.init_view()
+
     def add(self, *packages):
         return self.cmd("add", *packages)
 
-    def install(self):
+    async def aadd(self, *packages):
+        return await self.acmd("add", *packages)
+
+    def install(self, *, stream: bool = False):
+        plan = self.build_plan()
+        args = self._install_args(plan.jobs)
+
+        if groups := self._worker_groups(plan.workers):
+            with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                for _ in pool.map(lambda g: self.cmd(*args, *g, stream=stream), groups):
+                    pass
+
+        res = self.cmd(*args, stream=stream)
+        if self.buildcache is not None:
+            self.push_buildcache()
+
+        return res
+
+    async def ainstall(self, *, stream: bool = False):
+        plan = self.build_plan()
+        args = self._install_args(plan.jobs)
+
+        if groups := self._worker_groups(plan.workers):
+            await asyncio.gather(*(self.acmd(*args, *g, stream=stream) for g in groups))
+
+        res = await self.acmd(*args, stream=stream)
+        if self.buildcache is not None:
+            await self.apush_buildcache()
+
+        return res
+
+    def build_plan(self) -> resources.BuildPlan:
+        """Number of install workers and build jobs for the cores and memory
+        available, limited by the `install_*` and `memory_per_job` settings."""
+        plan = resources.plan_build(
+            resources.available_cores(),
+            resources.available_memory(),
+            workers=settings.install_workers,
+            jobs=settings.install_jobs,
+            memory_per_job=settings.memory_per_job,
+        )
+        logger.debug(f"Spack install plan: {plan}")
+
+        return plan
+
+    def _worker_groups(self, workers: int) -> List[List[str]]:
+        """Split the root specs between concurrent install workers, spack's install
+        locks make sure that shared dependencies are only built by one of them.
+
+        Afterwards a single install of the whole environment is still run, which
+        finds everything installed and only updates the view.
+        """
+        if workers <= 1 or not (self.path / "spack.lock").is_file():
+            return []
+
+        roots = [spec for spec in self.read_lock().roots if not spec.external]
+        if len(roots) <= 1:
+            return []
+
+        groups: List[List[str]] = [[] for _ in range(min(workers, len(roots)))]
+        for i, spec in enumerate(roots):
+            groups[i % len(groups)].append(f"/{spec.hash}")
+
+        logger.info(f"Installing with {len(groups)} concurrent spack workers")
+
+        return groups
+
+    def _install_args(self, jobs: Optional[int] = None) -> List[str]:
         if not (self.path / "spack.lock").exists():
             logger.warning("No spack.lock file found, nothing will be installed")
 
-        return self.cmd("install", "--only-concrete", "--no-add")
+        args = ["install", "--only-concrete", "--no-add"]
+        if jobs is not None:
+            args.append(f"--jobs={jobs}")
+
+        self.configure_buildcache()
+        if (
+            self.buildcache is not None
+            and settings.buildcache_unsigned
+            and self.program.release < Version("0.21")
+        ):
+            # Mirrors can only be marked as unsigned from spack 0.21 onwards
+            args.append("--no-check-signature")
+
+        return args
+
+    @property
+    def buildcache(self) -> Optional[Path]:
+        """Local directory buildcache set by the `buildcache` setting, if any."""
+        if not settings.buildcache:
+            return None
+
+        return Path(settings.buildcache).expanduser().absolute()
+
+    def configure_buildcache(self) -> None:
+        """Add the local buildcache as a mirror of the environment, so that spack
+        installs binaries from it instead of building them, or remove the mirror if
+        the `buildcache` setting is not set anymore.
+
+        Signatures are verified unless `buildcache_unsigned` is set, in which case
+        only this mirror is marked as unsigned, other mirrors are still verified.
+        Before spack 0.21 this is not possible, and `install` skips the signature
+        checks of all mirrors instead.
+        """
+        config = self.get_config()
+        mirrors = config.get("spack", {}).get("mirrors") or {}
+
+        if self.buildcache is None:
+            if BUILDCACHE_MIRROR in mirrors:
+                del mirrors[BUILDCACHE_MIRROR]
+                if not mirrors:
+                    del config["spack"]["mirrors"]
+                (self.path / "spack.yaml").write_text(yaml.dump(config))
+            return
+
+        mirror: Union[str, Dict] = f"file://{self.buildcache}"
+        if settings.buildcache_unsigned and self.program.release >= Version("0.21"):
+            mirror = {"url": mirror, "signed": False}
+
+        if mirrors.get(BUILDCACHE_MIRROR) != mirror:
+            self.set_config({"spack": {"mirrors": {BUILDCACHE_MIRROR: mirror}}})
+
+    def _buildcache_hashes(self) -> Set[str]:
+        """Hashes of the specs which are already in the local buildcache."""
+        if self.buildcache is None:
+            return set()
+
+        hashes = set()
+        for path in (self.buildcache / "build_cache").glob("*.spec.*"):
+            name = path.name.split(".spec.")[0]
+            hashes.add(name.rsplit("-", 1)[-1])
+
+        return hashes
+
+    def _push_args(
+        self,
+    ) -> Optional[Tuple[List[Tuple[ConcreteSpec, List[str]]], List[str]]]:
+        """Commands pushing each spec missing from the local buildcache, and the
+        command updating its index afterwards."""
+        if not (self.path / "spack.lock").is_file() or self.buildcache is None:
+            return None
+
+        existing = self._buildcache_hashes()
+        missing = [
+            spec
+            for spec in self.read_lock()
+            if not spec.external and spec.hash not in existing
+        ]
+        if not missing:
+            return None
+
+        logger.info(f"Pushing {len(missing)} specs to buildcache {self.buildcache}")
+        directory = str(self.buildcache)
+        # Signed with the default spack gpg key, unless signatures are not checked
+        signing = ["--unsigned"] if settings.buildcache_unsigned else []
+        if self.program.release >= Version("0.20"):
+            push = ["buildcache", "push", *signing, "--only", "package", directory]
+            update_index = ["buildcache", "update-index", directory]
+        else:
+            push = ["buildcache", "create", *signing, "--allow-root"]
+            push += ["--only", "package", "--directory", directory]
+            update_index = ["buildcache", "update-index", "--directory", directory]
+
+        # One spec per command, so that a spec which fails does not stop the others
+        return [(spec, [*push, f"/{spec.hash}"]) for spec in missing], update_index
+
+    def push_buildcache(self) -> None:
+        """Push the specs of the environment which are missing from the local
+        buildcache, failures are only logged as the install itself succeeded."""
+        if (push_args := self._push_args()) is None:
+            return
+
+        pushes, update_index = push_args
+        pushed = 0
+        for spec, args in pushes:
+            try:
+                self.cmd(*args)
+                pushed += 1
+            except RuntimeError as e:
+                logger.warning(f"Could not push {spec.format} to buildcache: {e}")
+
+        if pushed:
+            try:
+                self.cmd(*update_index)
+            except RuntimeError as e:
+                logger.warning(f"Could not update the buildcache index: {e}")
+
+    async def apush_buildcache(self) -> None:
+        if (push_args := self._push_args()) is None:
+            return
+
+        pushes, update_index = push_args
+        pushed = 0
+        for spec, args in pushes:
+            try:
+                await self.acmd(*args)
+                pushed += 1
+            except RuntimeError as e:
+                logger.warning(f"Could not push {spec.format} to buildcache: {e}")
+
+        if pushed:
+            try:
+                await self.acmd(*update_index)
+            except RuntimeError as e:
+                logger.warning(f"Could not update the buildcache index: {e}")
 
     # def spec(self, spec: str) -> Dict:
     #     res = self.cmd("spec", "-I", "--reuse", "--json", spec)
     #     return cmd_json_to_dict(res)
 
     def concretize(self):
-        return self.cmd("concretize", "--reuse")
+        key = self.concretize_key()
+        if key is not None and self._seed_lock(key):
+            return None
+
+        res = self.cmd("concretize", "--reuse")
+        self._store_lock(key)
+
+        return res
+
+    async def aconcretize(self):
+        # The key runs spack to read the configuration, so is built off the loop
+        loop = asyncio.get_running_loop()
+        key = await loop.run_in_executor(None, self.concretize_key)
+        if key is not None and self._seed_lock(key):
+            return None
+
+        res = await self.acmd("concretize", "--reuse")
+        self._store_lock(key)
+
+        return res
+
+    def concretize_key(self) -> Optional[str]:
+        """Key of the inputs of a concretization, identical for environments with the
+        same specs and configuration concretized by the same spack.
+
+        Includes the `spack.yaml` contents except for the view (which differs per
+        environment but does not affect the `spack.lock`), the spack version and
+        commit, the merged configuration of all scopes as spack sees it for the
+        environment (so site, system, and user config and `include:` files), and
+        the `repo_digest` of the package repositories. The install database is not
+        part of the key, so a cached concretization does not reuse specs which were
+        installed after it was made.
+
+        Returns `None`, so that the concretization is not cached, if the cache is
+        disabled or the configuration cannot be read.
+        """
+        if settings.concretize_cache_size <= 0:
+            return None
+
+        try:
+            config = yaml.safe_load((self.path / "spack.yaml").read_text()) or {}
+        except FileNotFoundError:
+            return None
+
+        config.get("spack", {}).pop("view", None)
+
+        try:
+            res = self.cmd("python", "-c", _CONFIG_DUMP)
+            sections = json.loads(res.stdout.decode().strip().splitlines()[-1])
+        except (RuntimeError, ValueError, IndexError) as e:
+            logger.warning(f"Not caching concretization, could not read config: {e}")
+            return None
+
+        spack_dir = self.program.executable.resolve().parent.parent
+
+        repos = sections.get("repos") or []
+        if isinstance(repos, dict):
+            repos = list(repos.values())
+        repo_paths = [
+            expand_config_path(r, spack_dir) for r in repos if isinstance(r, str)
+        ]
+
+        h = hashlib.sha256()
+        h.update(json.dumps(config, sort_keys=True, default=str).encode())
+        h.update(json.dumps(sections, sort_keys=True, default=str).encode())
+        h.update(f"{self.program.executable.resolve()}\n".encode())
+        h.update(f"{self.program.version}\n".encode())
+        for path in self.program.version_inputs():
+            h.update(f"{path}:{hash_file(path)}\n".encode())
+        for repo in repo_paths:
+            h.update(f"{repo}:{repo_digest(repo)}\n".encode())
+
+        return h.hexdigest()
+
+    @staticmethod
+    def _concretize_cache() -> FileCache:
+        return FileCache(
+            settings.cache_dir.expanduser() / "concretize",
+            settings.concretize_cache_size * 1024**2,
+        )
+
+    def _seed_lock(self, key: str) -> bool:
+        """Copy the `spack.lock` of an identical earlier concretization into the
+        environment, returns False if there is none."""
+        cached = self._concretize_cache().get(key, "spack.lock")
+        if cached is None:
+            return False
+
+        logger.info(f"Using cached concretization {key[:12]}")
+        tmp = self.path / f".spack.lock.{os.getpid()}.tmp"
+        shutil.copyfile(cached, tmp)
+        os.replace(tmp, self.path / "spack.lock")
+
+        return True
+
+    def _store_lock(self, key: Optional[str]) -> None:
+        lock = self.path / "spack.lock"
+        if key is None or not lock.is_file():
+            return
+
+        try:
+            self._concretize_cache().put(key, lock)
+        except OSError as e:
+            logger.warning(f"Could not store concretization in cache: {e}")
+
+    @property
+    def view_path(self) -> Path:
+        return self.path / ".venv"
+
+    def site_packages(self) -> List[Path]:
+        return sorted((self.view_path / "lib").glob("python*/site-packages"))
+
+    def precompile(
+        self,
+        *,
+        invalidation_mode: str = "timestamp",
+        max_workers: Optional[int] = None,
+    ) -> precompile.PrecompileResult:
+        """Write bytecode for the python packages in the view with its python, the
+        files linked from spack prefixes get their `__pycache__` in the view."""
+        return precompile.precompile(
+            self.view_path / "bin" / "python",
+            self.site_packages(),
+            invalidation_mode=invalidation_mode,
+            max_workers=max_workers,
+        )
+
+    def fingerprint(self) -> str:
+        """Fingerprint of the environment, changes when specs are added, concretized
+        or installed, or when python packages are added to or removed from the view."""
+        return fingerprint(
+            self.path / "spack.yaml",
+            self.path / "spack.lock",
+            self.view_path / ".spack",
+            self.view_path / "lib",
+            *self.site_packages(),
+        )
+
+    def read_lock(self) -> SpackLock:
+        """Read `spack.lock` directly, giving an indexed view of the concretized
+        specs without running spack."""
+        return SpackLock.from_file(self.path / "spack.lock")
 
     def find(self) -> Dict:
-        res = self.cmd("find", "--json")
-        return cmd_json_to_dict(res)
+        def find() -> Dict:
+            res = self.cmd("find", "--json")
+            return cmd_json_to_dict(res)
+
+        return self.cache.cached("find", self.fingerprint(), find)
 
     # def find_missing(self) -> Dict:
     #     res = self.cmd(
@@ -119,46 +645,73 @@ class SpackEnvironment(Environment):
     def find_python_packages(
         self, only_names: bool = False
     ) -> Union[List[str], List[dict]]:
-        cmd = "PYTHONNOUSERSITE=True .venv/bin/python -m pip list --format json --disable-pip-version-check"
-        res = subprocess.run(cmd, shell=True, capture_output=True, cwd=self.path)
-        logger.debug(res)
-        packages_json = res.stdout.decode().strip()
-
-        if not packages_json:
-            return []  # type: ignore
-
-        packages_dict: List[dict] = json.loads(packages_json)
+        packages_dict: List[dict] = self.cache.cached(
+            "python-packages",
+            self.fingerprint(),
+            lambda: find_distributions(self.site_packages()),
+        )
 
         if only_names:
             return [f"{p['name']}=={p['version']}" for p in packages_dict]
         else:
             return packages_dict
 
-    def verify(self) -> Dict[Path, list]:
-        view_path = self.path / ".venv"
-        packages = list((view_path / ".spack").iterdir())
-
-        package_warnings = {}
-
-        for package in packages:
-            self.program.update_status(f"{package.name}")
-            manifest_file = package / "install_manifest.json"
-            manifest = json.loads(manifest_file.read_text())
-            package_path = manifest_file.resolve().parent.parent
-            files = {
-                Path(k.replace(str(package_path), str(view_path))): Path(k)
-                for k, v in manifest.items()
-                if v["type"] == "file" and ".spack" not in k and "bin" not in k
-            }
+    def verify(
+        self, max_workers: Optional[int] = None, full: bool = False
+    ) -> Dict[Path, list]:
+        """Check the links of spack packages in the view. Only packages which changed
+        since the last run are checked, unless `full` is set."""
+        snapshot_path = self.state_path / "verify.json"
+        if full:
+            snapshot = VerifySnapshot(snapshot_path)
+        else:
+            snapshot = VerifySnapshot.load(snapshot_path)
+
+        packages = links.view_packages(self.view_path)
+        res = links.verify_view(
+            self.view_path,
+            packages,
+            max_workers=max_workers,
+            progress=self.program.update_status,
+            snapshot=snapshot,
+        )
 
-            warnings = []
-            for link, target in files.items():
-                if not link.resolve() == target.resolve():
-                    warnings.append((link, target))
+        snapshot.prune(packages)
+        snapshot.save()
 
-            package_warnings[package] = warnings
+        return res
+
+    def verify_checksums(
+        self, max_workers: Optional[int] = None, full: bool = False
+    ) -> Dict[Path, list]:
+        """Check the contents of the files of spack packages in the view against the
+        hashes in their install manifests. Files which have not changed since they
+        were last hashed are skipped, unless `full` is set."""
+        cache_path = self.state_path / "checksums.json"
+        if full:
+            cache = checksums.ChecksumCache(cache_path)
+        else:
+            cache = checksums.ChecksumCache.load(cache_path)
+
+        res = checksums.verify_checksums(
+            self.view_path,
+            max_workers=max_workers,
+            progress=self.program.update_status,
+            cache=cache,
+        )
 
-        return package_warnings
+        cache.save()
+
+        return res
+
+    def repair(
+        self, warnings: Dict[Path, list], max_workers: Optional[int] = None
+    ) -> Dict[Path, list]:
+        """Atomically replace the broken links found by `verify`, returning the links
+        which are still broken afterwards."""
+        return repair.repair_view(
+            warnings, max_workers=max_workers, progress=self.program.update_status
+        )
 
     def get_config(self) -> Dict:
         return yaml.safe_load((self.path / "spack.yaml").read_text())
@@ -0,0 +1,178 @@
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+
+@dataclass
+class ConcreteSpec:
+    """A single concrete spec from a `spack.lock` file."""
+
+    hash: str
+    name: str
+    version: str
+    namespace: str
+    #: Mapping of dependency hashes to their dependency types (build, link, run...)
+    dependencies: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    external: bool = False
+    #: The unmodified node from the lock file
+    node: Dict = field(default_factory=dict, repr=False)
+
+    @property
+    def format(self) -> str:
+        return f"{self.name}@{self.version}/{self.hash[:7]}"
+
+
+def _parse_dependencies(dependencies) -> Dict[str, Tuple[str, ...]]:
+    # Lockfile v1/v2 store a dict of {name: {"hash": ..., "type": [...]}}, newer
+    # versions a list of {"name": ..., "hash": ..., "type" or "parameters": ...}
+    if isinstance(dependencies, dict):
+        dependencies = [{"name": k, **v} for k, v in dependencies.items()]
+
+    res = {}
+    for dependency in dependencies:
+        dep_hash = dependency.get("hash") or dependency.get("build_hash")
+        types = dependency.get("type") or dependency.get("parameters", {}).get(
+            "deptypes", []
+        )
+        res[dep_hash] = tuple(types)
+
+    return res
+
+
+def _parse_node(dag_hash: str, node: Dict) -> ConcreteSpec:
+    # Lockfile v1/v2 nest the node under the package name
+    if "name" not in node and len(node) == 1:
+        name, node = next(iter(node.items()))
+        node = {"name": name, **node}
+
+    return ConcreteSpec(
+        hash=dag_hash,
+        name=node["name"],
+        version=str(node.get("version", "")),
+        namespace=node.get("namespace", "builtin"),
+        dependencies=_parse_dependencies(node.get("dependencies", [])),
+        external=bool(node.get("external")),
+        node=node,
+    )
+
+
+class SpackLock:
+    """Indexed DAG of the concrete specs in a `spack.lock` file.
+
+    Reading the lock file directly answers queries about the concretized environment
+    without having to start spack, e.g.:
+
+    ```python
+    lock = SpackLock.from_file(Path("spack.lock"))
+    lock.python_packages()  # {'py-numpy': '1.23.2', ...}
+    lock.dependents("zlib")  # specs which depend on zlib
+    ```
+    """
+
+    def __init__(self, specs: Dict[str, ConcreteSpec], roots: List[str]):
+        self.specs = specs
+        self.root_hashes = roots
+
+        self.by_name: Dict[str, List[ConcreteSpec]] = defaultdict(list)
+        self.by_namespace: Dict[str, List[ConcreteSpec]] = defaultdict(list)
+        self._dependents: Dict[str, Set[str]] = defaultdict(set)
+
+        for spec in specs.values():
+            self.by_name[spec.name].append(spec)
+            self.by_namespace[spec.namespace].append(spec)
+            for dep_hash in spec.dependencies:
+                self._dependents[dep_hash].add(spec.hash)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SpackLock":
+        specs = {
+            dag_hash: _parse_node(dag_hash, node)
+            for dag_hash, node in data.get("concrete_specs", {}).items()
+        }
+        roots = [root["hash"] for root in data.get("roots", [])]
+
+        return cls(specs, roots)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "SpackLock":
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def __iter__(self) -> Iterator[ConcreteSpec]:
+        return iter(self.specs.values())
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.specs or item in self.by_name
+
+    def __getitem__(self, dag_hash: str) -> ConcreteSpec:
+        return self.specs[dag_hash]
+
+    @property
+    def roots(self) -> List[ConcreteSpec]:
+        return [self.specs[h] for h in self.root_hashes if h in self.specs]
+
+    def find(self, name: str) -> List[ConcreteSpec]:
+        return list(self.by_name.get(name, []))
+
+    def get(self, name: str) -> Optional[ConcreteSpec]:
+        """Return the spec with the given name, if there is exactly one."""
+        specs = self.find(name)
+        if len(specs) > 1:
+            raise ValueError(f"Multiple specs named {name}: {specs}")
+
+        return specs[0] if specs else None
+
+    def in_namespace(self, namespace: str) -> List[ConcreteSpec]:
+        return list(self.by_namespace.get(namespace, []))
+
+    def python_packages(self) -> Dict[str, str]:
+        """Mapping of the names of all `py-*` packages to their versions."""
+        return {
+            spec.name: spec.version
+            for spec in sorted(self, key=lambda s: s.name)
+            if spec.name.startswith("py-")
+        }
+
+    def _resolve(self, spec: Union[str, ConcreteSpec]) -> List[ConcreteSpec]:
+        if isinstance(spec, ConcreteSpec):
+            return [spec]
+        if spec in self.specs:
+            return [self.specs[spec]]
+        if specs := self.find(spec):
+            return specs
+
+        raise KeyError(f"No spec with name or hash {spec}")
+
+    def _walk(
+        self, spec: Union[str, ConcreteSpec], edges, transitive: bool
+    ) -> List[ConcreteSpec]:
+        seen: Set[str] = set()
+        stack = [s.hash for s in self._resolve(spec)]
+        start = set(stack)
+
+        while stack:
+            for next_hash in edges(stack.pop()):
+                if next_hash not in seen and next_hash in self.specs:
+                    seen.add(next_hash)
+                    if transitive:
+                        stack.append(next_hash)
+
+        return sorted(
+            (self.specs[h] for h in seen - start), key=lambda s: (s.name, s.hash)
+        )
+
+    def dependencies(
+        self, spec: Union[str, ConcreteSpec], transitive: bool = False
+    ) -> List[ConcreteSpec]:
+        """Specs which `spec` (a name, hash, or `ConcreteSpec`) depends on."""
+        return self._walk(spec, lambda h: self.specs[h].dependencies, transitive)
+
+    def dependents(
+        self, spec: Union[str, ConcreteSpec], transitive: bool = False
+    ) -> List[ConcreteSpec]:
+        """Specs which depend on `spec` (a name, hash, or `ConcreteSpec`)."""
+        return self._walk(spec, lambda h: self._dependents.get(h, ()), transitive)
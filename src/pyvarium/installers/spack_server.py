@@ -0,0 +1,145 @@
+import atexit
+import json
+import os
+import queue
+import signal
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from pyvarium.installers import spack_worker
+
+#: Spack subcommands which may be sent to the command server, long running commands
+#: like `install` always run in their own process so their output can be streamed
+SERVER_COMMANDS = {"add", "concretize", "config", "env", "find", "remove", "spec"}
+
+#: Global spack options which take a value, used to find the subcommand
+_OPTIONS_WITH_VALUE = {"-C", "--config-scope", "-D", "--env-dir", "-e", "--env"}
+
+#: Seconds to wait for the server to start or answer a command, after which it is
+#: assumed to hang and is killed, and the command runs in a subprocess instead
+TIMEOUT = 600
+
+
+class SpackServerError(RuntimeError):
+    pass
+
+
+def subcommand(args) -> Optional[str]:
+    """Return the spack subcommand from a list of arguments, skipping global options."""
+    args = iter(args)
+    for arg in args:
+        if arg in _OPTIONS_WITH_VALUE:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+
+    return None
+
+
+class SpackServer:
+    """Long-lived `spack python` process which runs spack commands in-process.
+
+    Spack takes a few seconds to start on shared filesystems, most of which is
+    spent starting the interpreter and importing the spack modules. The worker pays
+    this cost once and runs each command in a forked child, so spack state changed
+    by one command does not leak into the next. Each command still reads the
+    configuration and package repository itself, only the start-up is saved.
+
+    A worker which does not answer within `TIMEOUT` is killed, the next command
+    starts a new one.
+    """
+
+    def __init__(self, executable: Path, cwd: Path, env: Dict):
+        self.executable = executable
+        self.env = dict(env)
+        self._lock = threading.Lock()
+
+        logger.debug(f"Starting spack command server with {executable}")
+        self.proc = subprocess.Popen(
+            [executable, "python", spack_worker.__file__],
+            cwd=cwd,
+            env=self.env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            # Own process group, so a hanging command is killed along with it
+            start_new_session=True,
+        )
+
+        # Responses are read by a thread, so that waiting for one can time out
+        self._responses: "queue.Queue[str]" = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+        if not self._receive().get("ready"):
+            self.close()
+            raise SpackServerError("Spack command server failed to start")
+
+        atexit.register(self.close)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, args: List[str], cwd: Path) -> subprocess.CompletedProcess:
+        with self._lock:
+            self._send({"args": [str(a) for a in args], "cwd": str(cwd)})
+            response = self._receive()
+
+        if "error" in response:
+            raise SpackServerError(response["error"])
+
+        return subprocess.CompletedProcess(
+            [self.executable, *args],
+            response["returncode"],
+            response["stdout"].encode(),
+            response["stderr"].encode(),
+        )
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        if self.alive:
+            self.proc.stdin.close()  # type: ignore
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+
+    def kill(self) -> None:
+        if self.alive:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+            self.proc.wait()
+
+    def _read(self) -> None:
+        for line in self.proc.stdout:  # type: ignore
+            self._responses.put(line)
+        self._responses.put("")
+
+    def _send(self, request: Dict) -> None:
+        try:
+            self.proc.stdin.write(json.dumps(request) + "\n")  # type: ignore
+            self.proc.stdin.flush()  # type: ignore
+        except OSError as e:
+            raise SpackServerError("Could not send request to spack server") from e
+
+    def _receive(self) -> Dict:
+        try:
+            line = self._responses.get(timeout=TIMEOUT)
+        except queue.Empty:
+            self.kill()
+            raise SpackServerError(
+                f"Spack command server did not respond within {TIMEOUT} s"
+            ) from None
+
+        if not line:
+            raise SpackServerError("Spack command server exited unexpectedly")
+
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as e:
+            raise SpackServerError(f"Invalid response from spack server: {line}") from e
@@ -0,0 +1,91 @@
+"""Command server executed by `spack python`, used by `SpackServer`.
+
+Requests are read from stdin, one JSON object per line containing the arguments of a
+spack command and the directory to run it in. Spack is imported once, each command
+then runs through `spack.main.main` in a forked child of this process, so that any
+global state it changes (active environment, configuration scopes, caches) is gone
+before the next command. A JSON line with the return code and the captured output
+is written back for each request, or with an `error` if the child died without one.
+
+This file is run by the python interpreter spack uses, so only the standard library
+and spack itself can be imported here.
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import traceback
+
+
+def run(args, cwd):  # pragma: no cover
+    import spack.main
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            os.chdir(cwd)
+            returncode = spack.main.main(list(args))
+        except SystemExit as e:
+            returncode = e.code
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+
+    if returncode is None:
+        returncode = 0
+    elif not isinstance(returncode, int):
+        returncode = 1
+
+    return {
+        "returncode": returncode,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+    }
+
+
+def run_isolated(args, cwd):  # pragma: no cover
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            with os.fdopen(write_fd, "w") as f:
+                json.dump(run(args, cwd), f)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        data = f.read()
+    _, status = os.waitpid(pid, 0)
+
+    if not data:
+        return {"error": f"Spack command exited without a response ({status})"}
+
+    return json.loads(data)
+
+
+def main():  # pragma: no cover
+    # Keep the real stdout for responses, anything else writing to file descriptor 1
+    # (e.g. subprocesses started by spack) is sent to stderr instead
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    # Imported before forking, so that the children do not have to
+    import spack.main  # noqa: F401
+
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    protocol.flush()
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        response = run_isolated(request["args"], request["cwd"])
+        protocol.write(json.dumps(response) + "\n")
+        protocol.flush()
+
+
+if __name__ in ("__main__", "__spack_main__"):  # pragma: no cover
+    main()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+def fingerprint(*paths: Path) -> str:
+    """Fingerprint of a set of files or directories, based on their inode, size and
+    modification time so that no file contents have to be read.
+
+    Directory modification times change when entries are added or removed, which is
+    enough to detect packages being installed into or removed from a view.
+    """
+    h = hashlib.sha256()
+    for path in paths:
+        try:
+            st = path.stat()
+            h.update(f"{path}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        except FileNotFoundError:
+            h.update(f"{path}:missing\n".encode())
+
+    return h.hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of JSON serialisable results.
+
+    Each result is stored along with the fingerprint of the inputs it was computed
+    from, when the fingerprint no longer matches the entry is stale and is dropped.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def _entry(self, key: str) -> Path:
+        return self.path / f"{key}.json"
+
+    def get(self, key: str, fingerprint: str) -> Optional[Any]:
+        entry = self._entry(key)
+
+        try:
+            data = json.loads(entry.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.debug(f"Dropping unreadable cache entry {entry}")
+            entry.unlink(missing_ok=True)
+            return None
+
+        if data.get("fingerprint") != fingerprint:
+            logger.debug(f"Dropping stale cache entry {entry}")
+            entry.unlink(missing_ok=True)
+            return None
+
+        return data["result"]
+
+    def set(self, key: str, fingerprint: str, result: Any) -> None:
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file and rename it so readers never see partial data
+        tmp = entry.with_name(f".{entry.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"fingerprint": fingerprint, "result": result}))
+        os.replace(tmp, entry)
+
+    def cached(self, key: str, fingerprint: str, func: Callable[[], T]) -> T:
+        """Return the cached result for `key`, calling `func` to compute and store it
+        if there is no entry for the current fingerprint."""
+        if (result := self.get(key, fingerprint)) is not None:
+            logger.debug(f"Using cached result for {key}")
+            return result
+
+        result = func()
+        self.set(key, fingerprint, result)
+
+        return result
+
+
+class FileCache:
+    """Content-addressed cache of files, shared between environments.
+
+    Entries are stored as `<path>/<key>/<name>`. Reading an entry updates its
+    modification time, so when the cache grows over `max_size` bytes the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(self, path: Path, max_size: int):
+        self.path = Path(path)
+        self.max_size = max_size
+
+    def get(self, key: str, name: str) -> Optional[Path]:
+        entry = self.path / key / name
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            return None
+
+        return entry
+
+    def put(self, key: str, file: Path) -> Path:
+        entry = self.path / key / file.name
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = entry.with_name(f".{entry.name}.{os.getpid()}.tmp")
+        shutil.copyfile(file, tmp)
+        os.replace(tmp, entry)
+
+        self.evict()
+
+        return entry
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in `max_size`."""
+        entries = []
+        for directory in self.path.iterdir():
+            files = [f for f in directory.iterdir() if f.is_file()]
+            if not files:
+                continue
+            stats = [f.stat() for f in files]
+            entries.append(
+                (
+                    max(s.st_mtime_ns for s in stats),
+                    sum(s.st_size for s in stats),
+                    directory,
+                )
+            )
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, directory in sorted(entries):
+            if total <= self.max_size:
+                break
+            logger.debug(f"Evicting cache entry {directory}")
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
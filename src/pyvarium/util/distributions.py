@@ -0,0 +1,72 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import PathDistribution
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+#: Above this many metadata directories they are read in a thread pool, as on network
+#: filesystems most of the time is spent waiting for file reads
+THREADED_THRESHOLD = 64
+
+
+def canonicalize_name(name: str) -> str:
+    """Normalise a distribution name as described by PEP 503."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _metadata_paths(site_packages: Path) -> List[Path]:
+    paths = []
+
+    with os.scandir(site_packages) as entries:
+        for entry in entries:
+            if entry.name.endswith((".dist-info", ".egg-info")):
+                paths.append(Path(entry.path))
+            elif entry.name.endswith(".egg-link"):
+                # Legacy editable installs, the metadata is in the source directory
+                # written on the first line of the link file
+                lines = Path(entry.path).read_text().splitlines()
+                if lines:
+                    paths.extend(Path(lines[0].strip()).glob("*.egg-info"))
+
+    return paths
+
+
+def _read_distribution(path: Path) -> Optional[Dict[str, str]]:
+    dist = PathDistribution(path)
+
+    try:
+        name, version = dist.metadata["Name"], dist.version
+    except (AttributeError, KeyError):
+        return None
+
+    if not name or not version:
+        return None
+
+    return {"name": name, "version": version}
+
+
+def find_distributions(
+    site_packages: Iterable[Path], max_workers: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """Find the distributions installed in the given site-packages directories by
+    reading their metadata directly, without running the interpreter they belong to.
+
+    The result has the same format as `pip list --format json`: a list of dictionaries
+    with the `name` and `version` of each distribution, sorted by name. If the same
+    distribution is found more than once, the first directory it is found in wins.
+    """
+    paths = [p for sp in site_packages if sp.is_dir() for p in _metadata_paths(sp)]
+
+    if len(paths) > THREADED_THRESHOLD:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            distributions = list(pool.map(_read_distribution, paths))
+    else:
+        distributions = [_read_distribution(p) for p in paths]
+
+    found: Dict[str, Dict[str, str]] = {}
+    for dist in distributions:
+        if dist is not None:
+            found.setdefault(canonicalize_name(dist["name"]), dist)
+
+    return sorted(found.values(), key=lambda d: d["name"].lower())
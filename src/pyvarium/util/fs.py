@@ -0,0 +1,107 @@
+import errno
+import fcntl
+import os
+import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+#: `ioctl` request to share the extents of a file on filesystems with copy-on-write
+#: support (btrfs, XFS, ...), from `linux/fs.h`
+FICLONE = 0x40049409
+
+#: Errors which mean the filesystem does not support an operation between two paths
+_UNSUPPORTED = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EINVAL,
+    errno.EMLINK,
+}
+
+
+def reflink(src: Path, dst: Path) -> None:
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def clone_file(src: Path, dst: Path, *, hardlink: bool = True) -> str:
+    """Copy `src` to `dst` as cheaply as the filesystem allows.
+
+    A reflink shares the data until either file is modified. If that is not
+    supported, a hard link is made (if `hardlink` is set), and only then is the
+    data copied. Returns which of `reflink`, `hardlink`, or `copy` was used.
+    """
+    try:
+        reflink(src, dst)
+        return "reflink"
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED:
+            raise
+
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def clone_tree(
+    src: Path,
+    dst: Path,
+    *,
+    ignore: Callable[[Path], bool] = lambda _: False,
+    hardlink: bool = True,
+    rewrite: Optional[Callable[[Path, Path], bool]] = None,
+    max_workers: Optional[int] = None,
+) -> Counter:
+    """Clone the regular files of the tree at `src` into `dst` with `clone_file`.
+
+    Symlinks are not copied and files which already exist in `dst` are kept.
+    `ignore` is called with paths relative to `src` to skip files or directories.
+    `rewrite` is called with the source and destination path of each file first,
+    if it returns True it has written the file itself (e.g. with modified contents).
+    Returns a count of how many files were cloned with each method.
+    """
+    files: List[Tuple[Path, Path]] = []
+
+    for root, dirs, filenames in os.walk(src):
+        rel_root = Path(root).relative_to(src)
+        dirs[:] = [
+            d
+            for d in dirs
+            if not ignore(rel_root / d) and not os.path.islink(os.path.join(root, d))
+        ]
+        (dst / rel_root).mkdir(parents=True, exist_ok=True)
+
+        for name in filenames:
+            source = Path(root) / name
+            target = dst / rel_root / name
+            if (
+                ignore(rel_root / name)
+                or source.is_symlink()
+                or os.path.lexists(target)
+            ):
+                continue
+            files.append((source, target))
+
+    def clone(paths: Tuple[Path, Path]) -> str:
+        if rewrite is not None and rewrite(*paths):
+            return "rewrite"
+        return clone_file(*paths, hardlink=hardlink)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return Counter(pool.map(clone, files))
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+
+LOCK_VERSION = 1
+
+#: Name of the lock file, written to the root of the environment
+LOCK_FILE = "pyvarium.lock"
+
+
+def hash_file(path: Path) -> str:
+    """SHA256 of the contents of a file, or `missing` if it does not exist.
+
+    Contents are hashed instead of fingerprinting the file stats, as spack and pipenv
+    rewrite their lock files even when nothing in them changed.
+    """
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return "missing"
+
+
+class EnvironmentLock:
+    """Record of the inputs each install phase of an environment last completed with.
+
+    A phase whose inputs (spec and lock file hashes, program versions) are the same
+    as when it last completed has nothing to do, so can be skipped:
+
+    ```python
+    lock = EnvironmentLock.load(path)
+    inputs = {"spack.yaml": hash_file(path / "spack.yaml")}
+    if not lock.unchanged("spack", inputs):
+        ...
+        lock.record("spack", inputs)
+        lock.save()
+    ```
+    """
+
+    def __init__(self, path: Path, phases: Optional[Dict[str, Dict[str, str]]] = None):
+        self.path = Path(path)
+        self.phases: Dict[str, Dict[str, str]] = phases or {}
+
+    @classmethod
+    def load(cls, root: Path) -> "EnvironmentLock":
+        path = Path(root) / LOCK_FILE
+        try:
+            data = json.loads(path.read_text())
+            if data.get("version") != LOCK_VERSION:
+                raise ValueError(f"Unsupported lock version {data.get('version')}")
+            phases = dict(data["phases"])
+        except FileNotFoundError:
+            phases = {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug(f"Ignoring invalid lock file {path}: {e}")
+            phases = {}
+
+        return cls(path, phases)
+
+    def save(self) -> None:
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(
+            json.dumps(
+                {"version": LOCK_VERSION, "phases": self.phases},
+                indent=4,
+                sort_keys=True,
+            )
+            + "\n"
+        )
+        os.replace(tmp, self.path)
+
+    def unchanged(self, phase: str, inputs: Dict[str, str]) -> bool:
+        return self.phases.get(phase) == inputs
+
+    def record(self, phase: str, inputs: Dict[str, str]) -> None:
+        self.phases[phase] = dict(inputs)
+
+    def discard(self, phase: str) -> None:
+        self.phases.pop(phase, None)
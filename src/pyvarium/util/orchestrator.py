@@ -0,0 +1,90 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, Union
+
+from loguru import logger
+
+Phase = Callable[[], Union[Awaitable[Any], Any]]
+
+
+class Orchestrator:
+    """Run named phases concurrently, each phase starts as soon as all of the phases
+    it depends on have finished.
+
+    Phases can be coroutine functions, which run on the event loop, or plain
+    functions, which run in a worker thread so that they do not block other phases.
+
+    Example:
+        ```python
+        orchestrator = Orchestrator()
+        orchestrator.phase("spack", spack_setup)
+        orchestrator.phase("pipfile", pe.init_pipfile)
+        orchestrator.phase("pipenv", pipenv_setup, after=["spack", "pipfile"])
+        results = orchestrator.run()
+        ```
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, Phase] = {}
+        self.dependencies: Dict[str, Iterable[str]] = {}
+
+    def phase(self, name: str, func: Phase, *, after: Iterable[str] = ()) -> None:
+        if name in self.phases:
+            raise ValueError(f"Phase {name} already defined")
+
+        self.phases[name] = func
+        self.dependencies[name] = list(after)
+
+    def run(self) -> Dict[str, Any]:
+        """Run all phases, returning a dictionary of phase names to results."""
+        self._check_dependencies()
+        return asyncio.run(self._run())
+
+    def _check_dependencies(self) -> None:
+        done = set()
+
+        def visit(name: str, chain: tuple) -> None:
+            if name in chain:
+                raise ValueError(
+                    f"Circular phase dependency: {' -> '.join((*chain, name))}"
+                )
+            if name in done:
+                return
+            for dependency in self.dependencies[name]:
+                if dependency not in self.phases:
+                    raise ValueError(f"Phase {name} depends on unknown {dependency}")
+                visit(dependency, (*chain, name))
+            done.add(name)
+
+        for name in self.phases:
+            visit(name, ())
+
+    async def _run(self) -> Dict[str, Any]:
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_phase(name: str) -> Any:
+            for dependency in self.dependencies[name]:
+                await tasks[dependency]
+
+            logger.debug(f"Starting phase {name}")
+            func = self.phases[name]
+            if asyncio.iscoroutinefunction(func):
+                res = await func()
+            else:
+                loop = asyncio.get_running_loop()
+                res = await loop.run_in_executor(None, func)
+            logger.debug(f"Finished phase {name}")
+
+            return res
+
+        for name in self.phases:
+            tasks[name] = asyncio.ensure_future(run_phase(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
@@ -0,0 +1,162 @@
+"""Compile the python files of an environment to bytecode in parallel.
+
+The `.pyc` files have to be written by the python of the environment, not the one
+running pyvarium, so `precompile` runs this module as a script with that python.
+It must only import from the standard library.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import py_compile
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+INVALIDATION_MODES = {
+    "timestamp": py_compile.PycInvalidationMode.TIMESTAMP,
+    "checked-hash": py_compile.PycInvalidationMode.CHECKED_HASH,
+    "unchecked-hash": py_compile.PycInvalidationMode.UNCHECKED_HASH,
+}
+
+#: Number of files compiled per task of the process pool
+CHUNK_SIZE = 64
+
+
+@dataclass
+class PrecompileResult:
+    #: Number of files compiled
+    compiled: int = 0
+    #: Number of files which already had up to date bytecode
+    current: int = 0
+    #: Files which could not be compiled, or whose bytecode could not be written
+    failed: List[str] = field(default_factory=list)
+    #: Files whose out of date bytecode is a symlink into a spack prefix, which is
+    #: owned by spack and left as it is
+    linked: List[str] = field(default_factory=list)
+
+
+def is_current(source: str, cfile: str, mode: str) -> bool:
+    """Check if `cfile` is the bytecode of `source` for the invalidation mode."""
+    try:
+        with open(cfile, "rb") as f:
+            header = f.read(16)
+    except OSError:
+        return False
+
+    if len(header) < 16 or header[:4] != importlib.util.MAGIC_NUMBER:
+        return False
+
+    flags = int.from_bytes(header[4:8], "little")
+    if mode == "timestamp":
+        st = os.stat(source)
+        return (
+            flags == 0
+            and int.from_bytes(header[8:12], "little") == int(st.st_mtime) & 0xFFFFFFFF
+            and int.from_bytes(header[12:16], "little") == st.st_size & 0xFFFFFFFF
+        )
+
+    if flags != (0b11 if mode == "checked-hash" else 0b01):
+        return False
+
+    with open(source, "rb") as f:
+        return header[8:16] == importlib.util.source_hash(f.read())
+
+
+def compile_files(paths: List[str], mode: str) -> Tuple[int, int, List[str], List[str]]:
+    compiled, current, failed, linked = 0, 0, [], []
+    for path in paths:
+        cfile = importlib.util.cache_from_source(path)
+        try:
+            if is_current(path, cfile, mode):
+                current += 1
+                continue
+            # Views link the `__pycache__` of spack packages too, py_compile refuses
+            # to write through the link, and the bytecode in the store is not ours
+            if os.path.islink(cfile):
+                linked.append(path)
+                continue
+            py_compile.compile(
+                path, cfile, doraise=True, invalidation_mode=INVALIDATION_MODES[mode]
+            )
+            compiled += 1
+        except (py_compile.PyCompileError, OSError, ValueError):
+            failed.append(path)
+
+    return compiled, current, failed, linked
+
+
+def source_files(directories: Iterable[str]) -> List[str]:
+    """Python files in the directories, symlinked files are included as they are in
+    a spack view, the bytecode is written next to the link (unless the bytecode file
+    is itself a link, see `PrecompileResult.linked`)."""
+    files = []
+    for directory in directories:
+        for root, dirs, names in os.walk(directory):
+            dirs[:] = [d for d in dirs if d != "__pycache__"]
+            files.extend(os.path.join(root, n) for n in names if n.endswith(".py"))
+    return sorted(files)
+
+
+def compile_directories(
+    directories: Iterable[str], mode: str, max_workers: Optional[int] = None
+) -> Dict:
+    files = source_files(directories)
+    chunks = [files[i : i + CHUNK_SIZE] for i in range(0, len(files), CHUNK_SIZE)]
+    result: Dict = {"compiled": 0, "current": 0, "failed": [], "linked": []}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for compiled, current, failed, linked in pool.map(
+            compile_files, chunks, [mode] * len(chunks)
+        ):
+            result["compiled"] += compiled
+            result["current"] += current
+            result["failed"].extend(failed)
+            result["linked"].extend(linked)
+
+    return result
+
+
+def precompile(
+    python: Path,
+    directories: Iterable[Path],
+    *,
+    invalidation_mode: str = "timestamp",
+    max_workers: Optional[int] = None,
+) -> PrecompileResult:
+    """Compile the python files in `directories` with the interpreter `python`,
+    across a process pool, skipping files whose bytecode is already up to date.
+
+    `unchecked-hash` bytecode is never checked against the source by python, which
+    is best for read-only deployments that are not modified afterwards.
+    """
+    args = [str(python), "-I", __file__, "--invalidation-mode", invalidation_mode]
+    if max_workers:
+        args.extend(["--workers", str(max_workers)])
+
+    out = subprocess.run(
+        [*args, *map(str, directories)], capture_output=True, check=True, text=True
+    ).stdout
+
+    return PrecompileResult(**json.loads(out))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directories", nargs="*")
+    parser.add_argument(
+        "--invalidation-mode", choices=list(INVALIDATION_MODES), default="timestamp"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    result = compile_directories(args.directories, args.invalidation_mode, args.workers)
+    json.dump(result, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
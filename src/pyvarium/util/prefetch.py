@@ -0,0 +1,246 @@
+import hashlib
+import os
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.error import HTTPError
+from urllib.parse import unquote, urljoin, urlparse
+
+from loguru import logger
+from packaging.tags import Tag, parse_tag
+from packaging.utils import parse_wheel_filename
+
+from pyvarium.util.distributions import canonicalize_name
+
+CHUNK_SIZE = 1024**2
+
+SDIST_EXTENSIONS = (".tar.gz", ".tar.bz2", ".tar.xz", ".zip", ".tgz")
+
+#: Prints the wheel tags supported by the python running it, with its own packaging
+#: or else the copy vendored by pip
+_TAGS_SCRIPT = """
+try:
+    from packaging.tags import sys_tags
+except ImportError:
+    from pip._vendor.packaging.tags import sys_tags
+print("\\n".join(map(str, sys_tags())))
+"""
+
+
+@dataclass
+class Link:
+    """A file listed on the project page of a simple index."""
+
+    filename: str
+    url: str
+    #: Mapping of hash names to values, from the URL fragment
+    hashes: Dict[str, str] = field(default_factory=dict)
+
+
+class _AnchorParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.hrefs: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a" and (href := dict(attrs).get("href")):
+            self.hrefs.append(href)
+
+
+def _read(url: str) -> bytes:
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+class SimpleIndex:
+    """Client for a PEP 503 simple repository API.
+
+    Besides HTTP(S) indexes, `file://` URLs of local directories work as well. Their
+    project directories can either contain an `index.html`, or just the files.
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/") + "/"
+
+    def project_url(self, project: str) -> str:
+        return urljoin(self.url, f"{canonicalize_name(project)}/")
+
+    def links(self, project: str) -> List[Link]:
+        url = self.project_url(project)
+        parsed = urlparse(url)
+
+        if parsed.scheme == "file":
+            directory = Path(unquote(parsed.path))
+            if not (directory / "index.html").is_file():
+                return [
+                    Link(p.name, p.as_uri())
+                    for p in sorted(directory.iterdir())
+                    if p.is_file()
+                ]
+            html = (directory / "index.html").read_bytes()
+        else:
+            html = _read(url)
+
+        parser = _AnchorParser()
+        parser.feed(html.decode())
+
+        links = []
+        for href in parser.hrefs:
+            file_url, _, fragment = urljoin(url, href).partition("#")
+            hashes = dict([fragment.split("=", 1)]) if "=" in fragment else {}
+            links.append(Link(filename(file_url), file_url, hashes))
+
+        return links
+
+
+def filename(url: str) -> str:
+    return unquote(urlparse(url).path.rsplit("/", 1)[-1])
+
+
+def filename_version(name: str) -> Optional[Tuple[str, str]]:
+    """Canonical project name and version of a wheel or sdist filename."""
+    if name.endswith(".whl"):
+        try:
+            project, version, _, _ = parse_wheel_filename(name)
+        except ValueError:
+            return None
+        return project, str(version)
+    elif name.endswith(SDIST_EXTENSIONS):
+        stem = next(name[: -len(e)] for e in SDIST_EXTENSIONS if name.endswith(e))
+        parts = stem.rsplit("-", 1)
+    else:
+        return None
+
+    if len(parts) < 2:
+        return None
+
+    return canonicalize_name(parts[0]), parts[1]
+
+
+def interpreter_tags(python: Path) -> Set[Tag]:
+    """Wheel tags supported by another python interpreter, e.g. that of a venv."""
+    out = subprocess.run(
+        [str(python), "-I", "-c", _TAGS_SCRIPT],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return {tag for line in out.split() for tag in parse_tag(line)}
+
+
+def select_files(filenames: Iterable[str], tags: Set[Tag]) -> List[str]:
+    """The wheels among `filenames` which are compatible with `tags`, or the sdists
+    if there are none, which are the files pip could pick from for an install."""
+    wheels, sdists = [], []
+    for name in filenames:
+        if name.endswith(".whl"):
+            try:
+                if parse_wheel_filename(name)[3] & tags:
+                    wheels.append(name)
+            except ValueError:
+                continue
+        elif name.endswith(SDIST_EXTENSIONS):
+            sdists.append(name)
+
+    return wheels or sdists
+
+
+def download(url: str, dest: Path, hashes: Optional[Set[str]] = None) -> bool:
+    """Download `url` to `dest`, returning False if it was already there.
+
+    Data is written to `dest.part` first and resumed from there with an HTTP range
+    request if a previous download was interrupted. If `hashes` are given the sha256
+    of the file has to be one of them, otherwise it is removed.
+    """
+    if dest.is_file() and (hashes is None or _sha256(dest) in hashes):
+        return False
+
+    part = dest.with_name(dest.name + ".part")
+    request = urllib.request.Request(url)
+    if part.is_file() and (offset := part.stat().st_size):
+        request.add_header("Range", f"bytes={offset}-")
+
+    try:
+        response = urllib.request.urlopen(request)
+    except HTTPError as e:
+        if e.code != 416:  # Range not satisfiable, the part is already complete
+            raise
+        response = None
+
+    h = hashlib.sha256()
+    with part.open("r+b" if part.is_file() else "w+b") as f:
+        if response is not None and getattr(response, "status", None) != 206:
+            # Not a partial response, so the whole file is sent again
+            f.truncate(0)
+        elif response is not None:
+            logger.debug(f"Resuming download of {dest.name}")
+
+        # Hash what is already on disk, which leaves the file positioned at its end
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+
+        if response is not None:
+            with response:
+                while chunk := response.read(CHUNK_SIZE):
+                    h.update(chunk)
+                    f.write(chunk)
+
+    if hashes is not None and h.hexdigest() not in hashes:
+        part.unlink()
+        raise ValueError(f"Hash mismatch for {dest.name}: sha256:{h.hexdigest()}")
+
+    os.replace(part, dest)
+
+    return True
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class PrefetchResult:
+    downloaded: List[Path] = field(default_factory=list)
+    skipped: List[Path] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+
+def prefetch(
+    artifacts: Dict[str, Optional[Set[str]]],
+    dest: Path,
+    *,
+    max_workers: Optional[int] = None,
+    progress: Callable[[str], None] = lambda *_: None,
+) -> PrefetchResult:
+    """Download artifacts (URLs mapped to their allowed sha256) into `dest` with a
+    bounded thread pool. Failures are collected instead of raised, so that one bad
+    artifact does not stop the others from being downloaded."""
+    dest.mkdir(parents=True, exist_ok=True)
+    result = PrefetchResult()
+
+    def fetch(url: str) -> bool:
+        return download(url, dest / filename(url), artifacts[url])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch, url): url for url in artifacts}
+        for future in as_completed(futures):
+            url = futures[future]
+            path = dest / filename(url)
+            try:
+                if future.result():
+                    result.downloaded.append(path)
+                else:
+                    result.skipped.append(path)
+            except (OSError, ValueError) as e:
+                result.failed[url] = str(e)
+            progress(path.name)
+
+    return result
@@ -1,6 +1,9 @@
+import os
+import subprocess
 import venv
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, Optional, Tuple
 
 
 @dataclass
@@ -15,13 +18,17 @@ class Context:
     env_exe: str
 
 
-def setup_scripts(spack_view_path: Path):
+def setup_scripts(spack_view_path: Path, *, environment: Optional[Path] = None):
+    """Write the activation scripts of the venv at `spack_view_path`, named after
+    `environment` (by default the directory above the one containing the view)."""
     spack_view_path = spack_view_path.absolute()
+    if environment is None:
+        environment = spack_view_path.parent.parent
     eb = venv.EnvBuilder()
     context = Context(
         env_dir=str(spack_view_path),
-        env_name=str(spack_view_path.parent.parent),
-        prompt=f"({spack_view_path.parent.parent.name}) ",
+        env_name=str(environment),
+        prompt=f"({environment.name}) ",
         bin_path=str(spack_view_path / "bin"),
         bin_name="bin",
         env_exe=str(spack_view_path / "bin" / "python"),
@@ -30,6 +37,102 @@ def setup_scripts(spack_view_path: Path):
     eb.setup_scripts(context)  # type: ignore
 
 
+def python_version(python: Path) -> Tuple[int, int, int]:
+    """Version of another python interpreter, which may not be the running one."""
+    out = subprocess.run(
+        [str(python), "-c", "import sys; print(*sys.version_info[:3])"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    major, minor, micro = (int(v) for v in out.split())
+    return major, minor, micro
+
+
+def create_venv(env_dir: Path, python: Path) -> None:
+    """Create a venv for `python` at `env_dir` in-process, without pipenv/virtualenv.
+
+    `venv.EnvBuilder` can only create venvs for the running interpreter, so the
+    directories, `pyvenv.cfg`, and interpreter links are written here for the
+    target interpreter and only the activation scripts come from `EnvBuilder`.
+    Existing files are kept, so this also turns a spack view into a venv.
+    """
+    env_dir = env_dir.absolute()
+    executable = Path(os.path.realpath(python))
+    major, minor, micro = python_version(executable)
+
+    bin_dir = env_dir / "bin"
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    (env_dir / "include").mkdir(exist_ok=True)
+    (env_dir / "lib" / f"python{major}.{minor}" / "site-packages").mkdir(
+        parents=True, exist_ok=True
+    )
+    if not os.path.lexists(env_dir / "lib64"):
+        (env_dir / "lib64").symlink_to("lib")
+
+    (env_dir / "pyvenv.cfg").write_text(
+        f"home = {executable.parent}\n"
+        "include-system-site-packages = false\n"
+        f"version = {major}.{minor}.{micro}\n"
+        f"executable = {executable}\n"
+    )
+
+    for name in ("python", f"python{major}", f"python{major}.{minor}"):
+        if not os.path.lexists(bin_dir / name):
+            (bin_dir / name).symlink_to(executable)
+
+    setup_scripts(env_dir, environment=env_dir.parent)
+
+
+def ensure_pip(env_dir: Path) -> None:
+    """Install pip into the venv at `env_dir` with `ensurepip`, unless its python can
+    already import it (e.g. from `py-pip` in a spack view).
+
+    Raises `RuntimeError` if the interpreter has neither pip nor `ensurepip`, as
+    pyvarium installs packages with `python -m pip`.
+    """
+    python = str(env_dir / "bin" / "python")
+    if (
+        subprocess.run([python, "-c", "import pip"], capture_output=True).returncode
+        == 0
+    ):
+        return
+
+    res = subprocess.run(
+        [python, "-m", "ensurepip", "--default-pip"], capture_output=True, text=True
+    )
+    if res.returncode != 0:
+        raise RuntimeError(
+            f"{python} has no pip and it could not be installed with ensurepip: "
+            f"{res.stderr.strip()}"
+        )
+
+
+def relocate_script(
+    src: Path, dst: Path, old_prefixes: Iterable[Path], new_prefix: Path
+) -> bool:
+    """Write `src` to `dst` with its shebang moved from one of `old_prefixes` to
+    `new_prefix`, as used by scripts pip installs into the `bin` of a venv. Returns
+    False without writing anything if the file has no shebang with an old prefix."""
+    with open(src, "rb") as f:
+        first_line = f.readline(4096)
+        if not first_line.startswith(b"#!"):
+            return False
+
+        for prefix in old_prefixes:
+            old = f"{prefix}/".encode()
+            if old in first_line:
+                break
+        else:
+            return False
+
+        content = first_line.replace(old, f"{new_prefix}/".encode(), 1) + f.read()
+
+    dst.write_bytes(content)
+    os.chmod(dst, os.stat(src).st_mode)
+    return True
+
+
 def post_env_write(env):  # pragma: no cover
     # The scripts are written every time an env event occurs, as they almost always
     # overwrite/delete the existing scripts
@@ -0,0 +1,244 @@
+import json
+import os
+import posixpath
+import re
+import shutil
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from itertools import islice
+from pathlib import Path
+from typing import IO, Callable, Iterable, Iterator, List, Optional
+
+from loguru import logger
+
+from pyvarium.util import python_venv
+from pyvarium.verify import links
+
+#: Written into packed text files in place of the prefix of the environment
+PLACEHOLDER = b"/@pyvarium-prefix@"
+
+#: Last member of a pack, lists the files which contain the placeholder
+PACK_MANIFEST = ".pyvarium-pack.json"
+PACK_VERSION = 1
+
+#: Files up to this size are read ahead by the worker threads and checked for
+#: prefixes, larger ones are streamed into the archive as they are
+READ_AHEAD_SIZE = 4 * 1024**2
+
+#: Number of files read ahead at once
+BATCH_SIZE = 256
+
+#: Directories which are not packed, the view metadata only makes sense with spack
+IGNORE = {".spack"}
+
+
+@dataclass
+class Entry:
+    """A member of a pack, with symlinks already resolved."""
+
+    arcname: str
+    #: Path the contents are read from, after following symlinks
+    path: Path
+    is_dir: bool = False
+    #: Target of a symlink within the pack, relative to the link
+    link: Optional[str] = None
+
+
+def view_prefixes(view_path: Path) -> List[Path]:
+    """Spack prefixes of the packages linked into a view, these are rewritten to the
+    view itself when it is packed, as the view contains all of their files."""
+    if not (view_path / ".spack").is_dir():
+        return []
+
+    return [
+        (package / "install_manifest.json").resolve().parent.parent
+        for package in links.view_packages(view_path)
+    ]
+
+
+def _within(path: str, root: str) -> bool:
+    return path == root or path.startswith(root.rstrip("/") + "/")
+
+
+def walk(root: Path, arcname: str = ".venv") -> Iterator[Entry]:
+    """Members for the tree at `root`. Symlinks to paths within `root` are kept as
+    relative links, others are dereferenced so the pack contains the files."""
+    real_root = os.path.realpath(root)
+
+    def walk_dir(directory: str, arc: str) -> Iterator[Entry]:
+        yield Entry(arc, Path(directory), is_dir=True)
+        with os.scandir(directory) as it:
+            dir_entries = sorted(it, key=lambda e: e.name)
+
+        for e in dir_entries:
+            name = f"{arc}/{e.name}"
+            if e.name in IGNORE:
+                continue
+
+            path = e.path
+            if e.is_symlink():
+                path = os.path.realpath(e.path)
+                if not os.path.exists(path):
+                    logger.warning(f"Skipping broken link {e.path}")
+                    continue
+                if _within(path, real_root):
+                    target = posixpath.join(arcname, os.path.relpath(path, real_root))
+                    link = posixpath.relpath(target, posixpath.dirname(name))
+                    yield Entry(name, Path(path), link=link)
+                    continue
+
+            if os.path.isdir(path):
+                yield from walk_dir(path, name)
+            elif os.path.isfile(path):
+                yield Entry(name, Path(path))
+
+    yield from walk_dir(real_root, arcname)
+
+
+def prefix_pattern(prefixes: Iterable[Path]) -> "re.Pattern[bytes]":
+    """Pattern matching any of the prefixes, but not paths they are a prefix of."""
+    paths = sorted({str(p).rstrip("/") for p in prefixes}, key=len, reverse=True)
+    alternatives = b"|".join(re.escape(p.encode()) for p in paths)
+    return re.compile(b"(?:" + alternatives + rb")(?![\w.+-])")
+
+
+def rewrite(
+    data: bytes, pattern: "re.Pattern[bytes]", prefix: bytes
+) -> Optional[bytes]:
+    """Contents of a text file with the paths matched by `pattern` replaced with
+    `prefix`, or `None` if it is a binary file or does not contain any of them."""
+    if b"\0" in data[:8192] or not pattern.search(data):
+        return None
+    return pattern.sub(prefix, data)
+
+
+def read(entry: Entry) -> Optional[bytes]:
+    """Contents of a file entry if it is small enough to be rewritten."""
+    if entry.is_dir or entry.link is not None:
+        return None
+    if entry.path.stat().st_size > READ_AHEAD_SIZE:
+        return None
+    return entry.path.read_bytes()
+
+
+def pack(
+    view_path: Path,
+    fileobj: IO[bytes],
+    *,
+    prefixes: Iterable[Path] = (),
+    max_workers: Optional[int] = None,
+    progress: Callable[[str], None] = lambda *_: None,
+) -> List[str]:
+    """Write the view/venv at `view_path` to `fileobj` as a streaming tar archive.
+
+    Files are read ahead in parallel, as reading many small files is what is slow on
+    parallel filesystems. In text files the view path and `prefixes` are replaced
+    with a placeholder, which `unpack` replaces with the new location. Returns the
+    archive names of the files containing the placeholder.
+    """
+    view_path = view_path.absolute()
+    pattern = prefix_pattern([view_path, view_path.resolve(), *prefixes])
+    rewritten: List[str] = []
+
+    with tarfile.open(fileobj=fileobj, mode="w|") as tar:
+        entries = walk(view_path)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while batch := list(islice(entries, BATCH_SIZE)):
+                for entry, data in zip(batch, pool.map(read, batch)):
+                    info = tar.gettarinfo(str(entry.path), entry.arcname)
+                    info.uid = info.gid = 0
+                    info.uname = info.gname = ""
+
+                    if entry.link is not None:
+                        info.type, info.linkname = tarfile.SYMTYPE, entry.link
+                        info.size = 0
+                        tar.addfile(info)
+                        continue
+
+                    if entry.is_dir:
+                        tar.addfile(info)
+                        continue
+
+                    # Hard links are stored as separate files, rewriting one of
+                    # them on unpack must not change the other
+                    info.type, info.linkname = tarfile.REGTYPE, ""
+
+                    if data is None:
+                        info.size = entry.path.stat().st_size
+                        with entry.path.open("rb") as f:
+                            tar.addfile(info, f)
+                        continue
+
+                    if (relocated := rewrite(data, pattern, PLACEHOLDER)) is not None:
+                        data = relocated
+                        rewritten.append(entry.arcname)
+
+                    info.size = len(data)
+                    tar.addfile(info, BytesIO(data))
+
+                progress(batch[-1].arcname)
+
+        manifest = json.dumps({"version": PACK_VERSION, "prefix": rewritten}).encode()
+        info = tarfile.TarInfo(PACK_MANIFEST)
+        info.size = len(manifest)
+        tar.addfile(info, BytesIO(manifest))
+
+    return rewritten
+
+
+def _check_member(member: tarfile.TarInfo) -> None:
+    parts = Path(member.name).parts
+    if member.name.startswith("/") or ".." in parts:
+        raise ValueError(f"Refusing to unpack {member.name} outside of the target")
+    if member.issym() and (
+        member.linkname.startswith("/")
+        or not _within(
+            posixpath.normpath(
+                posixpath.join(posixpath.dirname(member.name), member.linkname)
+            ),
+            parts[0],
+        )
+    ):
+        raise ValueError(f"Refusing to unpack link {member.name} -> {member.linkname}")
+    if member.islnk() or member.isdev():
+        raise ValueError(f"Unexpected member type of {member.name}")
+
+
+def unpack(fileobj: IO[bytes], dest: Path) -> Path:
+    """Extract a pack streamed from `fileobj` into `dest`, rewrite the placeholder in
+    files to the new location of the venv, and write new activation scripts for it.
+    Returns the path of the venv."""
+    dest = dest.absolute()
+    manifest = None
+    # The members are already checked, the filter only keeps newer python versions
+    # from warning about its default
+    kwargs = {"filter": "tar"} if hasattr(tarfile, "tar_filter") else {}
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            if member.name == PACK_MANIFEST:
+                manifest = json.load(tar.extractfile(member))  # type: ignore
+                continue
+            _check_member(member)
+            if member.isdir():
+                # Spack prefixes can be read-only, the files still have to be added
+                member.mode |= 0o700
+            tar.extract(member, dest, **kwargs)  # type: ignore
+
+    if manifest is None or manifest.get("version") != PACK_VERSION:
+        raise ValueError("Archive is not a pyvarium pack or it is incomplete")
+
+    venv = dest / ".venv"
+    prefix = str(venv).encode()
+    for name in manifest["prefix"]:
+        path = dest / name
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(path.read_bytes().replace(PLACEHOLDER, prefix))
+        shutil.copystat(path, tmp)
+        os.replace(tmp, path)
+
+    python_venv.setup_scripts(venv, environment=venv.parent)
+
+    return venv
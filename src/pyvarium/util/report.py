@@ -0,0 +1,19 @@
+from loguru import logger
+
+from pyvarium.util.precompile import PrecompileResult
+
+
+def precompile(res: PrecompileResult) -> None:
+    """Log the summary of compiling the environment to bytecode."""
+    logger.info(
+        f"Compiled {res.compiled} python files, {res.current} were already up to date"
+    )
+    if res.linked:
+        logger.info(
+            f"Left {len(res.linked)} python files with bytecode linked from spack "
+            "prefixes as they are"
+        )
+    if res.failed:
+        logger.warning(
+            f"Could not compile {len(res.failed)} python files, e.g. {res.failed[0]}"
+        )
@@ -0,0 +1,62 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+
+def available_cores() -> int:
+    """Number of cores this process may run on, which can be fewer than the cores
+    of the machine when running under a batch scheduler or in a container."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        return os.cpu_count() or 1
+
+
+def available_memory() -> Optional[int]:
+    """Memory available for new processes in bytes, `None` if it cannot be read."""
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):  # pragma: no cover
+        return None
+
+
+@dataclass
+class BuildPlan:
+    #: Number of concurrent `spack install` processes
+    workers: int
+    #: Build jobs (`-j`) for each of the workers
+    jobs: int
+
+
+def plan_build(
+    cores: int,
+    memory: Optional[int],
+    *,
+    workers: int = 1,
+    jobs: int = 0,
+    memory_per_job: int = 2048,
+) -> BuildPlan:
+    """Split the cores and memory of the machine between install workers.
+
+    The number of build jobs which can run at once is limited by the cores and by the
+    memory, assuming each job needs `memory_per_job` MiB. A `jobs` value above zero
+    fixes the jobs per worker instead of dividing these between the workers.
+    """
+    slots = cores
+    if memory is not None and memory_per_job > 0:
+        slots = min(slots, memory // (memory_per_job * 1024**2))
+    slots = max(1, slots)
+
+    workers = max(1, min(workers, slots))
+    if jobs <= 0:
+        jobs = max(1, slots // workers)
+
+    return BuildPlan(workers=workers, jobs=jobs)
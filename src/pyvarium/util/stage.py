@@ -0,0 +1,187 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from pyvarium.util import fs, relocate
+from pyvarium.verify.checksums import hash_file
+from pyvarium.verify.repair import replace_link
+
+#: Manifest of a staged tree, at its root next to the `.venv`
+STAGE_MANIFEST = ".pyvarium-stage.json"
+STAGE_VERSION = 1
+
+
+@dataclass
+class StageResult:
+    #: Directory the destination links to
+    path: Path
+    #: Number of files copied from the environment
+    copied: int = 0
+    #: Number of unchanged files linked from the previous stage
+    linked: int = 0
+    #: False if the previous stage was still up to date and was kept
+    changed: bool = True
+
+
+def generations_path(dest: Path) -> Path:
+    """Directory holding the staged trees the destination symlink points to."""
+    return dest.parent / f".{dest.name}.pyvarium"
+
+
+def load_manifest(dest: Path) -> Dict:
+    try:
+        manifest = json.loads((dest / STAGE_MANIFEST).read_text())
+        if manifest.get("version") == STAGE_VERSION:
+            return manifest
+    except (OSError, ValueError) as e:
+        logger.debug(f"No previous stage manifest in {dest}: {e}")
+
+    return {}
+
+
+def stage(
+    view_path: Path,
+    dest: Path,
+    *,
+    prefixes: Iterable[Path] = (),
+    max_workers: Optional[int] = None,
+    progress: Callable[[str], None] = lambda *_: None,
+) -> StageResult:
+    """Mirror the view/venv at `view_path` to `dest/.venv`.
+
+    `dest` is a symlink to a staged tree in `generations_path(dest)`. Files whose
+    size and modification time, or else hash, are the same as in the manifest of the
+    current tree are linked from it, only the others are copied (in parallel), with
+    paths rewritten to the new location the same way as by `relocate.pack`. Once the
+    new tree is complete the symlink is replaced atomically. The tree before it is
+    kept for jobs which may still be using it, older ones are removed. If nothing
+    changed, the current tree is kept and only the `stat` calls were needed.
+    """
+    dest = dest.absolute()
+    if dest.exists() and not dest.is_symlink():
+        raise FileExistsError(f"{dest} exists and was not created by stage")
+
+    venv = dest / ".venv"
+    pattern = relocate.prefix_pattern([view_path, view_path.resolve(), *prefixes])
+    prefix_key = hashlib.sha256(pattern.pattern + str(venv).encode()).hexdigest()
+
+    generations = generations_path(dest)
+    generations.mkdir(parents=True, exist_ok=True)
+
+    # Jobs starting on the same node at once stage one after the other, all but the
+    # first find the stage up to date
+    with open(generations / "lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        current = dest.resolve() if dest.is_symlink() else None
+        manifest = load_manifest(dest) if current else {}
+        if manifest.get("prefixes") != prefix_key:
+            manifest = {}
+        previous: Dict[str, List] = manifest.get("files", {})
+
+        entries = list(relocate.walk(view_path))
+        dirs = [e.arcname for e in entries if e.is_dir]
+        links = {e.arcname: e.link for e in entries if e.link is not None}
+        files = [e for e in entries if not e.is_dir and e.link is None]
+
+        def stat(entry: relocate.Entry) -> List[int]:
+            st = os.stat(entry.path)
+            return [st.st_size, st.st_mtime_ns]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            stats = list(pool.map(stat, files))
+
+        if (
+            current is not None
+            and manifest.get("dirs") == dirs
+            and manifest.get("links") == links
+            and len(previous) == len(files)
+            and all(previous.get(e.arcname, [])[:2] == s for e, s in zip(files, stats))
+        ):
+            return StageResult(current, changed=False)
+
+        path = Path(tempfile.mkdtemp(prefix="stage-", dir=generations))
+        for arcname in dirs:
+            (path / arcname).mkdir(exist_ok=True)
+        for arcname, link in links.items():
+            os.symlink(link, path / arcname)
+
+        def stage_file(args: Tuple[relocate.Entry, List[int]]) -> Tuple[str, List]:
+            entry, st = args
+            target = path / entry.arcname
+            old = previous.get(entry.arcname)
+            reusable = (
+                old is not None
+                and current is not None
+                and os.path.isfile(current / entry.arcname)
+            )
+
+            if reusable and old[:2] == st:
+                fs.clone_file(current / entry.arcname, target)
+                return "linked", old
+
+            data = relocate.read(entry)
+            if data is None:
+                digest = hash_file(str(entry.path))
+            else:
+                digest = hashlib.sha256(data).hexdigest()
+
+            if reusable and old[2] == digest:
+                fs.clone_file(current / entry.arcname, target)
+                return "linked", [*st, digest]
+
+            relocated = None
+            if data is not None:
+                relocated = relocate.rewrite(data, pattern, str(venv).encode())
+
+            if relocated is None:
+                shutil.copy2(entry.path, target)
+            else:
+                target.write_bytes(relocated)
+                shutil.copystat(entry.path, target)
+
+            progress(entry.arcname)
+            return "copied", [*st, digest]
+
+        result = StageResult(path)
+        staged: Dict[str, List] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for entry, (method, state) in zip(
+                files, pool.map(stage_file, zip(files, stats))
+            ):
+                staged[entry.arcname] = state
+                if method == "linked":
+                    result.linked += 1
+                else:
+                    result.copied += 1
+
+        (path / STAGE_MANIFEST).write_text(
+            json.dumps(
+                {
+                    "version": STAGE_VERSION,
+                    "prefixes": prefix_key,
+                    "dirs": dirs,
+                    "links": links,
+                    "files": staged,
+                }
+            )
+        )
+        path.chmod(0o755)
+
+        replace_link(dest, path)
+
+        for old_path in generations.iterdir():
+            if old_path.is_dir() and old_path not in (path, current):
+                logger.debug(f"Removing old stage {old_path}")
+                shutil.rmtree(old_path, ignore_errors=True)
+
+    return result
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from pyvarium.verify.links import view_packages
+
+CHECKSUMS_VERSION = 1
+
+#: A file whose contents do not match its manifest, as (path, expected sha256)
+ChecksumWarning = Tuple[Path, str]
+
+
+def hash_file(path: str) -> Optional[str]:
+    """SHA256 of a file, read through a memory map to avoid copying it into Python
+    buffers. Returns `None` if the file cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be memory mapped
+                return hashlib.sha256(b"").hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return hashlib.sha256(m).hexdigest()
+    except OSError:
+        return None
+
+
+def _hash_files(paths: List[str]) -> List[Optional[str]]:
+    return [hash_file(p) for p in paths]
+
+
+def manifest_hashes(package: Path) -> Dict[Path, str]:
+    """Files of a package in its spack prefix, mapped to the hashes recorded for them
+    in the install manifest."""
+    manifest = json.loads((package / "install_manifest.json").read_text())
+    return {
+        Path(k): v["hash"]
+        for k, v in manifest.items()
+        if v.get("type") == "file" and v.get("hash")
+    }
+
+
+class ChecksumCache:
+    """Files whose contents were verified, stored with the inode, modification time,
+    and size they had then, so that they only have to be hashed again if one of
+    these changes."""
+
+    def __init__(self, path: Path, files: Optional[Dict[str, list]] = None):
+        self.path = Path(path)
+        self.files: Dict[str, list] = files or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "ChecksumCache":
+        try:
+            data = json.loads(Path(path).read_text())
+            if data.get("version") != CHECKSUMS_VERSION:
+                raise ValueError(f"Unsupported cache version {data.get('version')}")
+            files = dict(data["files"])
+        except FileNotFoundError:
+            files = {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug(f"Ignoring invalid checksum cache {path}: {e}")
+            files = {}
+
+        return cls(path, files)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"version": CHECKSUMS_VERSION, "files": self.files}))
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _key(st: os.stat_result, expected: str) -> list:
+        return [st.st_ino, st.st_mtime_ns, st.st_size, expected]
+
+    def verified(self, path: Path, st: os.stat_result, expected: str) -> bool:
+        return self.files.get(str(path)) == self._key(st, expected)
+
+    def record(self, path: Path, st: os.stat_result, expected: str) -> None:
+        self.files[str(path)] = self._key(st, expected)
+
+    def discard(self, path: Path) -> None:
+        self.files.pop(str(path), None)
+
+    def prune(self, paths: Iterable[Path]) -> None:
+        """Remove entries for files which are no longer in any manifest."""
+        keep = {str(p) for p in paths}
+        self.files = {k: v for k, v in self.files.items() if k in keep}
+
+
+def verify_checksums(
+    view_path: Path,
+    packages: Optional[Iterable[Path]] = None,
+    *,
+    max_workers: Optional[int] = None,
+    progress: Callable[[str], None] = lambda *_: None,
+    cache: Optional[ChecksumCache] = None,
+) -> Dict[Path, List[ChecksumWarning]]:
+    """Compare the contents of the files of spack packages in a view to the hashes in
+    their install manifests.
+
+    Files are hashed in a process pool, one task per package. With a `cache`, files
+    which have not changed since they were last verified are not read again, and the
+    cache is updated with the results. Returns a mapping of the package metadata
+    directories to the files which are missing or do not match their hash.
+    """
+    packages = view_packages(view_path) if packages is None else list(packages)
+    cache = cache if cache is not None else ChecksumCache(Path(os.devnull))
+
+    results: Dict[Path, List[ChecksumWarning]] = {p: [] for p in packages}
+    pending: Dict[Path, List[Tuple[Path, str, os.stat_result]]] = {}
+    all_files: List[Path] = []
+    skipped = 0
+
+    for package in packages:
+        for path, expected in manifest_hashes(package).items():
+            all_files.append(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                cache.discard(path)
+                results[package].append((path, expected))
+                continue
+            if cache.verified(path, st, expected):
+                skipped += 1
+            else:
+                pending.setdefault(package, []).append((path, expected, st))
+
+    logger.debug(f"Skipping {skipped} files unchanged since they were last hashed")
+
+    for package in packages:
+        if package not in pending:
+            progress(package.name)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(_hash_files, [str(f[0]) for f in files]): package
+                for package, files in pending.items()
+            }
+            for future in as_completed(futures):
+                package = futures[future]
+                for (path, expected, st), actual in zip(
+                    pending[package], future.result()
+                ):
+                    if actual == expected:
+                        cache.record(path, st, expected)
+                    else:
+                        cache.discard(path)
+                        results[package].append((path, expected))
+                progress(package.name)
+
+    cache.prune(all_files)
+
+    return results
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pyvarium.verify.snapshot import VerifySnapshot
+
+#: A view file which does not point to its spack installed target, as (link, target)
+LinkWarning = Tuple[Path, Path]
+
+
+@dataclass
+class PackageManifest:
+    """Files a spack package is expected to provide in a view."""
+
+    package: Path
+    prefix: Path
+    #: Mapping of paths in the view to the paths in the spack prefix they link to
+    links: Dict[Path, Path]
+
+    @classmethod
+    def read(cls, package: Path, view_path: Path) -> "PackageManifest":
+        manifest_file = package / "install_manifest.json"
+        manifest = json.loads(manifest_file.read_text())
+        prefix = manifest_file.resolve().parent.parent
+        links = {
+            Path(k.replace(str(prefix), str(view_path))): Path(k)
+            for k, v in manifest.items()
+            if v["type"] == "file" and ".spack" not in k and "bin" not in k
+        }
+
+        return cls(package, prefix, links)
+
+
+def view_packages(view_path: Path) -> List[Path]:
+    """Package metadata directories of a view, `<view>/.spack/<package>`."""
+    return sorted(
+        p
+        for p in (view_path / ".spack").iterdir()
+        if (p / "install_manifest.json").is_file()
+    )
+
+
+class LinkChecker:
+    """Checks that view files link to their targets with as few syscalls as possible.
+
+    Directory listings are read once with `os.scandir` and shared between threads, so
+    missing files and non-symlinks are found without a `stat` call per file. For
+    symlinks the result of `os.readlink` is compared to the target directly, only
+    links which do not match exactly fall back to resolving both paths.
+    """
+
+    def __init__(self) -> None:
+        self._listings: Dict[str, Dict[str, bool]] = {}
+        self._lock = threading.Lock()
+
+    def _listing(self, directory: str) -> Dict[str, bool]:
+        if (listing := self._listings.get(directory)) is not None:
+            return listing
+
+        try:
+            with os.scandir(directory) as entries:
+                listing = {e.name: e.is_symlink() for e in entries}
+        except (FileNotFoundError, NotADirectoryError):
+            listing = {}
+
+        with self._lock:
+            self._listings[directory] = listing
+
+        return listing
+
+    def forget(self, directory: Path) -> None:
+        """Drop the cached listing of a directory, e.g. after files in it changed."""
+        with self._lock:
+            self._listings.pop(str(directory), None)
+
+    def check(self, link: Path, target: Path) -> bool:
+        is_symlink = self._listing(str(link.parent)).get(link.name)
+
+        if is_symlink is None:
+            return False
+
+        if is_symlink:
+            try:
+                if os.readlink(link) == str(target):
+                    return True
+            except OSError:
+                return False
+
+        # Relative links, or symlinked directories in either path
+        return os.path.realpath(link) == os.path.realpath(target)
+
+    def check_package(self, manifest: PackageManifest) -> List[LinkWarning]:
+        return [
+            (link, target)
+            for link, target in manifest.links.items()
+            if not self.check(link, target)
+        ]
+
+
+def verify_view(
+    view_path: Path,
+    packages: Optional[Iterable[Path]] = None,
+    *,
+    max_workers: Optional[int] = None,
+    progress: Callable[[str], None] = lambda *_: None,
+    checker: Optional[LinkChecker] = None,
+    snapshot: Optional["VerifySnapshot"] = None,
+) -> Dict[Path, List[LinkWarning]]:
+    """Check that files of the spack packages in a view link to the spack prefix.
+
+    Packages are checked in parallel, `progress` is called with the package name from
+    the calling thread as each package finishes. Returns a mapping of the package
+    metadata directories to the list of files which are not linked correctly.
+
+    If a `snapshot` is given, packages which have not changed since they were last
+    verified are skipped, and the snapshot is updated with the results.
+    """
+    packages = view_packages(view_path) if packages is None else list(packages)
+    checker = checker or LinkChecker()
+
+    results: Dict[Path, List[LinkWarning]] = {}
+    to_check = packages
+    if snapshot is not None:
+        to_check = [p for p in packages if snapshot.changed(p, view_path)]
+        results = {p: [] for p in packages if p not in to_check}
+        logger.debug(f"Skipping {len(results)} packages unchanged since last verify")
+
+    def check(package: Path):
+        manifest = PackageManifest.read(package, view_path)
+        # Taken before checking, so that changes made while checking are not missed
+        entry = snapshot.take(manifest, view_path) if snapshot else None
+        return entry, checker.check_package(manifest)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(check, package): package for package in to_check}
+        for future in as_completed(futures):
+            package = futures[future]
+            entry, results[package] = future.result()
+            if snapshot is not None:
+                if results[package] or entry is None:
+                    snapshot.discard(package)
+                else:
+                    snapshot.record(package, entry)
+            progress(package.name)
+
+    return {package: results[package] for package in packages}
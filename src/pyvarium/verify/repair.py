@@ -0,0 +1,70 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from pyvarium.verify.links import LinkChecker, LinkWarning
+
+
+def replace_link(link: Path, target: Path) -> None:
+    """Atomically point `link` at `target`.
+
+    The new symlink is created under a temporary name next to the link and then
+    renamed over it, so the file is never missing for processes reading the view.
+    """
+    link.parent.mkdir(parents=True, exist_ok=True)
+    tmp = link.with_name(
+        f".{link.name}.pyvarium-{os.getpid()}-{threading.get_ident()}.tmp"
+    )
+
+    os.symlink(target, tmp)
+    try:
+        os.replace(tmp, link)
+    except OSError:
+        tmp.unlink()
+        raise
+
+
+def repair_view(
+    warnings: Dict[Path, List[LinkWarning]],
+    *,
+    max_workers: Optional[int] = None,
+    progress: Callable[[str], None] = lambda *_: None,
+) -> Dict[Path, List[LinkWarning]]:
+    """Repair broken view links in parallel, one package per task.
+
+    Only the repaired files are checked afterwards, returns a mapping of packages to
+    the files which are still not linked correctly.
+    """
+
+    def repair(warning: List[LinkWarning]) -> None:
+        for link, target in warning:
+            try:
+                replace_link(link, target)
+            except OSError as e:
+                logger.warning(f"Could not fix {link}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(repair, warning): package
+            for package, warning in warnings.items()
+            if warning
+        }
+        for future in as_completed(futures):
+            future.result()
+            progress(futures[future].name)
+
+    # New checker, as the directories of the repaired files have changed
+    checker = LinkChecker()
+
+    return {
+        package: [
+            (link, target)
+            for link, target in warning
+            if not checker.check(link, target)
+        ]
+        for package, warning in warnings.items()
+    }
@@ -0,0 +1,123 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from loguru import logger
+
+from pyvarium.util.cache import fingerprint
+from pyvarium.verify.links import PackageManifest
+
+SNAPSHOT_VERSION = 1
+
+
+@dataclass
+class PackageSnapshot:
+    """State of a package in a view at the time it was last verified as clean."""
+
+    #: Fingerprint of the install manifest in the spack prefix
+    manifest: str
+    #: Spack prefix the view files link to
+    prefix: str
+    #: Modification times of the view directories containing the package files,
+    #: relative to the view, these change when any link in them is added or removed
+    directories: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def take(cls, manifest: PackageManifest, view_path: Path) -> "PackageSnapshot":
+        directories = {}
+        for directory in {link.parent for link in manifest.links}:
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            directories[os.path.relpath(directory, view_path)] = mtime
+
+        return cls(
+            manifest=fingerprint(manifest.package / "install_manifest.json"),
+            prefix=str(manifest.prefix),
+            directories=directories,
+        )
+
+
+class VerifySnapshot:
+    """Snapshot of the packages in a view which passed verification, used to only
+    re-check packages whose manifest or view directories changed since then."""
+
+    def __init__(
+        self, path: Path, packages: Optional[Dict[str, PackageSnapshot]] = None
+    ):
+        self.path = Path(path)
+        self.packages: Dict[str, PackageSnapshot] = packages or {}
+
+    @classmethod
+    def load(cls, path: Path) -> "VerifySnapshot":
+        try:
+            data = json.loads(Path(path).read_text())
+            if data.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version {data.get('version')}")
+            packages = {
+                name: PackageSnapshot(**package)
+                for name, package in data["packages"].items()
+            }
+        except FileNotFoundError:
+            packages = {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug(f"Ignoring invalid verify snapshot {path}: {e}")
+            packages = {}
+
+        return cls(path, packages)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "packages": {k: asdict(v) for k, v in self.packages.items()},
+                }
+            )
+        )
+        os.replace(tmp, self.path)
+
+    def changed(self, package: Path, view_path: Path) -> bool:
+        """Check if a package may have changed since it was last verified, this only
+        needs the manifest link to be resolved and a `stat` call for the manifest and
+        each of the package directories."""
+        entry = self.packages.get(package.name)
+        if entry is None:
+            return True
+
+        manifest_file = package / "install_manifest.json"
+        if fingerprint(manifest_file) != entry.manifest:
+            return True
+
+        # A package reinstalled into another prefix may keep an identical manifest
+        if str(manifest_file.resolve().parent.parent) != entry.prefix:
+            return True
+
+        for directory, mtime in entry.directories.items():
+            try:
+                if os.stat(view_path / directory).st_mtime_ns != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+
+        return False
+
+    def take(self, manifest: PackageManifest, view_path: Path) -> PackageSnapshot:
+        return PackageSnapshot.take(manifest, view_path)
+
+    def record(self, package: Path, entry: PackageSnapshot) -> None:
+        self.packages[package.name] = entry
+
+    def discard(self, package: Path) -> None:
+        self.packages.pop(package.name, None)
+
+    def prune(self, packages: Iterable[Path]) -> None:
+        """Remove entries for packages which are no longer in the view."""
+        names = {p.name for p in packages}
+        for name in set(self.packages) - names:
+            del self.packages[name]
@@ -3,6 +3,7 @@ from pathlib import Path
 from unittest import mock
 
 import pytest
+import rtoml
 from typer.testing import CliRunner
 
 from pyvarium.cli import app
@@ -54,7 +55,16 @@ def test_list(invoke, tmp_home):
     'pipenv': PosixPath('{tmp_home}/.local/bin/pipenv'),
     'pipx': PosixPath('{tmp_home}/.local/bin/pipx'),
     'poetry': PosixPath('{tmp_home}/.local/bin/poetry'),
-    'spack': PosixPath('{tmp_home}/.local/bin/spack')
+    'spack': PosixPath('{tmp_home}/.local/bin/spack'),
+    'spack_server': False,
+    'cache_dir': PosixPath('~/.cache/pyvarium'),
+    'pip_offline': False,
+    'concretize_cache_size': 0,
+    'buildcache': '',
+    'buildcache_unsigned': False,
+    'install_workers': 1,
+    'install_jobs': 0,
+    'memory_per_job': 2048
 }}
 """
     )
@@ -84,7 +94,16 @@ def test_set(invoke, tmp_home, tmp_cwd: Path):
     'pipenv': PosixPath('{tmp_home}/.local/bin/pipenv'),
     'pipx': PosixPath('{tmp_home}/.local/bin/pipx'),
     'poetry': PosixPath('{tmp_home}/.local/bin/poetry'),
-    'spack': ''
+    'spack': '',
+    'spack_server': False,
+    'cache_dir': PosixPath('~/.cache/pyvarium'),
+    'pip_offline': False,
+    'concretize_cache_size': 0,
+    'buildcache': '',
+    'buildcache_unsigned': False,
+    'install_workers': 1,
+    'install_jobs': 0,
+    'memory_per_job': 2048
 }}
 """
     )
@@ -101,13 +120,22 @@ def test_unset(invoke, tmp_home, tmp_cwd: Path):
         == f"""{{
     'pipenv': PosixPath('{tmp_home}/.local/bin/pipenv'),
     'pipx': PosixPath('{tmp_home}/.local/bin/pipx'),
-    'poetry': PosixPath('{tmp_home}/.local/bin/poetry')
+    'poetry': PosixPath('{tmp_home}/.local/bin/poetry'),
+    'spack_server': False,
+    'cache_dir': PosixPath('~/.cache/pyvarium'),
+    'pip_offline': False,
+    'concretize_cache_size': 0,
+    'buildcache': '',
+    'buildcache_unsigned': False,
+    'install_workers': 1,
+    'install_jobs': 0,
+    'memory_per_job': 2048
 }}
 """
     )
 
     assert (tmp_cwd / "pyvarium.toml").is_file()
-    assert "spack" not in (tmp_cwd / "pyvarium.toml").read_text()
+    assert "spack" not in rtoml.load(tmp_cwd / "pyvarium.toml")
 
 
 def test_set_user(invoke, tmp_home: Path):
@@ -118,6 +146,15 @@ def test_set_user(invoke, tmp_home: Path):
     'pipenv': PosixPath('{tmp_home}/.local/bin/pipenv'),
     'pipx': PosixPath('{tmp_home}/.local/bin/pipx'),
     'poetry': PosixPath('{tmp_home}/.local/bin/poetry'),
+    'spack_server': False,
+    'cache_dir': PosixPath('~/.cache/pyvarium'),
+    'pip_offline': False,
+    'concretize_cache_size': 0,
+    'buildcache': '',
+    'buildcache_unsigned': False,
+    'install_workers': 1,
+    'install_jobs': 0,
+    'memory_per_job': 2048,
     'spack': ''
 }}
 """
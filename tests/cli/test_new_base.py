@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from pyvarium.cli import new
+from pyvarium.config import settings
+from pyvarium.util.stage import generations_path
+
+
+@pytest.fixture
+def created(tmp_path: Path, monkeypatch):
+    """Calls to `new.create`, which only writes a marker file instead of running
+    spack and pipenv."""
+    calls = []
+
+    def create(path: Path, python: str, status):
+        calls.append(python)
+        (path / "spack.yaml").write_text(python)
+
+    monkeypatch.setattr(new, "create", create)
+    monkeypatch.setattr(new.spack, "Spack", lambda: SimpleNamespace(version="0.19"))
+    with mock.patch.object(settings, "cache_dir", tmp_path / "cache"):
+        yield calls
+
+
+def test_base_path():
+    assert new.base_path("python@3.11 %gcc").name.startswith("python-3.11-gcc-")
+    assert new.base_path("python@3.11 %gcc") != new.base_path("python@3.11%gcc")
+
+
+def test_ensure_base_reused(created):
+    path = new.ensure_base("python@3.10", None)
+
+    assert new.base_path("python@3.10").resolve() == path
+    assert (path / "spack.yaml").read_text() == "python@3.10"
+    assert new.ensure_base("python@3.10", None) == path
+    assert created == ["python@3.10"]
+
+    new.ensure_base("python@3.11", None)
+    assert created == ["python@3.10", "python@3.11"]
+
+
+def test_ensure_base_refresh(created, monkeypatch):
+    first = new.ensure_base("python", None)
+
+    # The layer being replaced is kept for clones which are still reading it
+    second = new.ensure_base("python", None, refresh=True)
+    assert created == ["python", "python"]
+    assert second != first and first.is_dir()
+    assert new.base_path("python").resolve() == second
+
+    # A base concretized by another spack version is rebuilt as well
+    monkeypatch.setattr(new.spack, "Spack", lambda: SimpleNamespace(version="0.20"))
+    third = new.ensure_base("python", None)
+    assert len(created) == 3
+    assert (
+        json.loads((third / ".pyvarium" / "base.json").read_text())["spack"] == "0.20"
+    )
+    assert not first.exists() and second.is_dir()
+
+
+def test_ensure_base_interrupted(created, monkeypatch):
+    def interrupted(path: Path, python: str, status):
+        (path / "spack.yaml").write_text("partial")
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as m:
+        m.setattr(new, "create", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            new.ensure_base("python", None)
+
+    assert not new.base_path("python").exists()
+    assert list(generations_path(new.base_path("python")).iterdir()) == [
+        generations_path(new.base_path("python")) / "lock"
+    ]
+
+    path = new.ensure_base("python", None)
+    assert created == ["python"]
+    assert (path / "spack.yaml").read_text() == "python"
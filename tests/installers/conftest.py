@@ -0,0 +1,70 @@
+import json
+import sys
+from pathlib import Path
+from unittest import mock
+
+import pytest
+import yaml
+
+from pyvarium.config import settings
+from pyvarium.installers.spack import Spack, SpackEnvironment
+
+SPACK_EXECUTABLE = f"""#!{sys.executable}
+import sys
+from pathlib import Path
+
+here = Path(__file__).parent
+if sys.argv[1:] == ["--version"]:
+    print("0.21.0")
+    sys.exit()
+
+with (here / "calls").open("a") as f:
+    f.write(" ".join(sys.argv[3:]) + "\\n")
+
+if sys.argv[3:5] in (["buildcache", "create"], ["buildcache", "push"]):
+    args = sys.argv[sys.argv.index("package") + 1 :]
+    directory = Path(args[-2]) / "build_cache"
+    directory.mkdir(parents=True, exist_ok=True)
+    if (here / "fail").is_file() and args[-1] in (here / "fail").read_text():
+        sys.exit(f"Could not push {{args[-1]}}")
+    (directory / f"linux-gcc-pkg-1.0-{{args[-1][1:]}}.spec.json").touch()
+"""
+
+SPACK_LOCK = {
+    "_meta": {"lockfile-version": 4},
+    "roots": [{"hash": "aaaa", "spec": "python"}],
+    "concrete_specs": {
+        "aaaa": {"name": "python", "version": "3.10.8", "dependencies": []},
+        "bbbb": {"name": "zlib", "version": "1.2.13"},
+        "cccc": {"name": "openssl", "version": "1.1.1", "external": {"path": "/usr"}},
+    },
+}
+
+
+@pytest.fixture
+def recording_se(tmp_path: Path):
+    """Spack environment using a fake spack 0.21, which records the commands it runs
+    and writes buildcache entries for pushed specs, unless they are listed in the
+    `fail` file next to the executable."""
+    (tmp_path / "spack" / "lib" / "spack" / "spack" / "hooks").mkdir(parents=True)
+    executable = tmp_path / "spack" / "bin" / "spack"
+    executable.parent.mkdir()
+    executable.write_text(SPACK_EXECUTABLE)
+    executable.chmod(0o755)
+
+    env = tmp_path / "env"
+    env.mkdir()
+    (env / "spack.yaml").write_text(yaml.dump({"spack": {"specs": ["python"]}}))
+    (env / "spack.lock").write_text(json.dumps(SPACK_LOCK))
+
+    with mock.patch.multiple(
+        settings, concretize_cache_size=0, install_workers=1, install_jobs=2
+    ):
+        yield SpackEnvironment(env, program=Spack(executable))
+
+
+@pytest.fixture
+def spack_calls(recording_se: SpackEnvironment):
+    """Returns the commands run by the fake spack of `recording_se` so far."""
+    calls = recording_se.program.executable.parent / "calls"
+    return lambda: calls.read_text().splitlines()
@@ -0,0 +1,58 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from pyvarium.installers.base import OUTPUT_TAIL_LINES, Program
+
+
+class TestProgram:
+    @pytest.fixture(autouse=True)
+    def program(self, tmp_path):
+        self.program = Program(executable=Path("/bin/sh"))
+        self.program.cwd = tmp_path
+
+    def test_cmd(self):
+        res = self.program.cmd("-c", "echo foo")
+        assert res.stdout.decode() == "foo\n"
+
+    def test_acmd(self):
+        res = asyncio.run(self.program.acmd("-c", "echo foo"))
+        assert res.stdout.decode() == "foo\n"
+
+    def test_acmd_concurrent(self):
+        async def run():
+            return await asyncio.gather(
+                *[self.program.acmd("-c", f"sleep 0.2; echo {i}") for i in range(3)]
+            )
+
+        res = asyncio.run(run())
+        assert [r.stdout.decode() for r in res] == ["0\n", "1\n", "2\n"]
+
+    def test_acmd_error(self):
+        with pytest.raises(RuntimeError):
+            asyncio.run(self.program.acmd("-c", "exit 1"))
+
+    def test_cmd_stream(self, tmp_path):
+        updates = []
+        self.program.update_status = updates.append
+        self.program.log_dir = tmp_path / "logs"
+
+        res = self.program.cmd("-c", "seq 1 1000; echo err >&2", stream=True)
+
+        lines = res.stdout.decode().splitlines()
+        assert len(lines) == OUTPUT_TAIL_LINES
+        assert lines[-1] == "err"
+        assert "500" in updates
+
+        (log_file,) = (tmp_path / "logs").iterdir()
+        assert log_file.name.endswith(".log")
+        assert len(log_file.read_text().splitlines()) == 1001
+
+    def test_acmd_stream(self):
+        res = asyncio.run(self.program.acmd("-c", "echo foo; echo bar", stream=True))
+        assert res.stdout.decode() == "foo\nbar\n"
+
+    def test_cmd_stream_error(self):
+        with pytest.raises(RuntimeError):
+            self.program.cmd("-c", "echo foo; exit 1", stream=True)
@@ -0,0 +1,122 @@
+from pathlib import Path
+from unittest import mock
+
+import pytest
+import yaml
+
+from pyvarium.config import settings
+from pyvarium.installers.spack import BUILDCACHE_MIRROR, Spack, SpackEnvironment
+
+
+@pytest.fixture
+def se(recording_se: SpackEnvironment, tmp_path: Path):
+    with mock.patch.object(settings, "buildcache", str(tmp_path / "mirror")):
+        yield recording_se
+
+
+@pytest.fixture
+def spack_0_19():
+    with mock.patch.object(
+        Spack, "version", new_callable=mock.PropertyMock, return_value="0.19.1"
+    ):
+        yield
+
+
+def test_install_pushes_missing(se: SpackEnvironment, spack_calls, tmp_path: Path):
+    se.install()
+
+    mirror = tmp_path / "mirror"
+    assert se.get_config()["spack"] == {
+        "specs": ["python"],
+        "mirrors": {BUILDCACHE_MIRROR: f"file://{mirror}"},
+    }
+    # Signatures are verified and pushed specs are signed by default
+    assert spack_calls() == [
+        "install --only-concrete --no-add --jobs=2",
+        f"buildcache push --only package {mirror} /aaaa",
+        f"buildcache push --only package {mirror} /bbbb",
+        f"buildcache update-index {mirror}",
+    ]
+
+    # Everything is in the buildcache now, so nothing is pushed
+    se.install()
+    assert spack_calls()[4:] == ["install --only-concrete --no-add --jobs=2"]
+
+
+def test_push_failure(se: SpackEnvironment, spack_calls, tmp_path: Path):
+    (se.program.executable.parent / "fail").write_text("/aaaa")
+
+    se.install()
+
+    # The other specs are still pushed and indexed
+    mirror = tmp_path / "mirror"
+    assert spack_calls()[2:] == [
+        f"buildcache push --only package {mirror} /bbbb",
+        f"buildcache update-index {mirror}",
+    ]
+    assert se._buildcache_hashes() == {"bbbb"}
+
+
+def test_unsigned(se: SpackEnvironment, spack_calls, tmp_path: Path):
+    se.configure_buildcache()
+
+    with mock.patch.object(settings, "buildcache_unsigned", True):
+        se.install()
+
+    mirror = tmp_path / "mirror"
+    assert se.get_config()["spack"]["mirrors"] == {
+        BUILDCACHE_MIRROR: {"url": f"file://{mirror}", "signed": False}
+    }
+    assert spack_calls() == [
+        "install --only-concrete --no-add --jobs=2",
+        f"buildcache push --unsigned --only package {mirror} /aaaa",
+        f"buildcache push --unsigned --only package {mirror} /bbbb",
+        f"buildcache update-index {mirror}",
+    ]
+
+
+@pytest.mark.usefixtures("spack_0_19")
+def test_legacy_spack(se: SpackEnvironment, spack_calls, tmp_path: Path):
+    with mock.patch.object(settings, "buildcache_unsigned", True):
+        se.install()
+
+    # Older releases can not mark a mirror as unsigned, skip the checks on install
+    mirror = tmp_path / "mirror"
+    assert se.get_config()["spack"]["mirrors"] == {
+        BUILDCACHE_MIRROR: f"file://{mirror}"
+    }
+    assert spack_calls() == [
+        "install --only-concrete --no-add --jobs=2 --no-check-signature",
+        "buildcache create --unsigned --allow-root --only package "
+        f"--directory {mirror} /aaaa",
+        "buildcache create --unsigned --allow-root --only package "
+        f"--directory {mirror} /bbbb",
+        f"buildcache update-index --directory {mirror}",
+    ]
+
+
+def test_disabled(se: SpackEnvironment, spack_calls):
+    with mock.patch.object(settings, "buildcache", ""):
+        se.install()
+
+    assert spack_calls() == ["install --only-concrete --no-add --jobs=2"]
+    assert "mirrors" not in se.get_config()["spack"]
+
+
+def test_disabled_removes_mirror(se: SpackEnvironment):
+    se.set_config({"spack": {"mirrors": {"other": "file:///other"}}})
+    se.configure_buildcache()
+    assert BUILDCACHE_MIRROR in se.get_config()["spack"]["mirrors"]
+
+    with mock.patch.object(settings, "buildcache", ""):
+        se.install()
+
+    assert se.get_config()["spack"]["mirrors"] == {"other": "file:///other"}
+
+    config = yaml.safe_load((se.path / "spack.yaml").read_text())
+    config["spack"]["mirrors"] = {BUILDCACHE_MIRROR: "file:///old"}
+    (se.path / "spack.yaml").write_text(yaml.dump(config))
+    with mock.patch.object(settings, "buildcache", ""):
+        se.configure_buildcache()
+
+    assert "mirrors" not in se.get_config()["spack"]
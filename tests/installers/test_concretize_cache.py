@@ -0,0 +1,155 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from pyvarium.config import settings
+from pyvarium.installers.spack import Spack, SpackEnvironment, repo_digest
+
+SPACK_EXECUTABLE = f"""#!{sys.executable}
+import sys
+from pathlib import Path
+
+if sys.argv[1] == "--version":
+    print("0.19.0")
+elif "python" in sys.argv:
+    import json
+    import yaml
+
+    config = Path(__file__).parent.parent / "config"
+    print("warning: noise before the config")
+    print(json.dumps({{p.stem: yaml.safe_load(p.read_text()) for p in config.glob("*")}}))
+elif "concretize" in sys.argv:
+    env = Path(sys.argv[sys.argv.index("--env-dir") + 1])
+    count = Path(__file__).parent / "count"
+    count.write_text(str(int(count.read_text() or 0) + 1) if count.exists() else "1")
+    (env / "spack.lock").write_text("lock " + count.read_text())
+"""
+
+SPACK_YAML = """spack:
+  specs: [python, py-numpy]
+  view:
+    default:
+      root: {root}
+"""
+
+
+@pytest.fixture
+def spack(tmp_path: Path):
+    (tmp_path / "spack" / "lib" / "spack" / "spack" / "hooks").mkdir(parents=True)
+    executable = tmp_path / "spack" / "bin" / "spack"
+    executable.parent.mkdir()
+    executable.write_text(SPACK_EXECUTABLE)
+    executable.chmod(0o755)
+
+    builtin = tmp_path / "spack" / "var" / "spack" / "repos" / "builtin"
+    (builtin / "packages" / "python").mkdir(parents=True)
+    (builtin / "packages" / "python" / "package.py").write_text("class Python:\n")
+    (tmp_path / "spack" / "config").mkdir()
+    (tmp_path / "spack" / "config" / "repos.yaml").write_text(
+        "- $spack/var/spack/repos/builtin\n"
+    )
+
+    with mock.patch.multiple(
+        settings, cache_dir=tmp_path / "cache", concretize_cache_size=1
+    ):
+        yield Spack(executable)
+
+
+def environment(spack: Spack, path: Path, specs: str = "[python, py-numpy]"):
+    path.mkdir()
+    spack_yaml = SPACK_YAML.format(root=path / ".venv").replace(
+        "[python, py-numpy]", specs
+    )
+    (path / "spack.yaml").write_text(spack_yaml)
+    return SpackEnvironment(path, program=spack)
+
+
+def test_key_ignores_view(spack: Spack, tmp_path: Path):
+    a = environment(spack, tmp_path / "a")
+    b = environment(spack, tmp_path / "b")
+    c = environment(spack, tmp_path / "c", specs="[python]")
+
+    assert a.concretize_key() == b.concretize_key()
+    assert a.concretize_key() != c.concretize_key()
+
+
+def test_seed_lock(spack: Spack, tmp_path: Path):
+    a = environment(spack, tmp_path / "a")
+    b = environment(spack, tmp_path / "b")
+    c = environment(spack, tmp_path / "c", specs="[python]")
+
+    a.concretize()
+    assert b.concretize() is None
+    c.concretize()
+
+    assert (b.path / "spack.lock").read_text() == "lock 1"
+    assert (c.path / "spack.lock").read_text() == "lock 2"
+    assert (tmp_path / "spack" / "bin" / "count").read_text() == "2"
+
+
+def test_aconcretize(spack: Spack, tmp_path: Path):
+    a = environment(spack, tmp_path / "a")
+    b = environment(spack, tmp_path / "b")
+
+    asyncio.run(a.aconcretize())
+    assert asyncio.run(b.aconcretize()) is None
+    assert (b.path / "spack.lock").read_text() == "lock 1"
+
+
+def test_disabled(spack: Spack, tmp_path: Path):
+    with mock.patch.object(settings, "concretize_cache_size", 0):
+        a = environment(spack, tmp_path / "a")
+        assert a.concretize_key() is None
+
+
+def test_key_inputs(spack: Spack, tmp_path: Path):
+    a = environment(spack, tmp_path / "a")
+    spack_dir = tmp_path / "spack"
+    keys = [a.concretize_key()]
+
+    # Config from any scope, as merged by spack
+    (spack_dir / "config" / "packages.yaml").write_text("all:\n  target: [x86_64]\n")
+    keys.append(a.concretize_key())
+
+    # Package recipes
+    package = spack_dir / "var/spack/repos/builtin/packages/python/package.py"
+    package.write_text("class Python:\n    pass\n")
+    keys.append(a.concretize_key())
+
+    assert len(set(keys)) == len(keys)
+    assert a.concretize_key() == keys[-1]
+
+
+def test_repo_digest_git(tmp_path: Path):
+    repo = tmp_path / "repo"
+    (repo / "packages" / "python").mkdir(parents=True)
+    package = repo / "packages" / "python" / "package.py"
+    package.write_text("class Python:\n")
+
+    def git(*args):
+        subprocess.run(
+            ["git", "-C", str(repo), "-c", "user.name=a", "-c", "user.email=a@b"]
+            + list(args),
+            check=True,
+            capture_output=True,
+        )
+
+    git("init", "-q")
+    git("add", ".")
+    git("commit", "-qm", "init")
+    digests = [repo_digest(repo)]
+
+    package.write_text("class Python:\n    pass\n")
+    digests.append(repo_digest(repo))
+    (repo / "packages" / "python" / "patch.diff").write_text("")
+    digests.append(repo_digest(repo))
+    git("add", ".")
+    git("commit", "-qm", "edit")
+    digests.append(repo_digest(repo))
+
+    assert len(set(digests)) == len(digests)
+    assert repo_digest(repo) == digests[-1]
@@ -0,0 +1,56 @@
+import json
+from unittest import mock
+
+import pytest
+
+from pyvarium.config import settings
+from pyvarium.installers.spack import SpackEnvironment
+from pyvarium.util.resources import BuildPlan
+
+SPACK_LOCK = {
+    "_meta": {"lockfile-version": 4},
+    "roots": [{"hash": h, "spec": h} for h in ["aaaa", "bbbb", "cccc"]],
+    "concrete_specs": {
+        h: {"name": f"py-{h}", "version": "1.0", "dependencies": []}
+        for h in ["aaaa", "bbbb", "cccc"]
+    },
+}
+
+
+@pytest.fixture
+def machine():
+    """A machine with 8 cores and 64 GiB of available memory."""
+    with mock.patch.multiple(
+        "pyvarium.util.resources",
+        available_cores=lambda: 8,
+        available_memory=lambda: 64 * 1024**3,
+    ):
+        yield
+
+
+def test_build_plan(recording_se: SpackEnvironment, machine):
+    with mock.patch.multiple(settings, install_workers=2, install_jobs=0):
+        assert recording_se.build_plan() == BuildPlan(workers=2, jobs=4)
+    with mock.patch.multiple(
+        settings, install_workers=4, install_jobs=0, memory_per_job=32768
+    ):
+        assert recording_se.build_plan() == BuildPlan(workers=2, jobs=1)
+
+
+def test_single_worker(recording_se: SpackEnvironment, spack_calls):
+    recording_se.install()
+    assert spack_calls() == ["install --only-concrete --no-add --jobs=2"]
+
+
+def test_workers(recording_se: SpackEnvironment, spack_calls, machine):
+    (recording_se.path / "spack.lock").write_text(json.dumps(SPACK_LOCK))
+
+    with mock.patch.object(settings, "install_workers", 2):
+        recording_se.install()
+
+    calls = spack_calls()
+    assert sorted(calls[:2]) == [
+        "install --only-concrete --no-add --jobs=2 /aaaa /cccc",
+        "install --only-concrete --no-add --jobs=2 /bbbb",
+    ]
+    assert calls[2:] == ["install --only-concrete --no-add --jobs=2"]
@@ -1,9 +1,17 @@
+import hashlib
+import json
+import os
 import subprocess
+import sys
+import zipfile
 from pathlib import Path
 from typing import Generator
+from unittest import mock
 
 import pytest
 
+from pyvarium.config import settings
+from pyvarium.installers import pipfile
 from pyvarium.installers.pipenv import PipenvEnvironment
 
 
@@ -41,3 +49,141 @@ class TestPipenv:
         res = self.pe.add("cowsay")
         res.check_returncode()
         assert (self.pe.path / ".venv" / "bin" / "cowsay").is_file()
+
+
+def make_wheel(directory: Path, name: str, version: str) -> Path:
+    wheel = directory / f"{name}-{version}-py3-none-any.whl"
+    dist_info = f"{name}-{version}.dist-info"
+    files = {
+        f"{name}.py": f"VERSION = '{version}'\n",
+        f"{dist_info}/METADATA": f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n",
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    with zipfile.ZipFile(wheel, "w") as zf:
+        for path, content in files.items():
+            zf.writestr(path, content)
+        zf.writestr(f"{dist_info}/RECORD", "".join(f"{p},,\n" for p in files))
+
+    return wheel
+
+
+def test_install_locked(tmp_path: Path):
+    index = tmp_path / "index"
+    hashes = {}
+    for name in ["alpha", "beta"]:
+        (index / name).mkdir(parents=True)
+        wheel = make_wheel(index / name, name, "1.0")
+        hashes[name] = hashlib.sha256(wheel.read_bytes()).hexdigest()
+        (index / name / "index.html").write_text(
+            f'<a href="{wheel.name}#sha256={hashes[name]}">{wheel.name}</a>'
+        )
+
+    env = tmp_path / "env"
+    subprocess.check_output([sys.executable, "-m", "venv", env / ".venv"])
+    source = {"url": index.as_uri(), "verify_ssl": True, "name": "local"}
+    pipfile_dict = {"source": [source], "packages": {"alpha": "*", "beta": "*"}}
+    pipfile.write_pipfile(env / "Pipfile", pipfile_dict)
+    (env / "Pipfile.lock").write_text(
+        json.dumps(
+            {
+                "_meta": {
+                    "hash": {"sha256": pipfile.pipfile_hash(pipfile_dict)},
+                    "sources": [source],
+                },
+                "default": {
+                    name: {"version": "==1.0", "hashes": [f"sha256:{h}"]}
+                    for name, h in hashes.items()
+                },
+            }
+        )
+    )
+
+    pe = PipenvEnvironment(env)
+    assert pe.install_locked(max_workers=2)
+
+    site_packages = next((env / ".venv" / "lib").glob("python*/site-packages"))
+    assert (site_packages / "alpha.py").is_file()
+    assert (site_packages / "beta.py").is_file()
+
+    # Everything is installed, so pip is not run again
+    (index / "alpha" / "index.html").unlink()
+    assert pe.install_locked()
+
+
+def test_install_locked_unpinned(tmp_path: Path):
+    env = tmp_path / "env"
+    subprocess.check_output([sys.executable, "-m", "venv", env / ".venv"])
+    git = {"git": "https://example.org/pkg.git", "ref": "abc123"}
+    pipfile_dict = {"packages": {"pkg": git}}
+    pipfile.write_pipfile(env / "Pipfile", pipfile_dict)
+    (env / "Pipfile.lock").write_text(
+        json.dumps(
+            {
+                "_meta": {"hash": {"sha256": pipfile.pipfile_hash(pipfile_dict)}},
+                "default": {"pkg": git},
+            }
+        )
+    )
+
+    # pip cannot install the git requirement from the lock, so pipenv has to
+    assert not PipenvEnvironment(env).install_locked()
+
+
+def test_pip_offline(tmp_path: Path):
+    with mock.patch.object(settings, "cache_dir", tmp_path / "cache"):
+        (tmp_path / "cache" / "wheelhouse").mkdir(parents=True)
+        env = PipenvEnvironment(tmp_path / "env").program.env
+        assert env["PIP_FIND_LINKS"] == str(tmp_path / "cache" / "wheelhouse")
+        assert "PIP_NO_INDEX" not in env
+
+        with mock.patch.object(settings, "pip_offline", True):
+            env = PipenvEnvironment(tmp_path / "env").program.env
+            assert env["PIP_NO_INDEX"] == "1"
+
+
+def test_clone(tmp_path: Path):
+    python = Path(sys.executable).resolve()
+    site_packages = Path("lib") / f"python{sys.version_info[0]}.{sys.version_info[1]}"
+    site_packages = site_packages / "site-packages"
+
+    source = tmp_path / "source"
+    venv = source / ".venv"
+    (venv / site_packages / "pkg").mkdir(parents=True)
+    (venv / site_packages / "pkg" / "__init__.py").write_text("VALUE = 1\n")
+    (venv / site_packages / "spackpkg.py").symlink_to(tmp_path / "prefix.py")
+    (venv / "bin").mkdir()
+    (venv / "bin" / "python").symlink_to(python)
+    (venv / "bin" / "tool").write_text(f"#!{venv}/bin/python\nimport pkg\n")
+    (venv / "bin" / "tool").chmod(0o755)
+    (venv / "pyvenv.cfg").write_text(f"home = {python.parent}\n")
+    (source / "Pipfile").write_text("[packages]\n")
+    (source / "Pipfile.lock").write_text("{}")
+
+    # The spack view of the clone, as regenerated by `SpackEnvironment.clone`
+    clone = tmp_path / "clone"
+    (clone / ".venv" / "bin").mkdir(parents=True)
+    (clone / ".venv" / "bin" / "python").symlink_to(python)
+
+    pe = PipenvEnvironment(clone)
+    counts = pe.clone(source)
+
+    assert sum(counts.values()) == 2
+    assert (clone / "Pipfile").read_text() == "[packages]\n"
+    assert (clone / "Pipfile.lock").is_file()
+    assert not (clone / ".venv" / site_packages / "spackpkg.py").exists()
+    assert (clone / ".venv" / site_packages / "pkg" / "__init__.py").is_file()
+    assert (
+        (clone / ".venv" / "bin" / "tool")
+        .read_text()
+        .startswith(f"#!{clone / '.venv'}/bin/python\n")
+    )
+    assert os.access(clone / ".venv" / "bin" / "tool", os.X_OK)
+    assert str(clone) in (clone / ".venv" / "bin" / "activate").read_text()
+
+    res = subprocess.run(
+        [clone / ".venv" / "bin" / "python", "-c", "import pkg; print(pkg.__file__)"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    assert res.stdout.startswith(str(clone))
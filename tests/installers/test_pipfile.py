@@ -0,0 +1,188 @@
+import json
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from pyvarium.config import settings
+from pyvarium.installers import pipfile
+from pyvarium.installers.pipenv import PipenvEnvironment
+
+PIPFILE = {
+    "source": [{"url": "https://pypi.org/simple", "verify_ssl": True, "name": "pypi"}],
+    "packages": {"NumPy": "==1.23.2", "setuptools": "==63.0.0", "cowsay": "*"},
+}
+
+LOCKFILE = {
+    "default": {
+        "numpy": {"version": "==1.23.2"},
+        "setuptools": {"version": "==63.0.0"},
+        "cowsay": {"version": "==5.0"},
+    }
+}
+
+
+def test_no_changes():
+    pins = {"numpy": "1.23.2", "setuptools": "63.0.0"}
+    diff = pipfile.diff_pins(pins, PIPFILE, LOCKFILE, pins)
+    assert not diff
+    assert diff.requirements == []
+
+
+def test_diff():
+    pins = {"numpy": "1.23.2", "setuptools": "65.0.0", "six": "1.16.0"}
+    diff = pipfile.diff_pins(pins, PIPFILE, LOCKFILE)
+    assert diff.added == {"six": "1.16.0"}
+    assert diff.changed == {"setuptools": "65.0.0"}
+    assert diff.removed == []
+    assert diff.requirements == ["six==1.16.0", "setuptools==65.0.0"]
+
+
+def test_not_locked():
+    pins = {"numpy": "1.23.2"}
+    diff = pipfile.diff_pins(pins, PIPFILE, {})
+    assert diff.changed == pins
+
+
+def test_removed():
+    previous = {"numpy": "1.23.2", "setuptools": "63.0.0", "cowsay": "5.0"}
+    diff = pipfile.diff_pins({"setuptools": "63.0.0"}, PIPFILE, LOCKFILE, previous)
+    # Not pinned to the previously synced version, so it was added by the user
+    assert diff.removed == ["NumPy"]
+
+
+@pytest.fixture
+def pe(tmp_path: Path, monkeypatch) -> PipenvEnvironment:
+    pe = PipenvEnvironment(tmp_path)
+    pipfile.write_pipfile(tmp_path / "Pipfile", PIPFILE)
+    (tmp_path / "Pipfile.lock").write_text(json.dumps(LOCKFILE))
+
+    calls = []
+    monkeypatch.setattr(pe.program, "cmd", lambda *args, **_: calls.append(args))
+    pe.calls = calls  # type: ignore
+
+    return pe
+
+
+def test_sync_pins_unchanged(pe: PipenvEnvironment):
+    diff = pe.sync_pins({"numpy": "1.23.2", "setuptools": "63.0.0"})
+    assert not diff
+    assert pe.calls == []  # type: ignore
+
+
+def test_sync_pins_removed(pe: PipenvEnvironment):
+    pe.sync_pins({"numpy": "1.23.2", "setuptools": "63.0.0"})
+    diff = pe.sync_pins({"setuptools": "63.0.0"})
+
+    assert diff.removed == ["NumPy"]
+    assert pe.calls == [("--site-packages", "install")]  # type: ignore
+    assert "NumPy" not in pipfile.read_pipfile(pe.path / "Pipfile")["packages"]
+
+
+def test_transaction(pe: PipenvEnvironment):
+    with pe.transaction() as transaction:
+        transaction.sync({"numpy": "1.24.0", "setuptools": "63.0.0"})
+        transaction.add("six", "requests>=2")
+
+    assert transaction.diff.changed == {"numpy": "1.24.0"}
+    assert pe.calls == [  # type: ignore
+        ("--site-packages", "install", "six", "requests>=2")
+    ]
+    packages = pipfile.read_pipfile(pe.path / "Pipfile")["packages"]
+    assert packages == {"NumPy": "==1.24.0", "setuptools": "==63.0.0", "cowsay": "*"}
+
+
+def test_transaction_no_lockfile(pe: PipenvEnvironment):
+    (pe.path / "Pipfile.lock").unlink()
+
+    with pe.transaction():
+        pass
+
+    assert pe.calls == [("--site-packages", "install")]  # type: ignore
+
+
+def test_apply_diff():
+    pipfile_dict = {"packages": {"NumPy": "==1.0", "six": "*"}}
+    diff = pipfile.PinDiff(
+        added={"pip": "22.0"}, changed={"numpy": "1.1"}, removed=["six"]
+    )
+    pipfile.apply_diff(pipfile_dict, diff)
+    assert pipfile_dict == {"packages": {"NumPy": "==1.1", "pip": "==22.0"}}
+
+
+def test_locked_requirements():
+    lockfile = {
+        "default": {
+            "numpy": {"version": "==1.23.2", "hashes": ["sha256:aa"]},
+            "pywin32": {"version": "==305", "markers": "sys_platform == 'win32'"},
+            "local": {"path": ".", "editable": True},
+        },
+        "develop": {"pytest": {"version": "==7.2.0", "hashes": ["sha256:bb"]}},
+    }
+
+    requirements = pipfile.locked_requirements(lockfile)
+    assert [r.line for r in requirements] == [
+        "numpy==1.23.2",
+        "pywin32==305; sys_platform == 'win32'",
+    ]
+    assert pipfile.requirements_txt(requirements) == (
+        "numpy==1.23.2\npywin32==305; sys_platform == 'win32'\n"
+    )
+
+    requirements = pipfile.locked_requirements(lockfile, ("default", "develop"))
+    assert pipfile.requirements_txt([requirements[0], requirements[2]]) == (
+        "numpy==1.23.2 --hash=sha256:aa\npytest==7.2.0 --hash=sha256:bb\n"
+    )
+
+    assert pipfile.unpinned_requirements(lockfile) == ["local"]
+    assert pipfile.unpinned_requirements(lockfile, ("develop",)) == []
+
+
+def test_build_wheels(pe: PipenvEnvironment, tmp_path: Path):
+    wheelhouse = tmp_path / "wheelhouse"
+    wheelhouse.mkdir()
+    (wheelhouse / "NumPy-1.23.2-cp310-cp310-linux_x86_64.whl").touch()
+    (wheelhouse / "setuptools-63.0-1-py3-none-any.whl").touch()
+    (wheelhouse / "not-a-wheel.whl").touch()
+
+    built = pe.build_wheels(wheelhouse)
+
+    assert [r.name for r in built] == ["cowsay"]
+    assert pe.calls[0][:3] == ("run", "pip", "wheel")  # type: ignore
+    requirements = pe.state_path / "wheelhouse-requirements.txt"
+    assert requirements.read_text() == "cowsay==5.0\n"
+
+    (wheelhouse / "setuptools-63.0-1-py3-none-any.whl").unlink()
+    built = pe.build_wheels(wheelhouse)
+
+    assert [r.name for r in built] == ["setuptools", "cowsay"]
+    requirements = pe.state_path / "wheelhouse-requirements.txt"
+    assert requirements.read_text() == "setuptools==63.0.0\ncowsay==5.0\n"
+
+
+def test_pip_cache(pe: PipenvEnvironment):
+    assert pe.program.env["PIP_CACHE_DIR"].endswith("pip")
+    assert pe.program.env["PIPENV_CACHE_DIR"].endswith("pipenv")
+
+
+def test_find_links(tmp_path: Path):
+    (tmp_path / "cache" / "wheelhouse").mkdir(parents=True)
+    with mock.patch.object(settings, "cache_dir", tmp_path / "cache"):
+        pe = PipenvEnvironment(tmp_path / "env")
+
+    assert pe.program.env["PIP_CACHE_DIR"] == str(tmp_path / "cache" / "pip")
+    assert pe.program.env["PIP_FIND_LINKS"] == str(tmp_path / "cache" / "wheelhouse")
+
+
+def test_pipfile_hash():
+    lockfile = {"_meta": {"hash": {"sha256": pipfile.pipfile_hash(PIPFILE)}}}
+    assert pipfile.lock_is_current(PIPFILE, lockfile)
+
+    changed = {**PIPFILE, "packages": {**PIPFILE["packages"], "six": "*"}}
+    assert not pipfile.lock_is_current(changed, lockfile)
+    assert not pipfile.lock_is_current(PIPFILE, LOCKFILE)
+
+
+def test_install_locked_out_of_date(pe: PipenvEnvironment):
+    assert not pe.install_locked()
+    assert pe.calls == []  # type: ignore
@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from pyvarium.installers.spack_lock import SpackLock
+
+LOCK_V4 = {
+    "_meta": {"file-type": "spack-lockfile", "lockfile-version": 4},
+    "roots": [{"hash": "numpyhash", "spec": "py-numpy"}],
+    "concrete_specs": {
+        "numpyhash": {
+            "name": "py-numpy",
+            "version": "1.23.2",
+            "namespace": "builtin",
+            "dependencies": [
+                {
+                    "name": "python",
+                    "hash": "pythonhash",
+                    "parameters": {"deptypes": ["build", "link", "run"]},
+                },
+                {
+                    "name": "openblas",
+                    "hash": "openblashash",
+                    "parameters": {"deptypes": ["build", "link"]},
+                },
+            ],
+        },
+        "pythonhash": {
+            "name": "python",
+            "version": "3.8.13",
+            "namespace": "builtin",
+            "dependencies": [
+                {"name": "zlib", "hash": "zlibhash", "parameters": {"deptypes": []}}
+            ],
+        },
+        "openblashash": {"name": "openblas", "version": "0.3.20", "namespace": "xfel"},
+        "zlibhash": {
+            "name": "zlib",
+            "version": "1.2.12",
+            "namespace": "builtin",
+            "external": {"path": "/usr", "module": None},
+        },
+    },
+}
+
+LOCK_V2 = {
+    "_meta": {"file-type": "spack-lockfile", "lockfile-version": 2},
+    "roots": [{"hash": "piphash", "spec": "py-pip"}],
+    "concrete_specs": {
+        "piphash": {
+            "py-pip": {
+                "version": "21.3.1",
+                "namespace": "builtin",
+                "dependencies": {
+                    "python": {"hash": "pythonhash", "type": ["build", "run"]}
+                },
+            }
+        },
+        "pythonhash": {"python": {"version": "3.9.12", "namespace": "builtin"}},
+    },
+}
+
+
+@pytest.fixture
+def lock(tmp_path: Path) -> SpackLock:
+    path = tmp_path / "spack.lock"
+    path.write_text(json.dumps(LOCK_V4))
+    return SpackLock.from_file(path)
+
+
+def test_lookups(lock: SpackLock):
+    assert len(lock) == 4
+    assert "python" in lock and "pythonhash" in lock and "perl" not in lock
+    assert lock["numpyhash"].name == "py-numpy"
+    assert lock.get("python").version == "3.8.13"
+    assert lock.get("perl") is None
+    assert [s.name for s in lock.in_namespace("xfel")] == ["openblas"]
+    assert [s.name for s in lock.roots] == ["py-numpy"]
+    assert lock.get("zlib").external
+    assert lock["numpyhash"].dependencies["openblashash"] == ("build", "link")
+
+
+def test_python_packages(lock: SpackLock):
+    assert lock.python_packages() == {"py-numpy": "1.23.2"}
+
+
+def test_dependencies(lock: SpackLock):
+    assert [s.name for s in lock.dependencies("py-numpy")] == ["openblas", "python"]
+    assert [s.name for s in lock.dependencies("py-numpy", transitive=True)] == [
+        "openblas",
+        "python",
+        "zlib",
+    ]
+
+
+def test_dependents(lock: SpackLock):
+    assert [s.name for s in lock.dependents("zlib")] == ["python"]
+    assert [s.name for s in lock.dependents("zlibhash", transitive=True)] == [
+        "py-numpy",
+        "python",
+    ]
+
+    with pytest.raises(KeyError):
+        lock.dependents("perl")
+
+
+def test_old_lockfile():
+    lock = SpackLock.from_dict(LOCK_V2)
+    assert lock.python_packages() == {"py-pip": "21.3.1"}
+    assert lock.get("py-pip").dependencies == {"pythonhash": ("build", "run")}
+    assert [s.name for s in lock.dependents("python")] == ["py-pip"]
@@ -0,0 +1,13 @@
+import asyncio
+
+from pyvarium.installers.spack import SpackEnvironment
+
+
+def test_anew(recording_se: SpackEnvironment, spack_calls):
+    asyncio.run(recording_se.anew())
+
+    assert spack_calls()[-1].endswith("--without-view")
+    assert recording_se.get_config()["spack"]["view"] == {
+        "default": {"root": str(recording_se.path / ".venv"), "link": "run"}
+    }
+    assert recording_se.get_config()["spack"]["concretizer"] == {"unify": True}
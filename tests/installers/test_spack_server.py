@@ -0,0 +1,155 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from pyvarium.config import settings
+from pyvarium.installers.spack import Spack
+from pyvarium.installers import spack_server
+from pyvarium.installers.spack_server import subcommand
+
+SPACK_EXECUTABLE = f"""#!{sys.executable}
+import runpy
+import sys
+from pathlib import Path
+
+if sys.argv[1] == "python":
+    sys.path.insert(0, str(Path(__file__).parent.parent / "lib" / "spack"))
+    sys.argv = sys.argv[2:]
+    runpy.run_path(sys.argv[0], run_name="__spack_main__")
+else:
+    print("subprocess", *sys.argv[1:])
+"""
+
+SPACK_MAIN = """import os
+import time
+
+STATE = []
+
+
+def main(argv):
+    STATE.append(argv)
+    print("server", *argv)
+    if "state" in argv:
+        print(len(STATE))
+    if "crash" in argv:
+        os._exit(1)
+    if "hang" in argv:
+        time.sleep(60)
+    return 3 if "fail" in argv else 0
+"""
+
+
+@pytest.fixture
+def fake_spack(tmp_path: Path) -> Path:
+    package = tmp_path / "lib" / "spack" / "spack"
+    (package / "hooks").mkdir(parents=True)
+    (package / "__init__.py").touch()
+    (package / "main.py").write_text(SPACK_MAIN)
+
+    executable = tmp_path / "bin" / "spack"
+    executable.parent.mkdir()
+    executable.write_text(SPACK_EXECUTABLE)
+    executable.chmod(0o755)
+
+    return executable
+
+
+@pytest.fixture
+def spack(fake_spack: Path):
+    with mock.patch.object(settings, "spack_server", True):
+        program = Spack(fake_spack)
+        yield program
+        program.close_server()
+
+
+def test_subcommand():
+    assert subcommand(["--env-dir", "find", "add", "x"]) == "add"
+    assert subcommand(["-d", "-e", "env", "find", "--json"]) == "find"
+    assert subcommand(["--debug"]) is None
+
+
+def test_server_commands(spack: Spack):
+    res = spack.cmd("--env-dir", "/tmp/env", "find", "--json")
+    assert res.stdout.decode() == "server --env-dir /tmp/env find --json\n"
+
+    server = spack.server
+    assert server is not None and server.alive
+
+    res = spack.cmd("find")
+    assert res.stdout.decode() == "server find\n"
+    assert spack.server is server
+
+
+def test_async_server_commands(spack: Spack):
+    res = asyncio.run(spack.acmd("find"))
+    assert res.stdout.decode() == "server find\n"
+
+
+def test_long_commands_use_subprocess(spack: Spack):
+    res = spack.cmd("--env-dir", "/tmp/env", "install")
+    assert res.stdout.decode() == "subprocess --env-dir /tmp/env install\n"
+
+
+def test_server_command_error(spack: Spack):
+    with pytest.raises(RuntimeError):
+        spack.cmd("find", "fail")
+
+
+def test_server_fallback(spack: Spack):
+    res = spack.cmd("find", "crash")
+    assert res.stdout.decode() == "subprocess find crash\n"
+    assert spack.server is None
+
+
+def test_server_state_isolated(spack: Spack):
+    assert spack.cmd("find", "state").stdout.decode() == "server find state\n1\n"
+    assert spack.cmd("find", "state").stdout.decode() == "server find state\n1\n"
+
+
+def test_server_timeout(spack: Spack, monkeypatch):
+    spack.cmd("find")
+    server = spack.server
+
+    monkeypatch.setattr(spack_server, "TIMEOUT", 0.5)
+    res = spack.cmd("find", "hang")
+    assert res.stdout.decode() == "subprocess find hang\n"
+    assert spack.server is None and not server.alive
+
+    assert spack.cmd("find").stdout.decode() == "server find\n"
+
+
+def test_server_exit_handlers(spack: Spack, monkeypatch):
+    handlers = set()
+    monkeypatch.setattr(
+        spack_server,
+        "atexit",
+        SimpleNamespace(register=handlers.add, unregister=handlers.discard),
+    )
+
+    for i in range(3):
+        spack.env["SPACK_RESTART"] = str(i)
+        spack.cmd("find")
+        assert handlers == {spack.server.close}
+
+    spack.close_server()
+    assert handlers == set()
+
+
+def test_server_restart_on_env_change(spack: Spack):
+    spack.cmd("find")
+    server = spack.server
+
+    spack.env["SPACK_FOO"] = "bar"
+    spack.cmd("find")
+
+    assert spack.server is not server
+    assert not server.alive
+
+
+def test_server_disabled(fake_spack: Path):
+    res = Spack(fake_spack).cmd("find")
+    assert res.stdout.decode() == "subprocess find\n"
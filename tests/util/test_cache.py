@@ -0,0 +1,98 @@
+import os
+from pathlib import Path
+from unittest import mock
+
+from pyvarium.config import settings
+from pyvarium.installers.base import Program
+from pyvarium.util.cache import FileCache, ResultCache, fingerprint
+
+
+def test_fingerprint(tmp_path: Path):
+    file = tmp_path / "spack.lock"
+    missing = fingerprint(file)
+
+    file.write_text("{}")
+    created = fingerprint(file)
+    assert created != missing
+    assert fingerprint(file) == created
+
+    st = file.stat()
+    os.utime(file, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert fingerprint(file) != created
+
+
+def test_fingerprint_directory(tmp_path: Path):
+    before = fingerprint(tmp_path)
+    st = tmp_path.stat()
+    (tmp_path / "numpy-1.23.2.dist-info").mkdir()
+    os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert fingerprint(tmp_path) != before
+
+
+def test_cached(tmp_path: Path):
+    cache = ResultCache(tmp_path)
+    calls = []
+
+    def func():
+        calls.append(None)
+        return [{"name": "numpy", "version": "1.23.2"}]
+
+    assert cache.cached("find", "a", func) == func()
+    assert cache.cached("find", "a", func) == func()
+    assert len(calls) == 3
+
+    assert cache.get("find", "a") is not None
+
+
+def test_stale_entry_dropped(tmp_path: Path):
+    cache = ResultCache(tmp_path)
+    cache.set("find", "a", {"foo": "bar"})
+
+    assert cache.get("find", "b") is None
+    assert not (tmp_path / "find.json").exists()
+
+    assert cache.cached("find", "b", lambda: {"foo": "baz"}) == {"foo": "baz"}
+    assert cache.get("find", "b") == {"foo": "baz"}
+
+
+def test_corrupt_entry_dropped(tmp_path: Path):
+    (tmp_path / "find.json").write_text("{")
+    assert ResultCache(tmp_path).get("find", "a") is None
+    assert not (tmp_path / "find.json").exists()
+
+
+def test_program_version_cached(tmp_path: Path):
+    calls = tmp_path / "calls"
+    executable = tmp_path / "program"
+    executable.write_text(f"#!/bin/sh\necho x >> {calls}\necho 'program 1.0'\n")
+    executable.chmod(0o755)
+
+    with mock.patch.object(settings, "cache_dir", tmp_path / "cache"):
+        program = Program(executable)
+        assert program.version == "program 1.0"
+        assert program.version == "program 1.0"
+        assert len(calls.read_text().splitlines()) == 1
+
+        executable.write_text(executable.read_text().replace("1.0", "2.0"))
+        assert program.version == "program 2.0"
+
+
+def test_file_cache_lru(tmp_path: Path):
+    cache = FileCache(tmp_path / "cache", max_size=25)
+    source = tmp_path / "spack.lock"
+
+    for i, key in enumerate(["a", "b", "c"]):
+        source.write_text(f"{key}" * 10)
+        cache.put(key, source)
+        # Make sure modification times differ between entries
+        os.utime(cache.path / key / "spack.lock", ns=(i * 10**9, i * 10**9))
+
+    assert cache.get("a", "spack.lock") is None
+    assert cache.get("b", "spack.lock") is not None  # now the most recently used
+
+    source.write_text("d" * 10)
+    cache.put("d", source)
+
+    assert cache.get("c", "spack.lock") is None
+    assert (cache.get("b", "spack.lock")).read_text() == "b" * 10
+    assert (cache.get("d", "spack.lock")).read_text() == "d" * 10
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pytest
+
+from pyvarium.util import distributions
+from pyvarium.util.distributions import canonicalize_name, find_distributions
+
+
+def write_dist_info(site_packages: Path, name: str, version: str) -> None:
+    dist_info = site_packages / f"{name.replace('-', '_')}-{version}.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text(
+        f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    )
+
+
+@pytest.fixture
+def site_packages(tmp_path: Path) -> Path:
+    site_packages = tmp_path / "lib" / "python3.8" / "site-packages"
+    write_dist_info(site_packages, "numpy", "1.23.2")
+    write_dist_info(site_packages, "EXtra-data", "1.12.0")
+
+    egg_info = site_packages / "h5py-3.7.0-py3.8.egg-info"
+    egg_info.mkdir()
+    (egg_info / "PKG-INFO").write_text(
+        "Metadata-Version: 1.1\nName: h5py\nVersion: 3.7.0\n"
+    )
+
+    (site_packages / "six-1.16.0-py3.8.egg-info").write_text(
+        "Metadata-Version: 1.1\nName: six\nVersion: 1.16.0\n"
+    )
+
+    (site_packages / "broken.dist-info").mkdir()
+    (site_packages / "numpy").mkdir()
+
+    return site_packages
+
+
+def test_canonicalize_name():
+    assert canonicalize_name("EXtra_data") == "extra-data"
+    assert canonicalize_name("zope.interface") == "zope-interface"
+
+
+def test_find_distributions(site_packages: Path):
+    assert find_distributions([site_packages]) == [
+        {"name": "EXtra-data", "version": "1.12.0"},
+        {"name": "h5py", "version": "3.7.0"},
+        {"name": "numpy", "version": "1.23.2"},
+        {"name": "six", "version": "1.16.0"},
+    ]
+
+
+def test_first_site_packages_wins(site_packages: Path, tmp_path: Path):
+    other = tmp_path / "other"
+    write_dist_info(other, "numpy", "1.20.0")
+
+    res = find_distributions([site_packages, other])
+    assert {"name": "numpy", "version": "1.23.2"} in res
+    assert {"name": "numpy", "version": "1.20.0"} not in res
+
+
+def test_missing_site_packages(tmp_path: Path):
+    assert find_distributions([tmp_path / "missing"]) == []
+
+
+def test_egg_link(site_packages: Path, tmp_path: Path):
+    source = tmp_path / "src" / "karabo"
+    egg_info = source / "karabo.egg-info"
+    egg_info.mkdir(parents=True)
+    (egg_info / "PKG-INFO").write_text("Name: karabo\nVersion: 2.0\n")
+    (site_packages / "karabo.egg-link").write_text(f"{source}\n.\n")
+
+    assert {"name": "karabo", "version": "2.0"} in find_distributions([site_packages])
+
+
+def test_threaded(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(distributions, "THREADED_THRESHOLD", 4)
+    for i in range(10):
+        write_dist_info(tmp_path, f"package-{i}", f"1.{i}")
+
+    res = find_distributions([tmp_path], max_workers=4)
+    assert len(res) == 10
+    assert res[0] == {"name": "package-0", "version": "1.0"}
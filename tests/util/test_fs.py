@@ -0,0 +1,65 @@
+import errno
+import os
+from pathlib import Path
+
+import pytest
+
+from pyvarium.util import fs
+
+
+@pytest.fixture
+def no_reflink(monkeypatch):
+    def reflink(src, dst):
+        raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+    monkeypatch.setattr(fs, "reflink", reflink)
+
+
+def test_clone_file(tmp_path: Path):
+    (tmp_path / "a").write_text("data")
+
+    method = fs.clone_file(tmp_path / "a", tmp_path / "b")
+
+    assert method in ("reflink", "hardlink")
+    assert (tmp_path / "b").read_text() == "data"
+
+
+def test_clone_file_fallbacks(tmp_path: Path, no_reflink):
+    (tmp_path / "a").write_text("data")
+
+    assert fs.clone_file(tmp_path / "a", tmp_path / "b") == "hardlink"
+    assert os.path.samefile(tmp_path / "a", tmp_path / "b")
+
+    assert fs.clone_file(tmp_path / "a", tmp_path / "c", hardlink=False) == "copy"
+    assert not os.path.samefile(tmp_path / "a", tmp_path / "c")
+    assert (tmp_path / "c").read_text() == "data"
+
+
+def test_clone_tree(tmp_path: Path, no_reflink):
+    src = tmp_path / "src"
+    (src / "lib" / "pkg").mkdir(parents=True)
+    (src / "lib" / "pkg" / "mod.py").write_text("mod")
+    (src / "lib" / "linked.py").symlink_to(src / "lib" / "pkg" / "mod.py")
+    (src / "skip").mkdir()
+    (src / "skip" / "file").write_text("")
+    (src / "bin").mkdir()
+    (src / "bin" / "script").write_text("script")
+
+    dst = tmp_path / "dst"
+    (dst / "lib").mkdir(parents=True)
+    (dst / "lib" / "linked.py").write_text("existing")
+
+    counts = fs.clone_tree(
+        src,
+        dst,
+        ignore=lambda p: p == Path("skip"),
+        rewrite=lambda s, d: s.name == "script" and bool(d.write_text("new")),
+    )
+
+    assert counts == {"hardlink": 1, "rewrite": 1}
+    assert os.path.samefile(
+        src / "lib" / "pkg" / "mod.py", dst / "lib" / "pkg" / "mod.py"
+    )
+    assert (dst / "lib" / "linked.py").read_text() == "existing"
+    assert (dst / "bin" / "script").read_text() == "new"
+    assert not (dst / "skip").exists()
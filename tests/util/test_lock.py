@@ -0,0 +1,36 @@
+import hashlib
+from pathlib import Path
+
+from pyvarium.util.lock import LOCK_FILE, EnvironmentLock, hash_file
+
+
+def test_hash_file(tmp_path: Path):
+    (tmp_path / "spack.yaml").write_text("spack: {}\n")
+    assert (
+        hash_file(tmp_path / "spack.yaml") == hashlib.sha256(b"spack: {}\n").hexdigest()
+    )
+    assert hash_file(tmp_path / "spack.lock") == "missing"
+
+
+def test_lock(tmp_path: Path):
+    inputs = {"spack.yaml": "abc", "spack": "0.19.0"}
+
+    lock = EnvironmentLock.load(tmp_path)
+    assert not lock.unchanged("spack", inputs)
+
+    lock.record("spack", inputs)
+    lock.save()
+    assert (tmp_path / LOCK_FILE).is_file()
+
+    lock = EnvironmentLock.load(tmp_path)
+    assert lock.unchanged("spack", inputs)
+    assert not lock.unchanged("spack", {**inputs, "spack": "0.20.0"})
+    assert not lock.unchanged("pipenv", inputs)
+
+    lock.discard("spack")
+    assert not lock.unchanged("spack", inputs)
+
+
+def test_invalid_lock(tmp_path: Path):
+    (tmp_path / LOCK_FILE).write_text("{")
+    assert EnvironmentLock.load(tmp_path).phases == {}
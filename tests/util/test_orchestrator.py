@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+from pyvarium.util.orchestrator import Orchestrator
+
+
+def test_phases_overlap():
+    events = []
+
+    async def slow():
+        events.append("slow start")
+        await asyncio.sleep(0.2)
+        events.append("slow end")
+        return "slow"
+
+    def fast():
+        events.append("fast")
+        return "fast"
+
+    async def last():
+        events.append("last")
+        return "last"
+
+    orchestrator = Orchestrator()
+    orchestrator.phase("slow", slow)
+    orchestrator.phase("fast", fast)
+    orchestrator.phase("last", last, after=["slow", "fast"])
+
+    start = time.monotonic()
+    res = orchestrator.run()
+
+    assert time.monotonic() - start < 1
+    assert res == {"slow": "slow", "fast": "fast", "last": "last"}
+    assert events.index("fast") < events.index("slow end")
+    assert events[-1] == "last"
+
+
+def test_failure_cancels_other_phases():
+    finished = []
+
+    async def fail():
+        raise RuntimeError("failed")
+
+    async def slow():
+        await asyncio.sleep(5)
+        finished.append("slow")
+
+    orchestrator = Orchestrator()
+    orchestrator.phase("fail", fail)
+    orchestrator.phase("slow", slow)
+
+    with pytest.raises(RuntimeError, match="failed"):
+        orchestrator.run()
+
+    assert finished == []
+
+
+def test_invalid_dependencies():
+    orchestrator = Orchestrator()
+    orchestrator.phase("a", lambda: None, after=["b"])
+
+    with pytest.raises(ValueError, match="unknown"):
+        orchestrator.run()
+
+    orchestrator.phase("b", lambda: None, after=["a"])
+
+    with pytest.raises(ValueError, match="Circular"):
+        orchestrator.run()
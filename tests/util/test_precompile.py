@@ -0,0 +1,71 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+from pyvarium.util.precompile import precompile
+
+
+def test_precompile(tmp_path: Path):
+    site_packages = tmp_path / "site-packages"
+    (site_packages / "pkg").mkdir(parents=True)
+    (site_packages / "pkg" / "__init__.py").write_text("")
+    (site_packages / "pkg" / "mod.py").write_text("VALUE = 1\n")
+    (site_packages / "broken.py").write_text("def (\n")
+    # Modules linked from a spack prefix get their bytecode next to the link
+    (tmp_path / "prefix.py").write_text("")
+    (site_packages / "linked.py").symlink_to(tmp_path / "prefix.py")
+
+    res = precompile(Path(sys.executable), [site_packages], max_workers=2)
+
+    assert (res.compiled, res.current) == (3, 0)
+    assert res.failed == [str(site_packages / "broken.py")]
+    assert Path(
+        importlib.util.cache_from_source(str(site_packages / "linked.py"))
+    ).is_file()
+    assert not (tmp_path / "__pycache__").exists()
+
+    (site_packages / "pkg" / "mod.py").write_text("VALUE = 22\n")
+    res = precompile(Path(sys.executable), [site_packages])
+    assert (res.compiled, res.current) == (1, 2)
+
+
+def test_precompile_unchecked_hash(tmp_path: Path):
+    (tmp_path / "mod.py").write_text("VALUE = 1\n")
+    cfile = Path(importlib.util.cache_from_source(str(tmp_path / "mod.py")))
+
+    precompile(Path(sys.executable), [tmp_path])
+    assert int.from_bytes(cfile.read_bytes()[4:8], "little") == 0
+
+    res = precompile(
+        Path(sys.executable), [tmp_path], invalidation_mode="unchecked-hash"
+    )
+    assert res.compiled == 1
+    assert int.from_bytes(cfile.read_bytes()[4:8], "little") == 0b01
+
+    res = precompile(
+        Path(sys.executable), [tmp_path], invalidation_mode="unchecked-hash"
+    )
+    assert (res.compiled, res.current) == (0, 1)
+
+
+def test_precompile_linked_bytecode(tmp_path: Path):
+    # A spack view links the `__pycache__` of a package along with its sources
+    prefix, view = tmp_path / "prefix", tmp_path / "view"
+    prefix.mkdir()
+    (prefix / "mod.py").write_text("VALUE = 1\n")
+    precompile(Path(sys.executable), [prefix])
+    prefix_cfile = Path(importlib.util.cache_from_source(str(prefix / "mod.py")))
+    data = prefix_cfile.read_bytes()
+
+    (view / "__pycache__").mkdir(parents=True)
+    (view / "mod.py").symlink_to(prefix / "mod.py")
+    cfile = Path(importlib.util.cache_from_source(str(view / "mod.py")))
+    cfile.symlink_to(prefix_cfile)
+
+    res = precompile(Path(sys.executable), [view])
+    assert (res.compiled, res.current, res.failed) == (0, 1, [])
+
+    res = precompile(Path(sys.executable), [view], invalidation_mode="unchecked-hash")
+    assert (res.compiled, res.current, res.failed) == (0, 0, [])
+    assert res.linked == [str(view / "mod.py")]
+    assert cfile.is_symlink() and prefix_cfile.read_bytes() == data
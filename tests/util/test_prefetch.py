@@ -0,0 +1,218 @@
+import hashlib
+import json
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from pyvarium.installers import pipfile
+from pyvarium.installers.pipenv import PipenvEnvironment
+from pyvarium.util.prefetch import (
+    SimpleIndex,
+    download,
+    filename_version,
+    interpreter_tags,
+    prefetch,
+    select_files,
+)
+
+FILES = {
+    "alpha": {
+        "alpha-1.0-py3-none-any.whl": b"alpha wheel" * 1000,
+        "alpha-1.0-cp27-cp27m-win32.whl": b"incompatible alpha wheel",
+        "alpha-1.0.tar.gz": b"alpha sdist",
+    },
+    "beta": {
+        "beta-2.0.tar.gz": b"beta sdist" * 1000,
+        "beta-1.0.tar.gz": b"old beta sdist",
+    },
+}
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Serves files with support for `Range: bytes=N-` requests."""
+
+    ranges = []
+
+    def send_head(self):
+        path = Path(self.translate_path(self.path))
+        header = self.headers.get("Range")
+        if not header or not path.is_file():
+            return super().send_head()
+
+        self.ranges.append((path.name, header))
+        start = int(header.split("=")[1].rstrip("-"))
+        data = path.read_bytes()
+        if start >= len(data):
+            self.send_error(416)
+            return None
+
+        f = path.open("rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        self.end_headers()
+        return f
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def index_dir(tmp_path: Path) -> Path:
+    """A simple index with `index.html` pages linking to files with hashes."""
+    index = tmp_path / "index"
+    for project, files in FILES.items():
+        (index / project).mkdir(parents=True)
+        links = []
+        for name, data in files.items():
+            (index / project / name).write_bytes(data)
+            sha256 = hashlib.sha256(data).hexdigest()
+            links.append(f'<a href="{name}#sha256={sha256}">{name}</a>')
+        (index / project / "index.html").write_text("\n".join(links))
+
+    return index
+
+
+@pytest.fixture
+def server(index_dir: Path):
+    RangeHandler.ranges = []
+    handler = partial(RangeHandler, directory=str(index_dir))
+    with ThreadingHTTPServer(("127.0.0.1", 0), handler) as httpd:
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+        httpd.shutdown()
+
+
+def test_filename_version():
+    assert filename_version("Foo_Bar-1.0-py3-none-any.whl") == ("foo-bar", "1.0")
+    assert filename_version("foo.bar-1.0-1b-py3-none-any.whl") == ("foo-bar", "1.0")
+    assert filename_version("foo-bar-1.0.tar.gz") == ("foo-bar", "1.0")
+    assert filename_version("foo.exe") is None
+
+
+def test_select_files():
+    tags = interpreter_tags(Path(sys.executable))
+    files = ["a-1.0.tar.gz", "a-1.0-cp27-cp27m-win32.whl", "a-1.0-py3-none-any.whl"]
+
+    assert select_files(files, tags) == ["a-1.0-py3-none-any.whl"]
+    assert select_files(files[:2], tags) == ["a-1.0.tar.gz"]
+
+
+def test_links(server: str, index_dir: Path):
+    links = SimpleIndex(server).links("Beta")
+    assert [link.filename for link in links] == ["beta-2.0.tar.gz", "beta-1.0.tar.gz"]
+    assert links[0].url == f"{server}beta/beta-2.0.tar.gz"
+    assert (
+        links[0].hashes["sha256"]
+        == hashlib.sha256(FILES["beta"]["beta-2.0.tar.gz"]).hexdigest()
+    )
+
+    # Local directory with index pages, and without
+    assert SimpleIndex(index_dir.as_uri()).links("beta")[0].hashes == links[0].hashes
+    (index_dir / "beta" / "index.html").unlink()
+    links = SimpleIndex(index_dir.as_uri()).links("beta")
+    assert [link.filename for link in links] == ["beta-1.0.tar.gz", "beta-2.0.tar.gz"]
+
+
+def test_download_resume(server: str, tmp_path: Path):
+    data = FILES["alpha"]["alpha-1.0-py3-none-any.whl"]
+    sha256 = hashlib.sha256(data).hexdigest()
+    dest = tmp_path / "alpha-1.0-py3-none-any.whl"
+    (tmp_path / f"{dest.name}.part").write_bytes(data[:100])
+
+    assert download(f"{server}alpha/{dest.name}", dest, {sha256})
+
+    assert dest.read_bytes() == data
+    assert RangeHandler.ranges == [(dest.name, "bytes=100-")]
+    assert not (tmp_path / f"{dest.name}.part").exists()
+
+    # Already downloaded
+    assert not download(f"{server}alpha/{dest.name}", dest, {sha256})
+
+
+def test_download_bad_hash(server: str, tmp_path: Path):
+    dest = tmp_path / "beta-2.0.tar.gz"
+    with pytest.raises(ValueError, match="Hash mismatch"):
+        download(f"{server}beta/{dest.name}", dest, {"0" * 64})
+
+    assert not dest.exists()
+    assert not (tmp_path / f"{dest.name}.part").exists()
+
+
+def test_prefetch_failures(server: str, tmp_path: Path):
+    res = prefetch(
+        {f"{server}alpha/alpha-1.0-py3-none-any.whl": None, f"{server}missing": None},
+        tmp_path / "dest",
+        max_workers=2,
+    )
+    assert [p.name for p in res.downloaded] == ["alpha-1.0-py3-none-any.whl"]
+    assert list(res.failed) == [f"{server}missing"]
+
+
+@pytest.mark.parametrize("local", [False, True])
+def test_pipenv_prefetch(server: str, index_dir: Path, tmp_path: Path, local: bool):
+    url = index_dir.as_uri() if local else server
+    beta = FILES["beta"]["beta-2.0.tar.gz"]
+    lockfile = {
+        "_meta": {"sources": [{"name": "local", "url": url, "verify_ssl": False}]},
+        "default": {
+            "alpha": {"version": "==1.0"},
+            "beta": {
+                "version": "==2.0",
+                "hashes": [f"sha256:{hashlib.sha256(beta).hexdigest()}"],
+            },
+        },
+    }
+    env = tmp_path / "env"
+    env.mkdir()
+    (env / "Pipfile.lock").write_text(json.dumps(lockfile))
+    pipfile.write_pipfile(env / "Pipfile", {"packages": {"alpha": "*", "beta": "*"}})
+
+    dest = tmp_path / "wheelhouse"
+    res = PipenvEnvironment(env).prefetch(
+        dest, python=Path(sys.executable), max_workers=4
+    )
+
+    assert not res.failed
+    assert sorted(p.name for p in res.downloaded) == [
+        "alpha-1.0-py3-none-any.whl",
+        "beta-2.0.tar.gz",
+    ]
+    assert (dest / "beta-2.0.tar.gz").read_bytes() == beta
+
+    res = PipenvEnvironment(env).prefetch(dest, python=Path(sys.executable))
+    assert len(res.skipped) == 2 and not res.downloaded
+
+    # Without a venv to pick wheels for, the files of all platforms are fetched
+    res = PipenvEnvironment(env).prefetch(dest)
+    assert sorted(p.name for p in res.downloaded) == [
+        "alpha-1.0-cp27-cp27m-win32.whl",
+        "alpha-1.0.tar.gz",
+    ]
+
+
+@pytest.mark.parametrize("local", [False, True])
+def test_pipenv_prefetch_missing_project(
+    server: str, index_dir: Path, tmp_path: Path, local: bool
+):
+    url = index_dir.as_uri() if local else server
+    lockfile = {
+        "_meta": {"sources": [{"name": "local", "url": url, "verify_ssl": False}]},
+        "default": {"alpha": {"version": "==1.0"}, "gamma": {"version": "==1.0"}},
+    }
+    env = tmp_path / "env"
+    env.mkdir()
+    (env / "Pipfile.lock").write_text(json.dumps(lockfile))
+
+    res = PipenvEnvironment(env).prefetch(
+        tmp_path / "wheelhouse", python=Path(sys.executable)
+    )
+
+    assert [p.name for p in res.downloaded] == ["alpha-1.0-py3-none-any.whl"]
+    assert list(res.failed) == ["gamma==1.0"]
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from pyvarium.util.python_venv import (
+    create_venv,
+    ensure_pip,
+    python_version,
+    relocate_script,
+)
+
+
+def test_python_version():
+    assert python_version(Path(sys.executable)) == tuple(sys.version_info[:3])
+
+
+def test_create_venv_in_view(tmp_path: Path):
+    # Fake spack view: a link to the interpreter and packages in site-packages
+    view = tmp_path / "env" / ".venv"
+    site_packages = view / "lib" / f"python{sys.version_info[0]}.{sys.version_info[1]}"
+    (site_packages / "site-packages").mkdir(parents=True)
+    (site_packages / "site-packages" / "viewpkg.py").write_text("")
+    (view / "bin").mkdir()
+    (view / "bin" / "python").symlink_to(os.path.realpath(sys.executable))
+
+    create_venv(view, view / "bin" / "python")
+
+    assert (view / "pyvenv.cfg").is_file()
+    assert (view / "bin" / "activate").is_file()
+    res = subprocess.run(
+        [view / "bin" / "python3", "-c", "import sys, viewpkg; print(sys.prefix)"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    assert res.stdout.strip() == str(view)
+
+
+def test_ensure_pip(tmp_path: Path):
+    venv = tmp_path / "env" / ".venv"
+    create_venv(venv, Path(sys.executable))
+    assert "(env) " in (venv / "bin" / "activate").read_text()
+
+    ensure_pip(venv)
+    subprocess.run([venv / "bin" / "python", "-m", "pip", "--version"], check=True)
+
+
+def test_relocate_script(tmp_path: Path):
+    old, new = tmp_path / "old" / ".venv", tmp_path / "new" / ".venv"
+    script = tmp_path / "script"
+    script.write_text(f"#!{old}/bin/python\n# {old}/bin/python\n")
+    script.chmod(0o750)
+    (tmp_path / "other").write_text("#!/usr/bin/env python\n")
+
+    assert relocate_script(script, tmp_path / "out", [old], new)
+    assert (tmp_path / "out").read_text() == f"#!{new}/bin/python\n# {old}/bin/python\n"
+    assert (tmp_path / "out").stat().st_mode & 0o777 == 0o750
+
+    assert not relocate_script(tmp_path / "other", tmp_path / "out2", [old], new)
+    assert not (tmp_path / "out2").exists()
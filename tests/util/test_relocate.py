@@ -0,0 +1,80 @@
+import gzip
+import io
+import os
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from pyvarium.util import relocate
+
+
+@pytest.fixture
+def view(tmp_path: Path) -> Path:
+    """View linking to a fake spack prefix, with a script installed by pip."""
+    prefix = tmp_path / "spack" / "pkg-1.0-abcdef"
+    (prefix / "bin").mkdir(parents=True)
+    (prefix / "bin" / "tool").write_text(f"#!/bin/sh\nexec {prefix}/bin/real\n")
+    (prefix / "bin" / "tool").chmod(0o555)
+    (prefix / "bin" / "data").write_bytes(f"\0{prefix}".encode())
+    (prefix / "lib").mkdir()
+    (prefix / "lib" / "pkg.py").write_text(f"OTHER = '{prefix}-other'\n")
+    (prefix / ".spack").mkdir()
+    (prefix / ".spack" / "install_manifest.json").write_text("{}")
+
+    view = tmp_path / "env" / ".venv"
+    (view / "bin").mkdir(parents=True)
+    (view / "lib").mkdir()
+    (view / "bin" / "tool").symlink_to(prefix / "bin" / "tool")
+    (view / "bin" / "data").symlink_to(prefix / "bin" / "data")
+    (view / "lib" / "pkg.py").symlink_to(prefix / "lib" / "pkg.py")
+    (view / "lib64").symlink_to("lib")
+    (view / "bin" / "pip-script").write_text(f"#!{view}/bin/python\n")
+    (view / ".spack" / "pkg").mkdir(parents=True)
+    (view / ".spack" / "pkg" / "install_manifest.json").symlink_to(
+        prefix / ".spack" / "install_manifest.json"
+    )
+
+    return view
+
+
+def test_view_prefixes(view: Path, tmp_path: Path):
+    assert relocate.view_prefixes(view) == [tmp_path / "spack" / "pkg-1.0-abcdef"]
+
+
+def test_pack_unpack(view: Path, tmp_path: Path):
+    archive = io.BytesIO()
+    with gzip.GzipFile(fileobj=archive, mode="wb") as f:
+        rewritten = relocate.pack(view, f, prefixes=relocate.view_prefixes(view))
+
+    assert sorted(rewritten) == [".venv/bin/pip-script", ".venv/bin/tool"]
+
+    archive.seek(0)
+    dest = tmp_path / "local" / "env"
+    venv = relocate.unpack(archive, dest)
+
+    assert venv == dest / ".venv"
+    assert not (venv / ".spack").exists()
+    assert not (venv / "bin" / "tool").is_symlink()
+    assert (venv / "bin" / "tool").read_text() == f"#!/bin/sh\nexec {venv}/bin/real\n"
+    assert os.access(venv / "bin" / "tool", os.X_OK)
+    assert (venv / "bin" / "pip-script").read_text() == f"#!{venv}/bin/python\n"
+    # Binary files are not rewritten, neither are longer paths starting with a prefix
+    assert (venv / "bin" / "data").read_bytes() == (view / "bin" / "data").read_bytes()
+    assert (venv / "lib" / "pkg.py").read_text() == (
+        view / "lib" / "pkg.py"
+    ).read_text()
+    assert os.readlink(venv / "lib64") == "lib"
+    assert str(venv) in (venv / "bin" / "activate").read_text()
+
+
+def test_unpack_rejects_outside_paths(tmp_path: Path):
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        info = tarfile.TarInfo(".venv/link")
+        info.type, info.linkname = tarfile.SYMTYPE, "../../etc"
+        tar.addfile(info)
+
+    archive.seek(0)
+    with pytest.raises(ValueError, match="Refusing"):
+        relocate.unpack(archive, tmp_path / "dest")
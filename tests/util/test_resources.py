@@ -0,0 +1,31 @@
+from pyvarium.util.resources import (
+    BuildPlan,
+    available_cores,
+    available_memory,
+    plan_build,
+)
+
+GIB = 1024**3
+
+
+def test_available():
+    assert available_cores() >= 1
+    memory = available_memory()
+    assert memory is None or memory > 0
+
+
+def test_plan_cores():
+    assert plan_build(16, 64 * GIB) == BuildPlan(workers=1, jobs=16)
+    assert plan_build(16, 64 * GIB, workers=4) == BuildPlan(workers=4, jobs=4)
+    assert plan_build(16, None, workers=3) == BuildPlan(workers=3, jobs=5)
+
+
+def test_plan_memory():
+    assert plan_build(64, 16 * GIB) == BuildPlan(workers=1, jobs=8)
+    assert plan_build(64, 16 * GIB, memory_per_job=4096) == BuildPlan(1, 4)
+    assert plan_build(64, 1 * GIB) == BuildPlan(workers=1, jobs=1)
+    assert plan_build(64, 16 * GIB, workers=16) == BuildPlan(workers=8, jobs=1)
+
+
+def test_plan_fixed_jobs():
+    assert plan_build(16, 64 * GIB, workers=2, jobs=12) == BuildPlan(2, 12)
@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from pyvarium.util.stage import StageResult, generations_path, stage
+
+
+@pytest.fixture
+def view(tmp_path: Path) -> Path:
+    prefix = tmp_path / "spack" / "pkg-1.0-abcdef"
+    (prefix / "lib").mkdir(parents=True)
+    (prefix / "lib" / "pkg.py").write_text("VALUE = 1\n")
+
+    view = tmp_path / "env" / ".venv"
+    (view / "bin").mkdir(parents=True)
+    (view / "lib").mkdir()
+    (view / "lib" / "pkg.py").symlink_to(prefix / "lib" / "pkg.py")
+    (view / "lib64").symlink_to("lib")
+    (view / "bin" / "script").write_text(f"#!{view}/bin/python\n")
+    (view / "bin" / "activate").write_text(f"VIRTUAL_ENV={view}\n")
+
+    return view
+
+
+def test_stage(view: Path, tmp_path: Path):
+    dest = tmp_path / "local" / "env"
+
+    res = stage(view, dest)
+
+    assert res == StageResult(dest.resolve(), copied=3, linked=0)
+    assert dest.is_symlink()
+    assert (dest / ".venv" / "lib" / "pkg.py").read_text() == "VALUE = 1\n"
+    assert not (dest / ".venv" / "lib" / "pkg.py").is_symlink()
+    assert os.readlink(dest / ".venv" / "lib64") == "lib"
+    assert (dest / ".venv" / "bin" / "script").read_text() == (
+        f"#!{dest}/.venv/bin/python\n"
+    )
+    assert (dest / ".venv" / "bin" / "activate").read_text() == (
+        f"VIRTUAL_ENV={dest}/.venv\n"
+    )
+
+
+def test_stage_unchanged(view: Path, tmp_path: Path):
+    dest = tmp_path / "local" / "env"
+    first = stage(view, dest)
+
+    res = stage(view, dest)
+
+    assert not res.changed
+    assert res.path == first.path
+
+
+def test_stage_incremental(view: Path, tmp_path: Path):
+    dest = tmp_path / "local" / "env"
+    first = stage(view, dest).path
+
+    (view / "bin" / "new").write_text("new")
+    second = stage(view, dest)
+    assert (second.copied, second.linked) == (1, 3)
+    assert second.path != first
+    assert os.path.samefile(
+        first / ".venv" / "lib" / "pkg.py", dest / ".venv" / "lib" / "pkg.py"
+    )
+
+    # Touched but identical files are linked as well, the stage before the current
+    # one is kept for jobs which still use it, older ones are removed
+    os.utime(view / "bin" / "new")
+    (view / "lib" / "pkg.py").unlink()
+    third = stage(view, dest)
+    assert (third.copied, third.linked) == (0, 3)
+    assert not (dest / ".venv" / "lib" / "pkg.py").exists()
+    assert second.path.is_dir()
+    assert not first.exists()
+    assert sorted(p for p in generations_path(dest).iterdir() if p.is_dir()) == sorted(
+        [second.path, third.path]
+    )
+
+
+def test_stage_refuses_existing(view: Path, tmp_path: Path):
+    (tmp_path / "local").mkdir()
+
+    with pytest.raises(FileExistsError):
+        stage(view, tmp_path / "local")
@@ -0,0 +1,55 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+PACKAGES = {
+    "py-numpy": ["numpy/__init__.py", "numpy/version.py", "numpy/core/multiarray.py"],
+    "py-six": ["six.py"],
+}
+
+
+def make_package(store: Path, view: Path, name: str, files) -> Path:
+    prefix = store / f"{name}-1.0-abcdef"
+    manifest: Dict[str, Dict] = {}
+
+    for i, file in enumerate(files):
+        target = prefix / "lib" / "python3.8" / "site-packages" / file
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(f"{name} {i}\n")
+        manifest[str(target)] = {
+            "type": "file",
+            "hash": hashlib.sha256(target.read_bytes()).hexdigest(),
+        }
+
+        link = view / target.relative_to(prefix)
+        link.parent.mkdir(parents=True, exist_ok=True)
+        link.symlink_to(target)
+
+    manifest_file = prefix / ".spack" / "install_manifest.json"
+    manifest_file.parent.mkdir(parents=True)
+    manifest_file.write_text(json.dumps(manifest))
+
+    package = view / ".spack" / name
+    package.mkdir(parents=True)
+    (package / "install_manifest.json").symlink_to(manifest_file)
+
+    return package
+
+
+@pytest.fixture
+def view(tmp_path: Path) -> Path:
+    """A fake spack view at `tmp_path/.venv` with packages installed in
+    `tmp_path/store`, all files in the view are symlinks to the store."""
+    view = tmp_path / ".venv"
+    for name, files in PACKAGES.items():
+        make_package(tmp_path / "store", view, name, files)
+
+    return view
+
+
+@pytest.fixture
+def site_packages(view: Path) -> Path:
+    return view / "lib" / "python3.8" / "site-packages"
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from pyvarium.verify.checksums import ChecksumCache, hash_file, verify_checksums
+
+
+def test_hash_file(tmp_path: Path):
+    empty = tmp_path / "empty"
+    empty.write_bytes(b"")
+    data = tmp_path / "data"
+    data.write_bytes(b"data" * 10000)
+
+    assert hash_file(str(empty)) == hashlib.sha256(b"").hexdigest()
+    assert hash_file(str(data)) == hashlib.sha256(b"data" * 10000).hexdigest()
+    assert hash_file(str(tmp_path / "missing")) is None
+
+
+def test_clean_view(view: Path):
+    res = verify_checksums(view, max_workers=2)
+    assert [p.name for p in res] == ["py-numpy", "py-six"]
+    assert all(len(c) == 0 for c in res.values())
+
+
+def test_corrupted(view: Path, site_packages: Path):
+    corrupted = (site_packages / "numpy" / "version.py").resolve()
+    corrupted.write_text("corrupted\n")
+
+    missing = (site_packages / "six.py").resolve()
+    missing.unlink()
+
+    progress = []
+    res = verify_checksums(view, progress=progress.append)
+
+    assert sorted(progress) == ["py-numpy", "py-six"]
+    assert [f for f, _ in res[view / ".spack" / "py-numpy"]] == [corrupted]
+    assert [f for f, _ in res[view / ".spack" / "py-six"]] == [missing]
+
+
+def test_cache(view: Path, site_packages: Path, tmp_path: Path):
+    cache = ChecksumCache(tmp_path / "checksums.json")
+    verify_checksums(view, cache=cache)
+    cache.save()
+
+    cache = ChecksumCache.load(tmp_path / "checksums.json")
+    assert len(cache.files) == 4
+
+    # Same inode, size, and mtime, the change can only be found by hashing the file
+    target = (site_packages / "six.py").resolve()
+    st = target.stat()
+    target.write_text("py-six X\n")
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    res = verify_checksums(view, cache=cache)
+    assert res[view / ".spack" / "py-six"] == []
+
+    # Without the cache the corruption is found
+    res = verify_checksums(view, cache=ChecksumCache(tmp_path / "new.json"))
+    assert [f for f, _ in res[view / ".spack" / "py-six"]] == [target]
+
+
+def test_cache_invalid(tmp_path: Path):
+    path = tmp_path / "checksums.json"
+    path.write_text(json.dumps({"version": -1, "files": {"a": [1, 2, 3, "x"]}}))
+    assert ChecksumCache.load(path).files == {}
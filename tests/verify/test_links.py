@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+from pyvarium.verify.links import LinkChecker, PackageManifest, verify_view
+
+
+def test_clean_view(view: Path):
+    res = verify_view(view)
+    assert [p.name for p in res] == ["py-numpy", "py-six"]
+    assert all(len(w) == 0 for w in res.values())
+
+
+def test_manifest(view: Path, site_packages: Path):
+    manifest = PackageManifest.read(view / ".spack" / "py-six", view)
+    assert manifest.prefix.name == "py-six-1.0-abcdef"
+    assert list(manifest.links) == [site_packages / "six.py"]
+
+
+def test_broken_links(view: Path, site_packages: Path, tmp_path: Path):
+    missing = site_packages / "numpy" / "version.py"
+    missing.unlink()
+
+    wrong = site_packages / "numpy" / "__init__.py"
+    wrong.unlink()
+    wrong.symlink_to(tmp_path / "elsewhere.py")
+
+    copied = site_packages / "six.py"
+    target = os.readlink(copied)
+    copied.unlink()
+    copied.write_text("six 0\n")
+
+    progress = []
+    res = verify_view(view, max_workers=2, progress=progress.append)
+
+    assert sorted(progress) == ["py-numpy", "py-six"]
+    assert sorted(link for link, _ in res[view / ".spack" / "py-numpy"]) == [
+        wrong,
+        missing,
+    ]
+    assert res[view / ".spack" / "py-six"] == [(copied, Path(target))]
+
+
+def test_relative_and_indirect_links(view: Path, site_packages: Path, tmp_path: Path):
+    six = site_packages / "six.py"
+    target = Path(os.readlink(six))
+    six.unlink()
+    six.symlink_to(os.path.relpath(target, six.parent))
+
+    # Link via a symlinked directory, only matches once both paths are resolved
+    (tmp_path / "store-link").symlink_to(tmp_path / "store")
+    version = site_packages / "numpy" / "version.py"
+    indirect = (
+        tmp_path
+        / "store-link"
+        / Path(os.readlink(version)).relative_to(tmp_path / "store")
+    )
+    version.unlink()
+    version.symlink_to(indirect)
+
+    assert all(len(w) == 0 for w in verify_view(view).values())
+
+
+def test_listing_cached(site_packages: Path):
+    checker = LinkChecker()
+    six = site_packages / "six.py"
+    target = Path(os.readlink(six))
+    six.unlink()
+
+    assert not checker.check(six, target)
+    six.symlink_to(target)
+    assert not checker.check(six, target), "cached listing should be used"
+
+    checker.forget(site_packages)
+    assert checker.check(six, target)
@@ -0,0 +1,51 @@
+import os
+from pathlib import Path
+
+from pyvarium.verify.links import verify_view
+from pyvarium.verify.repair import repair_view, replace_link
+
+
+def test_replace_link(tmp_path: Path):
+    link = tmp_path / "link"
+    link.write_text("copy")
+
+    replace_link(link, tmp_path / "target")
+
+    assert os.readlink(link) == str(tmp_path / "target")
+    assert [p.name for p in tmp_path.iterdir()] == ["link"]
+
+
+def test_repair_view(view: Path, site_packages: Path, tmp_path: Path):
+    (site_packages / "numpy" / "version.py").unlink()
+
+    wrong = site_packages / "numpy" / "__init__.py"
+    wrong.unlink()
+    wrong.symlink_to(tmp_path / "elsewhere.py")
+
+    copied = site_packages / "six.py"
+    copied.unlink()
+    copied.write_text("six 0\n")
+
+    warnings = verify_view(view)
+    progress = []
+    remaining = repair_view(warnings, max_workers=2, progress=progress.append)
+
+    assert sorted(progress) == ["py-numpy", "py-six"]
+    assert all(len(w) == 0 for w in remaining.values())
+    assert all(len(w) == 0 for w in verify_view(view).values())
+    assert not list(view.rglob("*.tmp"))
+
+
+def test_repair_failure(view: Path, site_packages: Path):
+    blocked = site_packages / "six.py"
+    target = Path(os.readlink(blocked))
+    blocked.unlink()
+    blocked.mkdir()
+    (blocked / "file").write_text("")
+
+    warnings = verify_view(view)
+    remaining = repair_view(warnings)
+
+    assert remaining[view / ".spack" / "py-six"] == [(blocked, target)]
+    assert remaining[view / ".spack" / "py-numpy"] == []
+    assert not list(view.rglob("*.tmp"))
@@ -0,0 +1,97 @@
+import os
+from pathlib import Path
+
+from pyvarium.verify.links import verify_view
+from pyvarium.verify.snapshot import VerifySnapshot
+
+
+def run(view: Path, snapshot_path: Path, full: bool = False):
+    snapshot = (
+        VerifySnapshot(snapshot_path) if full else VerifySnapshot.load(snapshot_path)
+    )
+    checked = []
+    res = verify_view(view, progress=checked.append, snapshot=snapshot)
+    snapshot.save()
+    return res, sorted(checked)
+
+
+def test_unchanged_packages_skipped(view: Path, tmp_path: Path):
+    snapshot = tmp_path / "verify.json"
+
+    res, checked = run(view, snapshot)
+    assert checked == ["py-numpy", "py-six"]
+    assert all(len(w) == 0 for w in res.values())
+
+    res, checked = run(view, snapshot)
+    assert checked == []
+    assert [p.name for p in res] == ["py-numpy", "py-six"]
+    assert all(len(w) == 0 for w in res.values())
+
+
+def test_changed_directory_rechecked(view: Path, site_packages: Path, tmp_path: Path):
+    snapshot = tmp_path / "verify.json"
+    run(view, snapshot)
+
+    (site_packages / "numpy" / "version.py").unlink()
+
+    res, checked = run(view, snapshot)
+    assert checked == ["py-numpy"]
+    assert len(res[view / ".spack" / "py-numpy"]) == 1
+
+    # Packages with problems are not recorded, so they are checked again
+    res, checked = run(view, snapshot)
+    assert checked == ["py-numpy"]
+
+
+def test_changed_manifest_rechecked(view: Path, tmp_path: Path):
+    snapshot = tmp_path / "verify.json"
+    run(view, snapshot)
+
+    manifest = view / ".spack" / "py-six" / "install_manifest.json"
+    st = manifest.stat()
+    os.utime(manifest, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+
+    _, checked = run(view, snapshot)
+    assert checked == ["py-six"]
+
+
+def test_changed_prefix_rechecked(view: Path, tmp_path: Path):
+    snapshot = tmp_path / "verify.json"
+    run(view, snapshot)
+
+    # Moved with its manifest unchanged, but the view still links to the old prefix
+    prefix = tmp_path / "store" / "py-six-1.0-abcdef"
+    moved = prefix.rename(tmp_path / "store" / "py-six-1.0-fedcba")
+    manifest = view / ".spack" / "py-six" / "install_manifest.json"
+    manifest.unlink()
+    manifest.symlink_to(moved / ".spack" / "install_manifest.json")
+
+    res, checked = run(view, snapshot)
+    assert checked == ["py-six"]
+    assert len(res[view / ".spack" / "py-six"]) == 1
+
+
+def test_full(view: Path, tmp_path: Path):
+    snapshot = tmp_path / "verify.json"
+    run(view, snapshot)
+
+    _, checked = run(view, snapshot, full=True)
+    assert checked == ["py-numpy", "py-six"]
+
+
+def test_load_invalid(tmp_path: Path):
+    snapshot_path = tmp_path / "verify.json"
+    snapshot_path.write_text('{"version": 0, "packages": {}}')
+    assert VerifySnapshot.load(snapshot_path).packages == {}
+
+    snapshot_path.write_text("{")
+    assert VerifySnapshot.load(snapshot_path).packages == {}
+
+
+def test_prune(view: Path, tmp_path: Path):
+    snapshot = VerifySnapshot(tmp_path / "verify.json")
+    verify_view(view, snapshot=snapshot)
+    assert set(snapshot.packages) == {"py-numpy", "py-six"}
+
+    snapshot.prune([view / ".spack" / "py-six"])
+    assert set(snapshot.packages) == {"py-six"}